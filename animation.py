@@ -0,0 +1,124 @@
+"""
+Projet démineur
+Auteurs :   Mathis Bulka
+            Samuel Cornier
+            Léo Simon
+            Sacha Trouvé
+
+    Module animation: horloge commune des animations des cellules du plateau
+"""
+
+BOMB = -1
+JAMMER = -9
+FLAG = -11
+
+# image, nombre d'images, taille relative à la cellule, dernière image jouée,
+# images par seconde, en boucle
+CELL_ANIMATIONS = {
+    FLAG:   ["flag_sheet", 4, 1, 3, 6, True],
+    BOMB:   ["bomb_sheet", 6, 0.9, 5, 6, False],
+    JAMMER: ["jammer_sheet", 14, 0.9, 13, 24, True]
+}
+
+IMAGE, FRAME_NUMBER, SCALE, LAST_FRAME, FPS, LOOP = list(range(6))
+
+
+class AnimationClock:
+    """
+    Gives the current image of every animated cell from the game ticks alone.
+
+    The images of a sheet are decoded and scaled once per cell size, and the
+    current image of a looping animation is the same for every cell showing it:
+    it is looked up once per frame and per animation, whatever the number of
+    cells. An animation played once (an exploding bomb) starts when its cell is
+    revealed.
+
+    Parameters:
+    assets (AssetCache): The cache giving the images of the sheets.
+
+    Attributes:
+    assets (AssetCache): The cache giving the images of the sheets.
+    current (dict): The images of the current frame, keyed by (animation,
+    start), start being None for looping animations.
+    ticks (int): The ticks of the current frame.
+    """
+
+    def __init__(self, assets):
+        self.assets = assets
+        self.current = {}
+        self.ticks = None
+
+    def images(self, animation: int, square_size: int) -> list:
+        """
+        Returns the images of an animation for the given cell size.
+        """
+        settings = CELL_ANIMATIONS[animation]
+        size = square_size * settings[SCALE]
+
+        return self.assets.frames(f"sprites/{settings[IMAGE]}.png", settings[FRAME_NUMBER], 1, (size, size))[0]
+
+    def tick(self, ticks: int):
+        """
+        Starts a new frame at the given ticks.
+        """
+        self.ticks = ticks
+        self.current = {}
+
+    def image(self, animation: int, start: int, square_size: int):
+        """
+        Returns the image of an animation at the current frame.
+
+        Parameters:
+        animation (int): FLAG, BOMB or JAMMER.
+        start (int): The ticks at which the cell started its animation.
+        square_size (int): The size of a cell in pixels.
+
+        Returns:
+        Surface: The image to draw.
+        """
+        settings = CELL_ANIMATIONS[animation]
+        key = (animation, None if settings[LOOP] else start)
+        image = self.current.get(key)
+
+        if image is None:
+            frame = (self.ticks - (0 if settings[LOOP] else start)) * settings[FPS] // 1000
+
+            if settings[LOOP]:
+                frame %= settings[LAST_FRAME] + 1
+
+            else:
+                frame = min(frame, settings[LAST_FRAME])
+
+            image = self.images(animation, square_size)[frame]
+            self.current[key] = image
+
+        return image
+
+    def draw(self, game):
+        """
+        Draws every animated cell of the game at the current frame, on its
+        background. When the board is seen through the viewport of the game,
+        only the cells in it are drawn.
+
+        Parameters:
+        game (Game): The game, whose animations are drawn.
+        """
+        square_size = game.square_size
+        animations = game.animations.items() if game.viewport is None else game.viewport.visible_animations(game.animations)
+
+        for cell, (animation, start) in animations:
+            position = (cell[0] * square_size + game.x_offset,
+                        cell[1] * square_size + game.y_offset)
+
+            if animation == FLAG:
+                game.background.restore(game.screen, (position, (square_size, square_size)))
+
+            else:
+                game.atlas.blit(game.screen, 0, cell, position)
+
+            image = self.image(animation, start, square_size)
+            image_x = square_size // 35 + position[0]
+            image_y = square_size // 12 + position[1]
+            game.screen.blit(image, (image_x, image_y))
+            game.dirty.add(image.get_rect(topleft=(image_x, image_y)).union(
+                (position, (square_size, square_size))))
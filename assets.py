@@ -0,0 +1,180 @@
+"""
+Projet démineur
+Auteurs :   Mathis Bulka
+            Samuel Cornier
+            Léo Simon
+            Sacha Trouvé
+
+    Module assets: cache des images chargées depuis le disque et des textes
+"""
+
+from collections import OrderedDict
+
+import pygame
+
+ALPHA = 1
+SMOOTH = 2
+FLIP_X = 4
+
+
+class AssetCache:
+    """
+    Loads every image from the disk once, and keeps its scaled variants. Also
+    keeps the fonts and the texts rendered with them.
+
+    Surfaces are keyed by (path, size, flags). The original images are kept for
+    the whole game, the scaled variants in a bounded LRU. Fonts are keyed by
+    (family, size) and rendered texts by (text, size, colour, family), in a
+    bounded LRU too.
+
+    Parameters:
+    max_scaled (int): The number of scaled variants kept.
+    max_texts (int): The number of rendered texts kept.
+
+    Attributes:
+    max_scaled (int): The number of scaled variants kept.
+    max_texts (int): The number of rendered texts kept.
+    images (dict): The images as loaded from the disk, keyed by (path, flags).
+    scaled (OrderedDict): The scaled variants, the least recently used first.
+    fonts (dict): The fonts, keyed by (family, size).
+    texts (OrderedDict): The rendered texts, the least recently used first.
+    loads (int): The number of images loaded from the disk so far.
+    """
+
+    def __init__(self, max_scaled: int = 256, max_texts: int = 512):
+        self.max_scaled = max_scaled
+        self.max_texts = max_texts
+        self.images = {}
+        self.scaled = OrderedDict()
+        self.fonts = {}
+        self.texts = OrderedDict()
+        self.loads = 0
+
+    def load(self, path: str, flags: int = ALPHA) -> pygame.Surface:
+        """
+        Returns the image stored at the given path, loaded and converted to the
+        pixel format of the screen only the first time.
+        """
+        key = (path, flags & ALPHA)
+        image = self.images.get(key)
+
+        if image is None:
+            image = pygame.image.load(path)
+            self.loads += 1
+
+            if pygame.display.get_surface() is not None:
+                image = image.convert_alpha() if flags & ALPHA else image.convert()
+
+            self.images[key] = image
+
+        return image
+
+    def image(self, path: str, size: tuple[float, float] = None,
+              flags: int = ALPHA) -> pygame.Surface:
+        """
+        Returns the image stored at the given path, scaled to the given size.
+
+        Parameters:
+        path (str): The path of the image.
+        size (tuple): The size of the image. If not specified, the image is not
+        scaled.
+        flags (int): A combination of ALPHA, SMOOTH (smooth scaling) and FLIP_X
+        (horizontal flip).
+
+        Returns:
+        Surface: The image. It is shared, so it must not be drawn on.
+        """
+        size = None if size is None else (round(size[0]), round(size[1]))
+        key = (path, size, flags)
+
+        return self.cached(key, lambda: self.transform(self.load(path, flags), size, flags))
+
+    def frames(self, path: str, columns: int, rows: int,
+               size: tuple[float, float] = None,
+               flags: int = ALPHA) -> list[list[pygame.Surface]]:
+        """
+        Returns the frames of a sprite sheet made of columns x rows frames of the
+        same size, each one scaled to the given size.
+
+        Returns:
+        list: The frames, frames[row][column]. They are shared, so they must not
+        be drawn on.
+        """
+        size = None if size is None else (round(size[0]), round(size[1]))
+        key = (path, size, flags, columns, rows)
+
+        def cut():
+            sheet = self.load(path, flags)
+            width = sheet.get_width() // columns
+            height = sheet.get_height() // rows
+
+            return [[self.transform(sheet.subsurface((column * width, row * height, width, height)), size, flags)
+                     for column in range(columns)]
+                    for row in range(rows)]
+
+        return self.cached(key, cut)
+
+    def font(self, size: int, family: str = "Arial") -> pygame.font.Font:
+        """
+        Returns the system font of the given family and size, looked up only
+        the first time.
+        """
+        key = (family, size)
+        font = self.fonts.get(key)
+
+        if font is None:
+            font = pygame.font.SysFont(family, size)
+            self.fonts[key] = font
+
+        return font
+
+    def text(self, text: str, size: int, colour: tuple[int, int, int],
+             family: str = "Arial") -> pygame.Surface:
+        """
+        Returns the given text rendered (antialiased) with the given font size
+        and colour, rendered only the first time.
+
+        Returns:
+        Surface: The rendered text. It is shared, so it must not be drawn on.
+        """
+        key = (text, size, colour, family)
+
+        return self.cached(key, lambda: self.font(size, family).render(text, True, colour),
+                           self.texts, self.max_texts)
+
+    def cached(self, key, create, cache: OrderedDict = None, max_size: int = None):
+        """
+        Returns the value stored under the given key of a LRU cache (the scaled
+        variants by default), creating it with create() if needed, and evicts
+        the least recently used ones.
+        """
+        if cache is None:
+            cache, max_size = self.scaled, self.max_scaled
+
+        value = cache.get(key)
+
+        if value is None:
+            value = create()
+            cache[key] = value
+
+            if len(cache) > max_size:
+                cache.popitem(last=False)
+
+        else:
+            cache.move_to_end(key)
+
+        return value
+
+    @staticmethod
+    def transform(image: pygame.Surface, size, flags: int) -> pygame.Surface:
+        if flags & FLIP_X:
+            image = pygame.transform.flip(image, True, False)
+
+        if size is not None and size != image.get_size():
+            if flags & SMOOTH:
+                image = pygame.transform.smoothscale(image, size)
+
+            else:
+                image = pygame.transform.scale(image, size)
+
+        return image
@@ -0,0 +1,124 @@
+"""
+Projet démineur
+Auteurs :   Mathis Bulka
+            Samuel Cornier
+            Léo Simon
+            Sacha Trouvé
+
+    Module atlas: pré-rendu de toutes les apparences possibles d'une cellule
+"""
+
+import pygame
+
+BOMB = -1
+COIN = -2
+MAGNIFIER = -3
+METAL_SCRAP = -4
+SHIELD = -5
+UPGRADER = -6
+BIONIC_GLASSES = -7
+ARMOR = -8
+JAMMER = -9
+RIFLE = -10
+
+HIDDEN_TILE = 100
+HOLE_TILE = 101
+BLUE_FLAG_TILE = 102
+
+HIDDEN_COLORS = [(170, 215, 81), (162, 209, 73)]
+NOT_HIDDEN_COLORS = [(229, 194, 159), (215, 184, 153)]
+
+COLORS = {-1: (66, 36, 66),
+          1: (25, 118, 210),
+          2: (56, 142, 60),
+          3: (211, 47, 47),
+          4: (123, 31, 162),
+          5: (255, 143, 0),
+          6: (0, 0, 0),
+          7: (0, 0, 0),
+          8: (0, 0, 0)}
+
+# les objets affichés sans animation sur le plateau, et le nombre d'images de
+# leur planche
+STATIC_ITEMS = {
+    COIN: ("coin_sheet", 7),
+    MAGNIFIER: ("magnifier", 1),
+    METAL_SCRAP: ("metal_scrap", 1),
+    SHIELD: ("shield", 1),
+    UPGRADER: ("upgrader", 1),
+    BIONIC_GLASSES: ("bionic_glasses", 1),
+    ARMOR: ("armor", 1),
+    RIFLE: ("rifle_sheet", 10)
+}
+
+
+class TileAtlas:
+    """
+    Every appearance a cell can have, rendered once for a given square size in
+    a single surface: the hidden and revealed backgrounds, the eight numbers,
+    the hole, the blue flag and the static items, each one on both colours of
+    the checkerboard. Drawing a cell is then a single blit of a part of it.
+
+    Parameters:
+    assets (AssetCache): The cache giving the images and the texts.
+    square_size (int): The size of a cell in pixels.
+
+    Attributes:
+    square_size (int): The size of a cell in pixels.
+    surface (Surface): The rendered tiles, one row per checkerboard colour.
+    areas (dict): The area of each tile in surface, keyed by (tile, parity).
+    """
+
+    def __init__(self, assets, square_size: int):
+        self.square_size = square_size
+        tiles = [HIDDEN_TILE, HOLE_TILE, BLUE_FLAG_TILE, *range(0, 9), *STATIC_ITEMS]
+
+        self.surface = pygame.Surface((len(tiles) * square_size, 2 * square_size))
+        if pygame.display.get_surface() is not None:
+            self.surface = self.surface.convert()
+
+        self.areas = {}
+        for parity in [0, 1]:
+            for column, tile in enumerate(tiles):
+                area = pygame.Rect(column * square_size, parity * square_size, square_size, square_size)
+                self.areas[(tile, parity)] = area
+                self.render(assets, tile, parity, area)
+
+    def render(self, assets, tile: int, parity: int, area: pygame.Rect):
+        """
+        Renders one tile in the given area of the atlas, the way Grid.display
+        used to draw it on the screen.
+        """
+        square_size = self.square_size
+        color = HIDDEN_COLORS[parity] if tile in [HIDDEN_TILE, BLUE_FLAG_TILE] else NOT_HIDDEN_COLORS[parity]
+        self.surface.fill(color, area)
+
+        if tile == BLUE_FLAG_TILE:
+            self.surface.blit(assets.image("sprites/blue_flag.png", (square_size, square_size)), area.topleft)
+
+        elif tile == HOLE_TILE:
+            self.surface.blit(assets.image("sprites/hole.png", (square_size, square_size)), area.topleft)
+
+        elif tile in STATIC_ITEMS:
+            image_name, frame_number = STATIC_ITEMS[tile]
+            image = assets.frames(f"sprites/{image_name}.png", frame_number, 1, (square_size * 0.9, square_size * 0.9))[0][0]
+            self.surface.blit(image, (area.x + square_size // 35, area.y + square_size // 12))
+
+        elif 0 < tile <= 8:
+            image = assets.text(str(tile), round(square_size * 80/100), COLORS[tile])
+            self.surface.blit(image, (area.x + square_size // 3.5, area.y + square_size // 15))
+
+    def blit(self, screen: pygame.Surface, tile: int, cell: tuple[int, int],
+             position: tuple[int, int]):
+        """
+        Draws a tile at the given position of the screen, with the checkerboard
+        colour of the given cell.
+
+        Parameters:
+        screen (Surface): The surface to draw on.
+        tile (int): HIDDEN_TILE, HOLE_TILE, BLUE_FLAG_TILE, a number from 0
+        (nothing around) to 8, or the value of a static item.
+        cell (tuple): The coordinates of the cell.
+        position (tuple): The top-left corner of the cell on the screen.
+        """
+        screen.blit(self.surface, position, self.areas[(tile, (cell[0] + cell[1]) % 2)])
@@ -0,0 +1,674 @@
+"""
+Projet démineur
+Auteurs :   Mathis Bulka
+            Samuel Cornier
+            Léo Simon
+            Sacha Trouvé
+
+    Module bench: mesure des performances de la génération, de la révélation
+    et de l'affichage du plateau
+
+    Usage : python bench.py [--sizes 18 200] [--cases generation frame]
+                            [--output results.json]
+                            [--baseline baseline.json] [--threshold 0.25]
+            python bench.py --output bench_baseline.json  (nouvelle référence)
+            python bench.py --legacy
+            python bench.py --soak 300
+"""
+
+import argparse
+import contextlib
+import gc
+import inspect
+import io
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+import pygame
+
+from animation import AnimationClock
+from assets import AssetCache
+from atlas import COLORS, HIDDEN_TILE, TileAtlas
+from board import Board
+from engine import Engine, Inventory
+from grid import Grid
+from render import BoardBackground, DirtyRegion
+from solver import Solver
+from vecenv import REVEAL, VectorEnv
+from viewport import PAN_SPEED, Viewport
+
+LEFT_CLICK = 1
+
+BOMB = -1
+COIN = -2
+BIONIC_GLASSES = -7
+
+FLAGGED, HIDDEN, NOT_HIDDEN = -1, 0, 1
+
+SIZES = [18, 200, 2000]
+BOMB_PERCENTAGE = 19
+ITEM_PERCENTAGE = 10
+
+# au-delà, l'ancien algorithme en O(n²) prendrait plusieurs minutes
+LEGACY_MAX_CELLS = 250_000
+
+SEED = 0
+REPEAT = 3
+MAX_REPEAT = 100
+# les cas rapides sont répétés jusqu'à cette durée, pour des mesures stables
+MIN_TOTAL_TIME = 0.2
+# en dessous de cet écart, en secondes, un ralentissement est du bruit
+NOISE = 0.0005
+CLICKS = 500
+FRAMES = 30
+SCREEN_SIZE = (1200, 650)
+GUI_WIDTH = SCREEN_SIZE[0] * 10 / 100
+
+# au-delà, le plateau ne tient plus à l'écran : une cellule ferait moins d'un
+# pixel
+RENDER_MAX_CELLS = 250_000
+# le nombre de plateaux de l'environnement vectorisé, et leur taille maximale :
+# au-delà, les plateaux empilés ne tiennent plus en mémoire
+ENV_BOARDS = 1024
+ENV_MAX_CELLS = 10_000
+
+# les résultats de référence, comparés à chaque exécution ; ils dépendent de
+# la machine, et sont à refaire avec --output après un changement voulu
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baseline.json")
+
+# la mémoire peut varier un peu d'une manche à l'autre, sans croître
+SOAK_WARMUP = 10
+SOAK_MAX_GROWTH = 1_000_000
+
+
+def items_to_pick(total_cells: int) -> dict[int, int]:
+    """
+    Returns the amount of coins and bombs of a round 4 board of the given size.
+    """
+    bomb_number = round(total_cells * BOMB_PERCENTAGE / 100)
+
+    return {COIN: round(bomb_number * ITEM_PERCENTAGE / 100), BOMB: bomb_number}
+
+
+def legacy_create_grid(width: int, height: int, cell: tuple[int, int],
+                       to_pick: dict[int, int]) -> dict:
+    """
+    The former Grid.create_grid, working on a dict of per-cell lists, kept as a
+    reference for the benchmark.
+    """
+    grid = {}
+    for h in range(height):
+        for w in range(width):
+            grid[(w, h)] = [0, 0, False]
+
+    def get_all_cells_around(cell):
+        all_cells = []
+        for delta_row in [-1, 0, 1]:
+            for delta_column in [-1, 0, 1]:
+                if ((delta_row, delta_column) != (0, 0) and 0 <= cell[1] + delta_row < height and 0 <= cell[0] + delta_column < width):
+                    all_cells.append((cell[0] + delta_column, cell[1] + delta_row))
+
+        return all_cells
+
+    shuffled_grid = [i for i in grid]
+    shuffled_grid.pop(shuffled_grid.index(cell))
+
+    for temp_cell in get_all_cells_around(cell):
+        shuffled_grid.pop(shuffled_grid.index(temp_cell))
+
+    random.shuffle(shuffled_grid)
+
+    for item, amount in to_pick.items():
+        for index in range(len(shuffled_grid[:amount])):
+            if index >= len(shuffled_grid[:amount]):
+                break
+
+            temp_cell = shuffled_grid[index]
+            shuffled_grid.pop(index)
+            grid[temp_cell][0] = item
+
+            for around in get_all_cells_around(temp_cell):
+                if grid[around][0] >= 0:
+                    grid[around][0] += 1
+
+    return grid
+
+
+def create_grid(width: int, height: int, cell: tuple[int, int],
+                to_pick: dict[int, int]) -> Board:
+    """
+    Creates a board the way Grid.create_grid does.
+    """
+    board = Board(width, height)
+    board.place(cell, to_pick, numpy.random.default_rng(random.getrandbits(64)))
+
+    return board
+
+
+def timed(function, *args) -> float:
+    """
+    Returns the duration of the given call, in seconds.
+    """
+    start = time.perf_counter()
+    function(*args)
+
+    return time.perf_counter() - start
+
+
+def bench_generation():
+    """
+    Prints the duration of the board generation, for the former and the
+    current algorithms, for every size of SIZES.
+    """
+    random.seed(0)
+
+    print(f"{'size':>11} {'legacy':>10} {'current':>10} {'speedup':>9}")
+    for size in SIZES:
+        cell = (size // 2, size // 2)
+        to_pick = items_to_pick(size * size)
+        current = min(timed(create_grid, size, size, cell, to_pick) for _ in range(3))
+
+        if size * size <= LEGACY_MAX_CELLS:
+            legacy = timed(legacy_create_grid, size, size, cell, to_pick)
+            print(f"{size:>5}x{size:<5} {legacy * 1000:>8.2f}ms {current * 1000:>8.2f}ms {legacy / current:>8.1f}x")
+
+        else:
+            print(f"{size:>5}x{size:<5} {'skipped':>10} {current * 1000:>8.2f}ms {'-':>9}")
+
+
+def legacy_draw_board(screen: pygame.Surface, board: Board, square_size: int):
+    """
+    Draws every cell of a board the way Grid.display used to: a rect, then a
+    font looked up and a number rendered for every numbered cell.
+    """
+    for index in range(board.size):
+        cell = board.cell(index)
+        value = int(board.values[index])
+        color = (229, 194, 159) if (cell[0] + cell[1]) % 2 == 0 else (215, 184, 153)
+        pygame.draw.rect(screen, color, pygame.Rect(cell[0] * square_size, cell[1] * square_size, square_size, square_size))
+
+        if value > 0:
+            font = pygame.font.SysFont("Arial", round(square_size * 80/100))
+            image = font.render(str(value), True, COLORS[value])
+            screen.blit(image, (square_size // 3.5 + cell[0] * square_size, square_size // 15 + cell[1] * square_size))
+
+
+def draw_board(screen: pygame.Surface, board: Board, atlas: TileAtlas):
+    """
+    Draws every cell of a board the way Grid.display does, with one blit from
+    the tile atlas per cell.
+    """
+    square_size = atlas.square_size
+    for index in range(board.size):
+        cell = board.cell(index)
+        value = int(board.values[index])
+        atlas.blit(screen, value if value >= 0 else HIDDEN_TILE, cell, (cell[0] * square_size, cell[1] * square_size))
+
+
+def bench_rendering(size: int = 200, square_size: int = 16):
+    """
+    Prints the duration of a full redraw of a revealed board, cell by cell,
+    with and without the tile atlas.
+    """
+    pygame.init()
+    pygame.display.set_mode((1, 1))
+    screen = pygame.Surface((size * square_size, size * square_size))
+    board = create_grid(size, size, (size // 2, size // 2), items_to_pick(size * size))
+
+    legacy = timed(legacy_draw_board, screen, board, square_size)
+    atlas = TileAtlas(AssetCache(), square_size)
+    current = min(timed(draw_board, screen, board, atlas) for _ in range(3))
+
+    print(f"full redraw of {size}x{size}: legacy {legacy * 1000:.2f}ms, atlas {current * 1000:.2f}ms ({legacy / current:.1f}x)")
+
+
+class BenchGame:
+    """
+    The parts of Game that Grid and AnimationClock use, with the same square
+    size and offsets, but without the player, the items, the gui and the main
+    loop.
+
+    Parameters:
+    size (int): The width and height of the board.
+    round_number (int): The number of the round.
+    """
+
+    def __init__(self, size: int, round_number: int):
+        self.screen = pygame.display.get_surface()
+        self.screen_width, self.screen_height = SCREEN_SIZE
+        self.round = round_number
+        self.width = size
+        self.height = size
+        self.endless = False
+        self.inventory = Inventory()
+        self.square_size = max(1, int(min((self.screen_width - GUI_WIDTH) / size, self.screen_height / size)))
+        self.x_offset = round((self.screen_width - GUI_WIDTH - size * self.square_size) / 2)
+        self.y_offset = round((self.screen_height - size * self.square_size) / 2)
+        self.assets = AssetCache()
+        self.atlas = TileAtlas(self.assets, self.square_size)
+        self.background = BoardBackground((int(self.screen_width - GUI_WIDTH), self.screen_height),
+                                          size, size, self.square_size, (self.x_offset, self.y_offset))
+        self.dirty = DirtyRegion(self.screen)
+        self.viewport = None
+        self.animation_clock = AnimationClock(self.assets)
+        self.animations = {}
+        self.is_first_click = True
+        self.k_pressed = False
+        self.space_pressed = False
+        self.initial_time = 0
+        self.player_state = 1
+        self.latest_player_state = 1
+        self.bomb_exploding = False
+        self.is_trading = False
+
+    def run(self):
+        pass
+
+
+def new_engine(size: int, round_number: int = 4) -> Engine:
+    """
+    Returns the engine of a round on a size x size board, with a generator
+    seeded with SEED.
+    """
+    return Engine(size, size, round_number, rng=random.Random(SEED))
+
+
+def opened_engine(size: int) -> Engine:
+    """
+    Returns a round 1 engine whose board has been generated and clicked once in
+    its center.
+    """
+    engine = new_engine(size, 1)
+    engine.create_grid((size // 2, size // 2))
+    engine.click(LEFT_CLICK, (size // 2, size // 2))
+
+    return engine
+
+
+def case_generation(size: int) -> float:
+    """
+    Engine.create_grid, with round 4 items.
+    """
+    engine = new_engine(size)
+
+    return timed(engine.create_grid, (size // 2, size // 2))
+
+
+def case_first_click(size: int) -> float:
+    """
+    The first click of a round 1 board, revealing the empty region around it.
+    """
+    engine = new_engine(size, 1)
+    engine.create_grid((size // 2, size // 2))
+
+    return timed(engine.click, LEFT_CLICK, (size // 2, size // 2))
+
+
+def case_chord(size: int) -> float:
+    """
+    CLICKS clicks on revealed numbers, each one revealing the cells around it.
+    """
+    engine = opened_engine(size)
+    rng = numpy.random.default_rng(SEED)
+    numbers = numpy.flatnonzero((engine.board.states == NOT_HIDDEN) & (engine.board.values > 0))
+    cells = [engine.board.cell(int(index)) for index in rng.permutation(numbers)[:CLICKS]]
+
+    def chord():
+        for cell in cells:
+            engine.click(LEFT_CLICK, cell)
+
+    return timed(chord)
+
+
+def case_bionic(size: int) -> float:
+    """
+    CLICKS clicks with the bionic glasses, each one revealing a hidden cell and
+    the cells around it.
+    """
+    engine = opened_engine(size)
+    rng = numpy.random.default_rng(SEED)
+    hidden = numpy.flatnonzero(engine.board.states == HIDDEN)
+    cells = [engine.board.cell(int(index)) for index in rng.permutation(hidden)[:CLICKS]]
+
+    def bionic():
+        for cell in cells:
+            engine.inventory.active_equipped = BIONIC_GLASSES
+            engine.click(LEFT_CLICK, cell)
+
+    return timed(bionic)
+
+
+def case_debug(size: int) -> float:
+    """
+    Engine.debug, revealing the whole board.
+    """
+    engine = opened_engine(size)
+
+    return timed(engine.debug)
+
+
+def case_solve(size: int) -> float:
+    """
+    A step of the solver on the frontier left by the first click, with a fresh
+    memo table.
+    """
+    engine = opened_engine(size)
+
+    return timed(lambda: Solver(engine.board).solve())
+
+
+def case_env_step(size: int) -> float:
+    """
+    A step of ENV_BOARDS round 1 boards in the vectorized environment, each
+    one digging a hidden cell with no bomb.
+    """
+    env = VectorEnv(ENV_BOARDS, size, size, seed=SEED)
+    env.reset()
+    rng = numpy.random.default_rng(SEED)
+    hidden = (env.states[:, :env.size] == HIDDEN) & (env.values[:, :env.size] >= 0)
+    cells = numpy.argmax(numpy.where(hidden, rng.random(hidden.shape), -1.0), axis=1)
+
+    return timed(env.step, numpy.full(ENV_BOARDS, REVEAL), cells)
+
+
+def rendered_grid(size: int) -> Grid:
+    """
+    Returns the grid of a round 1 board, drawn on the screen, generated and
+    clicked once in its center.
+    """
+    grid = Grid(BenchGame(size, 1), size, size)
+    grid.create_grid((size // 2, size // 2))
+    grid.cell_clicked(LEFT_CLICK, (size // 2, size // 2))
+    grid.game.dirty.flush()
+
+    return grid
+
+
+def case_debug_render(size: int) -> float:
+    """
+    Grid.debug, revealing the whole board and drawing every cell of it.
+    """
+    grid = rendered_grid(size)
+
+    def debug():
+        grid.debug()
+        grid.game.dirty.flush()
+
+    return timed(debug)
+
+
+def case_frame(size: int) -> float:
+    """
+    One steady-state frame of the board part of Game.display, once every bomb
+    has been flagged by Grid.debug: the animated cells are drawn and the dirty
+    parts of the screen pushed.
+    """
+    grid = rendered_grid(size)
+    grid.debug()
+    game = grid.game
+    game.dirty.flush()
+
+    def frames():
+        for frame in range(FRAMES):
+            game.animation_clock.tick(frame * 1000 // 60)
+            game.animation_clock.draw(game)
+            game.dirty.flush()
+
+    return timed(frames) / FRAMES
+
+
+def case_scroll(size: int) -> float:
+    """
+    One frame of a board seen through the viewport, scrolled by PAN_SPEED
+    pixels on both axes, once every bomb has been flagged by Grid.debug: the
+    chunks entering the play area are rendered, then the play area and its
+    animated cells are drawn.
+    """
+    game = BenchGame(size, 1)
+    game.viewport = Viewport(game, pygame.Rect(0, 0, int(game.screen_width - GUI_WIDTH), game.screen_height))
+    game.atlas = TileAtlas(game.assets, game.square_size)
+    game.background = game.viewport
+    game.grid = Grid(game, size, size)
+    game.grid.create_grid((size // 2, size // 2))
+    game.grid.cell_clicked(LEFT_CLICK, (size // 2, size // 2))
+    game.grid.debug()
+    game.viewport.draw(game.screen)
+    game.dirty.flush()
+
+    def frames():
+        for frame in range(FRAMES):
+            game.viewport.pan(PAN_SPEED, PAN_SPEED)
+            game.viewport.draw(game.screen)
+            game.screen.set_clip(game.viewport.rect)
+            game.animation_clock.tick(frame * 1000 // 60)
+            game.animation_clock.draw(game)
+            game.screen.set_clip(None)
+            game.dirty.flush()
+
+    return timed(frames) / FRAMES
+
+
+# le nombre maximal de cellules de chaque cas, None pour aucune limite
+CASES = {
+    "generation": (case_generation, None),
+    "first_click": (case_first_click, None),
+    "chord": (case_chord, None),
+    "bionic": (case_bionic, None),
+    "debug": (case_debug, None),
+    "solve": (case_solve, None),
+    "env_step": (case_env_step, ENV_MAX_CELLS),
+    "debug_render": (case_debug_render, RENDER_MAX_CELLS),
+    "frame": (case_frame, RENDER_MAX_CELLS),
+    "scroll": (case_scroll, None)
+}
+
+
+def run_suite(sizes: list[int], cases: list[str]) -> dict:
+    """
+    Runs every case for every size, and returns the best duration of each one,
+    in seconds, as results[case][size]. A case is run at least REPEAT times,
+    and until it has run for MIN_TOTAL_TIME. A case skipped for a size has
+    None.
+    """
+    pygame.init()
+    pygame.display.set_mode(SCREEN_SIZE)
+
+    results = {}
+    print(f"{'case':<14}" + "".join(f"{size:>12}" for size in sizes))
+    for case in cases:
+        function, max_cells = CASES[case]
+        results[case] = {}
+
+        for size in sizes:
+            if max_cells is not None and size * size > max_cells:
+                results[case][str(size)] = None
+
+            else:
+                random.seed(SEED)
+                durations = []
+                while len(durations) < REPEAT or (sum(durations) < MIN_TOTAL_TIME and len(durations) < MAX_REPEAT):
+                    durations.append(function(size))
+
+                results[case][str(size)] = min(durations)
+
+        print(f"{case:<14}" + "".join(f"{'skipped':>12}" if duration is None else f"{duration * 1000:>10.2f}ms"
+                                      for duration in results[case].values()))
+
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """
+    Compares results with the results of a baseline run, and returns the
+    regressions: the cases more than threshold (0.25 for 25 %) and more than
+    NOISE slower.
+    """
+    regressions = []
+    for case, durations in results.items():
+        for size, duration in durations.items():
+            reference = baseline.get(case, {}).get(size)
+
+            if duration is None or reference is None:
+                continue
+
+            ratio = duration / reference
+            print(f"{case:<14} {size:>5} {reference * 1000:>10.2f}ms -> {duration * 1000:>10.2f}ms {ratio:>6.2f}x")
+
+            if ratio > 1 + threshold and duration - reference > NOISE:
+                regressions.append(f"{case} {size}x{size}: {ratio:.2f}x slower")
+
+    return regressions
+
+
+def win_round(game):
+    """
+    Wins the round of a game by clicking every hidden cell without a bomb,
+    until the game queues its next scene.
+    """
+    grid = game.grid
+    board = grid.board
+
+    if game.is_first_click:
+        center = (game.width // 2, game.height // 2)
+        grid.create_grid(center)
+        grid.cell_clicked(LEFT_CLICK, center)
+        game.is_first_click = False
+
+    while game.next_scene is None:
+        safe = numpy.flatnonzero((board.states == HIDDEN) & (board.values != BOMB))
+        grid.cell_clicked(LEFT_CLICK, board.cell(int(safe[0])))
+
+
+def soak(rounds: int) -> int:
+    """
+    Plays rounds of a real Game, one frame at a time like its main loop, each
+    round being won, and every other one followed by a visit to the trader.
+    Checks that the stack depth at which the scenes are entered, the number of
+    grids alive and the memory stay flat. The saves and the input logs of the
+    game are written to a temporary directory, not over the player's.
+
+    Returns:
+    int: 0 if they do, 1 otherwise.
+    """
+    # main n'est importé qu'ici : il charge toutes les images du jeu
+    from main import BOARD_SCENE, TRADER_SCENE, Game
+
+    pygame.init()
+    directory = tempfile.TemporaryDirectory()
+    game = Game(pygame.display.set_mode(SCREEN_SIZE), 18, 18, save_path=os.path.join(directory.name, "game.save"),
+                replay_directory=os.path.join(directory.name, "replays"))
+
+    depths = []
+    enter = game.enter
+
+    def recorded_enter(scene):
+        depths.append(len(inspect.stack(0)))
+        enter(scene)
+
+    game.enter = recorded_enter
+
+    tracemalloc.start()
+    memory = []
+    # les pièces gagnées sont affichées à chaque manche
+    with contextlib.redirect_stdout(io.StringIO()):
+        for round_number in range(rounds):
+            game.step()
+
+            if game.scene == TRADER_SCENE:
+                game.switch(BOARD_SCENE)
+                game.step()
+
+            # à partir de la manche 3, une manche gagnée mène au marchand
+            game.round = 3 if round_number % 2 else 1
+            win_round(game)
+
+            if round_number + 1 >= SOAK_WARMUP and (round_number + 1) % SOAK_WARMUP == 0:
+                gc.collect()
+                memory.append(tracemalloc.get_traced_memory()[0])
+
+    tracemalloc.stop()
+    game.saver.close()
+    game.grid.engine.close()
+    directory.cleanup()
+    gc.collect()
+    grids = sum(isinstance(obj, Grid) for obj in gc.get_objects())
+    growth = memory[-1] - memory[0] if memory else 0
+
+    print(f"{rounds} rounds: stack depth {min(depths)}-{max(depths)}, grids alive {grids}, "
+          f"memory {memory[0] / 1e6:.2f}MB -> {memory[-1] / 1e6:.2f}MB" if memory else "")
+
+    if max(depths) != min(depths) or grids > 1 or growth > SOAK_MAX_GROWTH:
+        print("regression: the game grows with the number of rounds")
+
+        return 1
+
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks of the board generation, reveal and rendering.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--cases", nargs="+", choices=list(CASES), default=list(CASES))
+    parser.add_argument("--output", help="the JSON file the results are written to")
+    parser.add_argument("--baseline", default=BASELINE_PATH,
+                        help="a JSON file written by a previous run, to compare with "
+                             "(default: bench_baseline.json; an empty string to compare with nothing)")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="the slowdown above which a case is a regression (default: 0.25)")
+    parser.add_argument("--legacy", action="store_true",
+                        help="compare the generation and the rendering with the former algorithms instead")
+    parser.add_argument("--soak", type=int, metavar="ROUNDS",
+                        help="play ROUNDS rounds of the game instead, checking that it does not grow")
+    arguments = parser.parse_args()
+
+    # les chemins donnés sont relatifs au dossier de départ
+    output = os.path.abspath(arguments.output) if arguments.output else None
+    baseline_path = os.path.abspath(arguments.baseline) if arguments.baseline else None
+
+    # les images sont chargées depuis des chemins relatifs
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    if arguments.soak:
+        return soak(arguments.soak)
+
+    if arguments.legacy:
+        bench_generation()
+        bench_rendering()
+
+        return 0
+
+    results = run_suite(arguments.sizes, arguments.cases)
+
+    if output:
+        with open(output, "w") as file:
+            json.dump({"python": platform.python_version(), "numpy": numpy.__version__,
+                       "pygame": pygame.version.ver, "seed": SEED, "repeat": REPEAT,
+                       "results": results}, file, indent=4)
+
+    # la référence n'est pas comparée à elle-même quand elle vient d'être
+    # écrite
+    if baseline_path and baseline_path != output:
+        with open(baseline_path) as file:
+            baseline = json.load(file)["results"]
+
+        regressions = compare(results, baseline, arguments.threshold)
+        for regression in regressions:
+            print(f"regression: {regression}")
+
+        if regressions:
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,290 @@
+"""
+Projet démineur
+Auteurs :   Mathis Bulka
+            Samuel Cornier
+            Léo Simon
+            Sacha Trouvé
+
+    Module board: stockage compact du plateau de jeu
+"""
+
+import zlib
+
+import numpy
+
+from topology import SQUARE, Topology
+
+BOMB = -1
+JAMMER = -9
+
+CELL_VALUE, CELL_STATE, IS_COLLECTED = 0, 1, 2
+FLAGGED, HIDDEN, NOT_HIDDEN = -1, 0, 1
+NOT_COLLECTED, COLLECTED = False, True
+
+
+class Board:
+    """
+    This class stores the cells of a grid in flat typed arrays.
+
+    Every cell is identified by its index ``y * width + x``. A 1000x1000 board
+    takes 3 MB and can be scanned with vectorized numpy operations.
+
+    Parameters
+    ----------
+    width : int
+        The width of the board.
+    height : int
+        The height of the board.
+    topology : Topology, optional
+        The shape of the board. The default is SQUARE.
+
+    Attributes
+    ----------
+    width : int
+        The width of the board.
+    height : int
+        The height of the board.
+    size : int
+        The number of cells of the board.
+    topology : Topology
+        The shape of the board.
+    table : NeighbourTable or GridTable
+        The neighbours of every cell, shared by the boards of the same size: a
+        GridTable, which computes them, for a square board.
+    values : numpy.ndarray
+        The value of each cell (int8): a number of objects around, a bomb or an
+        item.
+    states : numpy.ndarray
+        The state of each cell (int8): FLAGGED, HIDDEN or NOT_HIDDEN.
+    collected : numpy.ndarray
+        Whether the item of each cell has been collected (bool).
+    view : BoardView
+        A dict-like view keyed by (x, y) tuples, kept for compatibility with the
+        former ``dict`` of per-cell lists.
+    """
+
+    def __init__(self, width: int, height: int, topology: Topology = SQUARE):
+        self.width = width
+        self.height = height
+        self.size = width * height
+        self.topology = topology
+        self.table = topology.table(width, height)
+        self.values = numpy.zeros(self.size, dtype=numpy.int8)
+        self.states = numpy.full(self.size, HIDDEN, dtype=numpy.int8)
+        self.collected = numpy.full(self.size, NOT_COLLECTED, dtype=numpy.bool_)
+        self.view = BoardView(self)
+
+    def __contains__(self, cell: tuple[int, int]) -> bool:
+        return 0 <= cell[0] < self.width and 0 <= cell[1] < self.height
+
+    def index(self, cell: tuple[int, int]) -> int:
+        """
+        Returns the flat index of the given cell.
+        """
+        return cell[1] * self.width + cell[0]
+
+    def cell(self, index: int) -> tuple[int, int]:
+        """
+        Returns the (x, y) coordinates of the given flat index.
+        """
+        return (index % self.width, index // self.width)
+
+    def as_2d(self, array: numpy.ndarray) -> numpy.ndarray:
+        """
+        Returns a (height, width) view of one of the flat arrays, without copy.
+        """
+        return array.reshape(self.height, self.width)
+
+    def area(self, x: int, y: int, width: int, height: int) -> tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray]:
+        """
+        Returns (height, width) views of the values, the states and the collected
+        flags of a rectangle of cells, without copy.
+        """
+        area = (slice(y, y + height), slice(x, x + width))
+
+        return (self.as_2d(self.values)[area], self.as_2d(self.states)[area],
+                self.as_2d(self.collected)[area])
+
+    def animated(self) -> numpy.ndarray:
+        """
+        Returns the flat indices of the cells drawn with an animation: the
+        flagged cells, and the revealed bombs and jammers.
+        """
+        animated = (self.values == BOMB) | (self.values == JAMMER)
+
+        return numpy.flatnonzero((self.states == FLAGGED) | ((self.states == NOT_HIDDEN) & animated))
+
+    def digest(self, value: int = 0) -> int:
+        """
+        Returns a CRC-32 of the values, the states and the collected flags,
+        continuing the given one.
+        """
+        for array in [self.values, self.states, self.collected]:
+            value = zlib.crc32(array.tobytes(), value)
+
+        return value
+
+    def safe_zone(self, cell: tuple[int, int]) -> numpy.ndarray:
+        """
+        Returns the sorted flat indices of the given cell and its neighbours.
+        """
+        index = self.index(cell)
+
+        return numpy.sort(numpy.append(self.table.around(index), index))
+
+    def place(self, cell: tuple[int, int], items_to_pick: dict[int, int],
+              rng: numpy.random.Generator):
+        """
+        Places every bomb and item at once, outside of the safe zone of the
+        given cell, then sets the number of objects around every other cell.
+
+        Parameters
+        ----------
+        cell : tuple[int, int]
+            The coordinates of the first clicked cell.
+        items_to_pick : dict[int, int]
+            The number of cells to pick for each bomb or item value, in the
+            order in which they have to be placed.
+        rng : numpy.random.Generator
+            The random generator used to pick the cells.
+
+        Returns
+        -------
+        None
+        """
+        safe_cells = self.safe_zone(cell)
+        free_cells = self.size - len(safe_cells)
+
+        objects = numpy.repeat(numpy.array(list(items_to_pick.keys()), dtype=numpy.int8),
+                               list(items_to_pick.values()))[:free_cells]
+
+        # on tire des rangs parmi les cellules libres, puis on les décale
+        # pour sauter les cellules de la zone sûre (qui est triée)
+        picked = rng.choice(free_cells, len(objects), replace=False)
+        picked += numpy.searchsorted(safe_cells - numpy.arange(len(safe_cells)),
+                                     picked, side="right")
+
+        self.values[:] = 0
+        self.values[picked] = objects
+
+        mask = self.values < 0
+        numbers = ~mask
+        self.values[numbers] = self.topology.count_around(mask, self.width, self.height)[numbers]
+
+    def around(self, indices: numpy.ndarray) -> numpy.ndarray:
+        """
+        Returns the sorted flat indices of every cell surrounding at least one of
+        the given cells.
+        """
+        return self.table.around_all(indices)
+
+    def reveal(self, index: int) -> numpy.ndarray:
+        """
+        Reveals a hidden cell holding a number. If this number is 0, the whole
+        region of empty cells around it is revealed, with its border, one
+        breadth-first level at a time: there is no recursion, and each level is
+        handled with a few vectorized operations.
+
+        Parameters
+        ----------
+        index : int
+            The flat index of the cell to reveal.
+
+        Returns
+        -------
+        revealed : numpy.ndarray
+            The flat indices of the cells revealed.
+        """
+        frontier = numpy.array([index])
+        self.states[frontier] = NOT_HIDDEN
+        revealed = [frontier]
+
+        frontier = self.spreading(frontier, index)
+        while len(frontier):
+            all_cells = self.around(frontier)
+            all_cells = all_cells[(self.states[all_cells] == HIDDEN) & (self.values[all_cells] >= 0)]
+            self.states[all_cells] = NOT_HIDDEN
+            revealed.append(all_cells)
+
+            frontier = self.spreading(all_cells, index)
+
+        return numpy.concatenate(revealed)
+
+    def spreading(self, cells: numpy.ndarray, index: int) -> numpy.ndarray:
+        """
+        Returns the cells, among the ones just revealed by the flood started at
+        index, that reveal their neighbours in turn: the empty ones.
+        """
+        return cells[self.values[cells] == 0]
+
+
+class BoardView:
+    """
+    A read/write view of a Board behaving like the former ``Grid.grid`` dict,
+    so that ``cell in grid.grid`` and ``grid.grid[cell][CELL_STATE]`` keep
+    working.
+    """
+
+    def __init__(self, board: Board):
+        self.board = board
+
+    def __contains__(self, cell) -> bool:
+        return isinstance(cell, tuple) and len(cell) == 2 and cell in self.board
+
+    def __getitem__(self, cell: tuple[int, int]) -> "CellView":
+        if not cell in self:
+            raise KeyError(cell)
+
+        return CellView(self.board, self.board.index(cell))
+
+    def __iter__(self):
+        for h in range(self.board.height):
+            for w in range(self.board.width):
+                yield (w, h)
+
+    def __len__(self) -> int:
+        return self.board.size
+
+
+class CellView:
+    """
+    A proxy for one cell, indexable with CELL_VALUE, CELL_STATE and
+    IS_COLLECTED like the former per-cell lists.
+    """
+
+    __slots__ = ("board", "index")
+
+    def __init__(self, board: Board, index: int):
+        self.board = board
+        self.index = index
+
+    def __getitem__(self, field: int):
+        if field == CELL_VALUE:
+            return int(self.board.values[self.index])
+
+        elif field == CELL_STATE:
+            return int(self.board.states[self.index])
+
+        elif field == IS_COLLECTED:
+            return bool(self.board.collected[self.index])
+
+        raise IndexError(field)
+
+    def __setitem__(self, field: int, value):
+        if field == CELL_VALUE:
+            self.board.values[self.index] = value
+
+        elif field == CELL_STATE:
+            self.board.states[self.index] = value
+
+        elif field == IS_COLLECTED:
+            self.board.collected[self.index] = value
+
+        else:
+            raise IndexError(field)
+
+    def __len__(self) -> int:
+        return 3
+
+    def __iter__(self):
+        return iter((self[CELL_VALUE], self[CELL_STATE], self[IS_COLLECTED]))
@@ -0,0 +1,637 @@
+"""
+Projet démineur
+Auteurs :   Mathis Bulka
+            Samuel Cornier
+            Léo Simon
+            Sacha Trouvé
+
+    Module economy: simulation de parties entières par des robots, pour régler
+    l'économie du jeu
+
+    python economy.py --campaigns 2000 --policies random solver greedy --output metrics
+    python economy.py --campaigns 500 --coin-reward 4000 --prices 15 10 20
+    python economy.py --campaigns 500 --loot other_loot.json --item-percentage 5
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import random
+import sys
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy
+
+import engine as rules
+from engine import Engine, Inventory
+from loot import LOOT, load_loot
+from solver import Solver
+
+LEFT_CLICK = 1
+
+BOMB = -1
+COIN = -2
+MAGNIFIER = -3
+SHIELD = -5
+UPGRADER = -6
+ARMOR = -8
+JAMMER = -9
+
+FLAGGED, HIDDEN, NOT_HIDDEN = -1, 0, 1
+NOT_COLLECTED = False
+
+# la durée d'une action d'un robot, dans l'unité de Game.initial_time (un
+# soixantième de seconde fait dix unités) : un joueur clique à peu près une
+# fois par seconde
+ACTION_TIME = 160
+# le nombre de parties jouées par un processus à la fois
+BATCH = 8
+# le nombre de lots en cours par processus
+IN_FLIGHT = 2
+
+# les colonnes écrites, une par fichier, et leur type
+COLUMNS = [
+    ("campaign", "<i4"),
+    ("policy", "i1"),
+    ("round", "i1"),
+    ("won", "?"),
+    ("lost", "?"),
+    ("actions", "<i4"),
+    ("guesses", "<i4"),
+    ("coins_spent", "<i4"),
+    ("coins_earned", "<i4"),
+    ("coins", "<i4"),
+    ("items_found", "<i4"),
+    ("magnifiers_used", "<i4"),
+    ("protection", "i1"),
+    ("bombs_absorbed", "<i4")
+]
+
+
+class Policy(ABC):
+    """
+    A bot that plays rounds and visits the trader. A policy only chooses the
+    actions; play_round plays them through the engine, like the game would.
+
+    Parameters
+    ----------
+    rng : random.Random
+        The random generator of the campaign.
+
+    Attributes
+    ----------
+    guesses : int
+        The number of cells dug in the round without knowing they were safe.
+    """
+
+    name = None
+
+    def __init__(self, rng: random.Random):
+        self.rng = rng
+        self.guesses = 0
+
+    def shop(self, inventory: Inventory) -> list[int]:
+        """
+        Returns the items to buy from the trader, in order. An item the player
+        cannot pay any more is not bought.
+        """
+        return []
+
+    def start(self, engine: Engine) -> list[int]:
+        """
+        Returns the items to use at the start of a round, before the first
+        click.
+        """
+        return []
+
+    @abstractmethod
+    def act(self, engine: Engine) -> list[tuple]:
+        """
+        Returns the next actions of the round, as ("click", cell) or
+        ("use", item) tuples. A cell of a click is chosen with the board as it
+        is once the actions before it are played.
+        """
+
+    def pick_up(self, engine: Engine) -> list[tuple]:
+        """
+        Returns the actions picking the revealed items up, the magnifier being
+        put away first since it stops the pickup.
+        """
+        board = engine.board
+        items = uncollected_items(engine)
+        if not len(items):
+            return []
+
+        actions = [("click", board.cell(int(index))) for index in items]
+        if engine.inventory.active_equipped == MAGNIFIER:
+            actions.insert(0, ("use", MAGNIFIER))
+
+        return actions
+
+
+class RandomPolicy(Policy):
+    """
+    Digs random hidden cells, picks the items it sees up and buys a random
+    item at every visit.
+    """
+
+    name = "random"
+
+    def shop(self, inventory: Inventory) -> list[int]:
+        return [self.rng.choice(list(rules.PRICES))]
+
+    def act(self, engine: Engine) -> list[tuple]:
+        board = engine.board
+        picked = self.pick_up(engine)
+        if picked:
+            return picked
+
+        hidden = numpy.flatnonzero(board.states == HIDDEN)
+        self.guesses += 1
+
+        return [("click", board.cell(int(hidden[self.rng.randrange(len(hidden))])))]
+
+
+class SolverPolicy(Policy):
+    """
+    Digs the cells the solver proves safe, guesses with a magnifier when it is
+    stuck, and digs the cells it proves to hold an object last, since the
+    items in them must be dug for the round to be won. It keeps a shield
+    equipped and buys one shield and one magnifier when it has none.
+    """
+
+    name = "solver"
+
+    def __init__(self, rng: random.Random):
+        super().__init__(rng)
+        self.solver = None
+
+    def shop(self, inventory: Inventory) -> list[int]:
+        return [item for item in [SHIELD, MAGNIFIER]
+                if inventory.amounts[item] == 0 and not (item == SHIELD and inventory.passive_equipped)]
+
+    def start(self, engine: Engine) -> list[int]:
+        self.solver = Solver(engine.board, trust_flags=True)
+
+        if engine.inventory.passive_equipped is None:
+            return [item for item in [ARMOR, SHIELD] if engine.inventory.amounts[item]][:1]
+
+        return []
+
+    def deduce(self, engine: Engine) -> tuple[set, set, numpy.ndarray]:
+        """
+        Returns the safe cells, the cells holding an object and the flat indices
+        of the unknown cells. The only flags of a bot are the bombs its
+        magnifier found, so they are trusted.
+        """
+        board = engine.board
+        states, values = board.states, board.values
+        known = int(numpy.count_nonzero((states == FLAGGED)
+                                        | ((states == NOT_HIDDEN) & (values < 0) & (values != JAMMER))))
+        safe, objects = self.solver.solve(engine.flag_to_place + known)
+
+        return safe, objects, numpy.flatnonzero(states == HIDDEN)
+
+    def act(self, engine: Engine) -> list[tuple]:
+        board = engine.board
+        picked = self.pick_up(engine)
+        if picked:
+            return picked
+
+        safe, objects, hidden = self.deduce(engine)
+        if safe:
+            return [("click", cell) for cell in sorted(safe)]
+
+        objects = {board.index(cell) for cell in objects}
+        others = [int(index) for index in hidden if int(index) not in objects]
+
+        # sans case sûre, on devine parmi les cases inconnues, ou on creuse
+        # les objets trouvés : il faut les creuser pour gagner la manche, et
+        # rien ne dit si c'est une bombe ou un objet
+        self.guesses += 1
+
+        cell = board.cell(self.rng.choice(others) if others else min(objects))
+
+        return self.protect(engine) + [("click", cell)]
+
+    def protect(self, engine: Engine) -> list[tuple]:
+        """
+        Returns the actions equipping a magnifier before a risky dig, if the
+        player has one.
+        """
+        inventory = engine.inventory
+        if inventory.active_equipped != MAGNIFIER and inventory.amounts[MAGNIFIER] > 0:
+            return [("use", MAGNIFIER)]
+
+        return []
+
+
+class GreedyPolicy(SolverPolicy):
+    """
+    Plays like SolverPolicy, but digs the objects as soon as they are found
+    when a shield, an armor or a magnifier covers the dig, spends all its
+    coins at the trader and upgrades its shields into armors.
+    """
+
+    name = "greedy"
+
+    def shop(self, inventory: Inventory) -> list[int]:
+        prices = rules.PRICES
+        cheapest = min(prices.values())
+        coins = inventory.amounts[COIN]
+        bought = []
+
+        # un objet de chaque à tour de rôle, tant que les pièces suffisent
+        while coins >= cheapest:
+            for item, price in prices.items():
+                if coins >= price:
+                    bought.append(item)
+                    coins -= price
+
+        return bought
+
+    def start(self, engine: Engine) -> list[int]:
+        inventory = engine.inventory
+        used = []
+
+        if inventory.amounts[UPGRADER] > 0 and inventory.amounts[SHIELD] > 0:
+            used += [UPGRADER, SHIELD]
+
+        return used + super().start(engine)
+
+    def act(self, engine: Engine) -> list[tuple]:
+        board = engine.board
+        picked = self.pick_up(engine)
+        if picked:
+            return picked
+
+        safe, objects, hidden = self.deduce(engine)
+        inventory = engine.inventory
+        if objects and (inventory.passive_equipped is not None or inventory.amounts[MAGNIFIER] > 0
+                        or inventory.active_equipped == MAGNIFIER):
+            # un objet creusé peut être une bombe
+            self.guesses += 1
+
+            return self.protect(engine) + [("click", min(objects))]
+
+        if safe:
+            return [("click", cell) for cell in sorted(safe)]
+
+        self.guesses += 1
+
+        return self.protect(engine) + [("click", board.cell(int(hidden[self.rng.randrange(len(hidden))])))]
+
+
+POLICIES = {policy.name: policy for policy in [RandomPolicy, SolverPolicy, GreedyPolicy]}
+
+
+def uncollected_items(engine: Engine) -> numpy.ndarray:
+    """
+    Returns the flat indices of the revealed items not picked up yet.
+    """
+    board = engine.board
+    values = board.values
+
+    return numpy.flatnonzero((board.states == NOT_HIDDEN) & (values < BOMB) & (values != JAMMER)
+                             & (board.collected == NOT_COLLECTED))
+
+
+def play_round(engine: Engine, policy: Policy) -> dict[str, int]:
+    """
+    Plays a round with a policy, from the first click at the center of the
+    board until it is won or lost.
+
+    Parameters
+    ----------
+    engine : Engine
+        The engine of the round, not clicked yet.
+    policy : Policy
+        The bot playing.
+
+    Returns
+    -------
+    row : dict[str, int]
+        The metrics of the round that the engine does not keep.
+    """
+    board = engine.board
+    inventory = engine.inventory
+    actions = magnifiers = 0
+    policy.guesses = 0
+
+    for item in policy.start(engine):
+        engine.use(item)
+        actions += 1
+
+    protection = inventory.passive_equipped or 0
+    cell = (board.width // 2, board.height // 2)
+    engine.create_grid(cell)
+    engine.click(LEFT_CLICK, cell)
+    actions += 1
+
+    while not engine.lost and not engine.is_won():
+        for kind, argument in policy.act(engine):
+            if kind == "use":
+                engine.use(argument)
+
+            else:
+                index = board.index(argument)
+                # un clic sur un nombre creuserait autour de lui : seules les
+                # cases cachées et les objets à ramasser sont cliqués
+                if board.states[index] == HIDDEN or (board.states[index] == NOT_HIDDEN and board.values[index] < BOMB
+                                                     and board.collected[index] == NOT_COLLECTED):
+                    # la loupe n'est consommée que par la bombe qu'elle trouve
+                    equipped = inventory.active_equipped == MAGNIFIER
+                    engine.click(LEFT_CLICK, argument)
+                    magnifiers += equipped and inventory.active_equipped != MAGNIFIER
+
+                else:
+                    continue
+
+            actions += 1
+
+            if engine.lost or engine.is_won():
+                break
+
+    return {"actions": actions, "guesses": policy.guesses, "magnifiers_used": magnifiers,
+            "protection": protection}
+
+
+def play_campaign(policy_name: str, campaign: int, seed: int, rounds: int,
+                  width: int, height: int) -> list[dict[str, int]]:
+    """
+    Plays a campaign: rounds one after the other with the same inventory, with
+    a visit to the trader before every round from the third on, as in the
+    game, until a round is lost or the last one is won.
+
+    Parameters
+    ----------
+    policy_name : str
+        The bot playing, a key of POLICIES.
+    campaign : int
+        The number of the campaign, from which its seed is drawn.
+    seed : int
+        The seed of the simulation.
+    rounds : int
+        The number of rounds of a campaign.
+    width, height : int
+        The size of the boards.
+
+    Returns
+    -------
+    rows : list[dict[str, int]]
+        The metrics of every round played.
+    """
+    rng = random.Random(f"{seed}-{policy_name}-{campaign}")
+    policy = POLICIES[policy_name](rng)
+    inventory = Inventory()
+    rows = []
+
+    for round_number in range(1, rounds + 1):
+        spent = 0
+
+        if round_number >= 3:
+            for item in policy.shop(inventory):
+                price = rules.PRICES[item]
+                if inventory.amounts[COIN] >= price:
+                    inventory.amounts[COIN] -= price
+                    inventory.picked(item)
+                    spent += price
+
+        engine = Engine(width, height, round_number, inventory, rng=rng)
+        row = play_round(engine, policy)
+        won = engine.is_won() and not engine.lost
+        earned = engine.finish_round(row["actions"] * ACTION_TIME) if won else 0
+
+        row.update(campaign=campaign, policy=list(POLICIES).index(policy_name), round=round_number,
+                   won=won, lost=engine.lost, coins_spent=spent, coins_earned=earned,
+                   coins=inventory.amounts[COIN], items_found=int(numpy.count_nonzero(engine.board.collected)),
+                   bombs_absorbed=engine.bombs_absorbed)
+        rows.append(row)
+
+        if engine.lost:
+            break
+
+    return rows
+
+
+def configure(settings: dict):
+    """
+    Sets the economy rules of the engine to the ones tried, in the process
+    playing the campaigns.
+
+    Parameters
+    ----------
+    settings : dict
+        The values of COIN_REWARD and PRICES to use, by name, and the data of
+        the loot table as LOOT; the missing ones keep the values of the game.
+
+    Returns
+    -------
+    None
+    """
+    for name, value in settings.items():
+        if name == "PRICES":
+            rules.PRICES.update(value)
+
+        elif name == "LOOT":
+            LOOT.update(value)
+
+        else:
+            setattr(rules, name, value)
+
+
+def play_batch(policy_name: str, first: int, count: int, seed: int, rounds: int,
+               width: int, height: int, settings: dict) -> dict[str, numpy.ndarray]:
+    """
+    Plays a batch of campaigns, in a process of the pool.
+
+    Returns
+    -------
+    table : dict[str, numpy.ndarray]
+        One array per column of COLUMNS, one row per round played.
+    """
+    configure(settings)
+    rows = []
+    for campaign in range(first, first + count):
+        rows += play_campaign(policy_name, campaign, seed, rounds, width, height)
+
+    return {name: numpy.array([row[name] for row in rows], dtype=dtype) for name, dtype in COLUMNS}
+
+
+class MetricsWriter:
+    """
+    Streams the rows of the rounds played to a columnar store: a directory
+    holding one raw little-endian file per column, which only grows, and a
+    schema.json naming the columns and their type. A column is read back
+    whole with numpy.fromfile, without the others.
+
+    It is a context manager, which closes the files on the way out, even when
+    a batch fails.
+
+    Parameters
+    ----------
+    directory : str
+        The directory of the store, created if needed. The files of a previous
+        store in it are replaced.
+
+    Attributes
+    ----------
+    files : dict[str, file]
+        The file of every column.
+    stack : contextlib.ExitStack
+        The files to close.
+    rows : int
+        The number of rows written.
+    """
+
+    def __init__(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+
+        with open(os.path.join(directory, "schema.json"), "w") as file:
+            json.dump({"columns": COLUMNS, "policies": list(POLICIES)}, file, indent=4)
+
+        # les fichiers déjà ouverts sont refermés si l'un d'eux ne s'ouvre pas
+        with contextlib.ExitStack() as stack:
+            self.files = {name: stack.enter_context(open(os.path.join(directory, f"{name}.bin"), "wb"))
+                          for name, _ in COLUMNS}
+            self.stack = stack.pop_all()
+
+        self.rows = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+    def append(self, table: dict[str, numpy.ndarray]):
+        """
+        Appends rows, given as one array per column.
+        """
+        for name, file in self.files.items():
+            table[name].tofile(file)
+            file.flush()
+
+        self.rows += len(table[COLUMNS[0][0]])
+
+    def close(self):
+        """
+        Closes the files of the columns.
+        """
+        self.stack.close()
+
+
+def read_metrics(directory: str, columns: list[str] = None) -> dict[str, numpy.ndarray]:
+    """
+    Reads columns written by MetricsWriter.
+
+    Parameters
+    ----------
+    directory : str
+        The directory of the store.
+    columns : list[str], optional
+        The columns to read. The default is None, for all of them.
+
+    Returns
+    -------
+    table : dict[str, numpy.ndarray]
+        One array per column.
+    """
+    with open(os.path.join(directory, "schema.json")) as file:
+        schema = json.load(file)
+
+    return {name: numpy.fromfile(os.path.join(directory, f"{name}.bin"), dtype=dtype)
+            for name, dtype in schema["columns"] if columns is None or name in columns}
+
+
+def report(table: dict[str, numpy.ndarray]) -> list[str]:
+    """
+    Returns one line of stats per policy and round number: the campaigns that
+    reached the round, the share of them that survived it, and the means of
+    the coins earned, the items found and the bombs absorbed.
+    """
+    lines = []
+
+    for code, name in enumerate(POLICIES):
+        for round_number in numpy.unique(table["round"][table["policy"] == code]):
+            rows = (table["policy"] == code) & (table["round"] == round_number)
+            reached = int(numpy.count_nonzero(rows))
+            lines.append(f"{name} round {round_number}: {reached} campaigns, "
+                         f"{numpy.mean(~table['lost'][rows]):.0%} survived, "
+                         f"{numpy.mean(table['coins_earned'][rows]):.1f} coins earned, "
+                         f"{numpy.mean(table['items_found'][rows]):.2f} items found, "
+                         f"{numpy.mean(table['bombs_absorbed'][rows]):.2f} bombs absorbed")
+
+    return lines
+
+
+def main(arguments: list[str] = None) -> int:
+    """
+    Plays the campaigns given on the command line over a pool of processes,
+    writes their metrics and prints their stats.
+    """
+    parser = argparse.ArgumentParser(description="Simulates full campaigns with bots to tune the economy of the game.")
+    parser.add_argument("--campaigns", type=int, default=1000, help="the number of campaigns per policy")
+    parser.add_argument("--policies", nargs="+", default=list(POLICIES), choices=list(POLICIES))
+    parser.add_argument("--rounds", type=int, default=6, help="the number of rounds of a campaign")
+    parser.add_argument("--size", type=int, nargs=2, default=[18, 18], metavar=("WIDTH", "HEIGHT"))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--output", default="metrics", help="the directory of the columnar store")
+    parser.add_argument("--loot", default=None, help="a loot table to try instead of loot.json")
+    parser.add_argument("--item-percentage", type=int, default=None)
+    parser.add_argument("--coin-reward", type=int, default=None)
+    parser.add_argument("--prices", type=int, nargs=3, default=None, metavar=("MAGNIFIER", "SHIELD", "UPGRADER"))
+    arguments = parser.parse_args(arguments)
+
+    settings = {}
+    if arguments.loot is not None or arguments.item_percentage is not None:
+        data = dict(LOOT.data if arguments.loot is None else load_loot(arguments.loot).data)
+        if arguments.item_percentage is not None:
+            data["item_percentage"] = arguments.item_percentage
+
+        settings["LOOT"] = data
+
+    if arguments.coin_reward is not None:
+        settings["COIN_REWARD"] = arguments.coin_reward
+
+    if arguments.prices is not None:
+        settings["PRICES"] = dict(zip([MAGNIFIER, SHIELD, UPGRADER], arguments.prices))
+
+    width, height = arguments.size
+    workers = arguments.workers or os.cpu_count() or 1
+    batches = [(policy, first, min(BATCH, arguments.campaigns - first))
+               for policy in arguments.policies for first in range(0, arguments.campaigns, BATCH)]
+    batches.reverse()
+
+    start = time.perf_counter()
+
+    with MetricsWriter(arguments.output) as writer, ProcessPoolExecutor(workers) as pool:
+        pending = set()
+
+        while batches or pending:
+            # les lots sont envoyés au fil de l'eau, pour écrire les résultats
+            # sans tous les garder
+            while batches and len(pending) < IN_FLIGHT * workers:
+                pending.add(pool.submit(play_batch, *batches.pop(), arguments.seed, arguments.rounds,
+                                        width, height, settings))
+
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                writer.append(future.result())
+
+    elapsed = time.perf_counter() - start
+
+    print("\n".join(report(read_metrics(arguments.output))))
+    print(f"{arguments.campaigns * len(arguments.policies)} campaigns, {writer.rows} rounds "
+          f"in {elapsed:.1f} s with {workers} processes: "
+          f"{arguments.campaigns * len(arguments.policies) / elapsed:.1f} campaigns/s")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
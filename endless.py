@@ -0,0 +1,489 @@
+"""
+Projet démineur
+Auteurs :   Mathis Bulka
+            Samuel Cornier
+            Léo Simon
+            Sacha Trouvé
+
+    Module endless: plateau sans fin, généré par morceaux à la demande
+"""
+
+import random
+import struct
+import zlib
+
+import numpy
+
+from board import Board, BoardView
+from engine import Engine, Inventory
+from inputlog import DEBUG, FIRST_CLICK, InputLog
+from loot import LOOT
+from topology import SQUARE
+
+BOMB = -1
+
+FLAGGED, HIDDEN, NOT_HIDDEN = -1, 0, 1
+NOT_COLLECTED, COLLECTED = False, True
+
+CHUNK_SIZE = 64
+CHUNK_SHIFT = 6
+
+# une région vide s'étend jusqu'à FLOOD_RADIUS morceaux de celui du clic : à
+# la densité de la manche 1, elle peut sinon couvrir des centaines de milliers
+# de cellules ; ses cellules vides au bord restent à cliquer pour la continuer
+FLOOD_RADIUS = 1
+
+# une cellule (x, y) a l'indice (y + ORIGIN) * SPAN + x + ORIGIN : les
+# coordonnées vont de -ORIGIN à ORIGIN - 1, et les indices tiennent sur 63 bits
+SPAN = 1 << 31
+ORIGIN = 1 << 30
+
+NEIGHBOUR_DELTAS = numpy.array([delta_row * SPAN + delta_column
+                                for delta_row in [-1, 0, 1] for delta_column in [-1, 0, 1]
+                                if (delta_row, delta_column) != (0, 0)], dtype=numpy.int64)
+
+
+def zigzag(number: int) -> int:
+    """
+    Maps the integers to the natural numbers, 0, -1, 1, -2... becoming 0, 1, 2,
+    3..., since a numpy seed cannot be negative.
+    """
+    return 2 * number if number >= 0 else -2 * number - 1
+
+
+class EndlessTable:
+    """
+    The neighbours of the cells of an endless board. They are computed from the
+    indices themselves, so nothing is stored; the methods are the ones of
+    NeighbourTable used by the game logic.
+    """
+
+    def around(self, index: int) -> numpy.ndarray:
+        """
+        Returns the eight neighbours of the given cell.
+        """
+        return index + NEIGHBOUR_DELTAS
+
+    def gather(self, indices: numpy.ndarray) -> numpy.ndarray:
+        """
+        Returns the neighbours of every given cell, one cell after the other.
+        """
+        return (numpy.asarray(indices, dtype=numpy.int64)[:, None] + NEIGHBOUR_DELTAS).ravel()
+
+    def around_all(self, indices: numpy.ndarray) -> numpy.ndarray:
+        """
+        Returns the sorted indices of every cell surrounding at least one of the
+        given cells.
+        """
+        return numpy.unique(self.gather(indices))
+
+
+class ChunkedArray:
+    """
+    One of the arrays of an endless board (the values, the states or the
+    collected flags), read and written with global indices like the flat arrays
+    of a Board, by a single index or by an array of them. Each access is sent to
+    the chunks holding the cells, which are generated the first time they are
+    touched.
+
+    Parameters
+    ----------
+    board : ChunkedBoard
+        The board whose chunks hold the cells.
+    field : str
+        The name of the array in the chunks: "values", "states" or "collected".
+    dtype : numpy.dtype
+        The type of the array.
+    """
+
+    def __init__(self, board: "ChunkedBoard", field: str, dtype):
+        self.board = board
+        self.field = field
+        self.dtype = dtype
+
+    def __getitem__(self, index):
+        if numpy.ndim(index) == 0:
+            chunk, local = self.board.locate(int(index))
+            return getattr(chunk, self.field)[local]
+
+        indices = numpy.asarray(index, dtype=numpy.int64)
+        result = numpy.empty(len(indices), dtype=self.dtype)
+
+        for chunk, where, local in self.board.locate_all(indices):
+            result[where] = getattr(chunk, self.field)[local]
+
+        return result
+
+    def __setitem__(self, index, value):
+        if numpy.ndim(index) == 0:
+            chunk, local = self.board.locate(int(index))
+            getattr(chunk, self.field)[local] = value
+            return
+
+        indices = numpy.asarray(index, dtype=numpy.int64)
+        for chunk, where, local in self.board.locate_all(indices):
+            getattr(chunk, self.field)[local] = value if numpy.ndim(value) == 0 else numpy.asarray(value)[where]
+
+
+class ChunkedBoard(Board):
+    """
+    A board without edges, cut into chunks of CHUNK_SIZE x CHUNK_SIZE cells,
+    each one a small Board of its own. A chunk is generated the first time one
+    of its cells is read or written; the chunks never touched take no memory,
+    even when they are shown hidden on the screen.
+
+    The objects of a chunk only depend on the seed of the board, on the
+    coordinates of the chunk and on the safe zone of the first click, so that a
+    chunk can be generated in any order. The numbers of the border cells are
+    counted with the objects of the eight chunks around, which are drawn again
+    for it without being kept: they match what these chunks hold once
+    generated.
+
+    The cells are identified by global indices (see SPAN and ORIGIN), which the
+    methods inherited from Board, like reveal(), use as they use flat indices:
+    a flood reveal goes from one chunk to the next without seeing the
+    boundary.
+
+    Parameters
+    ----------
+    seed : int
+        The seed of the board.
+    bomb_probability : float
+        The probability for a cell to hold a bomb.
+    item_probability : float
+        The probability for a cell to hold an item.
+    item_weights : dict[int, float]
+        The probability of each item, for a cell holding one.
+
+    Attributes
+    ----------
+    seed : int
+        The seed of the board.
+    bomb_probability : float
+        The probability for a cell to hold a bomb.
+    item_probability : float
+        The probability for a cell to hold an item.
+    item_weights : dict[int, float]
+        The probability of each item, for a cell holding one.
+    chunks : dict[tuple[int, int], Board]
+        The chunks generated so far, keyed by (column, row) of chunk.
+    safe : set[int]
+        The indices of the first cell clicked and of its neighbours, which hold
+        no object.
+    table : EndlessTable
+        The neighbours of every cell.
+    values, states, collected : ChunkedArray
+        The arrays of the board, indexed by global indices.
+    view : BoardView
+        A dict-like view keyed by (x, y) tuples.
+    """
+
+    def __init__(self, seed: int, bomb_probability: float, item_probability: float,
+                 item_weights: dict[int, float]):
+        self.width = None
+        self.height = None
+        self.size = None
+        self.seed = seed
+        self.bomb_probability = bomb_probability
+        self.item_probability = item_probability
+        self.item_weights = item_weights
+        self.chunks = {}
+        self.safe = set()
+        self.table = EndlessTable()
+        self.values = ChunkedArray(self, "values", numpy.int8)
+        self.states = ChunkedArray(self, "states", numpy.int8)
+        self.collected = ChunkedArray(self, "collected", numpy.bool_)
+        self.view = BoardView(self)
+
+    def __contains__(self, cell: tuple[int, int]) -> bool:
+        return -ORIGIN <= cell[0] < ORIGIN and -ORIGIN <= cell[1] < ORIGIN
+
+    def index(self, cell: tuple[int, int]) -> int:
+        """
+        Returns the global index of the given cell.
+        """
+        return (cell[1] + ORIGIN) * SPAN + cell[0] + ORIGIN
+
+    def cell(self, index: int) -> tuple[int, int]:
+        """
+        Returns the (x, y) coordinates of the given global index.
+        """
+        return (index % SPAN - ORIGIN, index // SPAN - ORIGIN)
+
+    def locate(self, index: int) -> tuple[Board, int]:
+        """
+        Returns the chunk holding the given cell, generated if needed, and the
+        flat index of the cell in it.
+        """
+        x, y = self.cell(index)
+
+        return (self.chunk((x >> CHUNK_SHIFT, y >> CHUNK_SHIFT)),
+                (y & (CHUNK_SIZE - 1)) * CHUNK_SIZE + (x & (CHUNK_SIZE - 1)))
+
+    def locate_all(self, indices: numpy.ndarray):
+        """
+        Yields, for every chunk holding some of the given cells, the chunk, the
+        positions of these cells in indices and their flat indices in the
+        chunk.
+        """
+        xs = indices % SPAN - ORIGIN
+        ys = indices // SPAN - ORIGIN
+        columns = xs >> CHUNK_SHIFT
+        rows = ys >> CHUNK_SHIFT
+        locals_ = (ys & (CHUNK_SIZE - 1)) * CHUNK_SIZE + (xs & (CHUNK_SIZE - 1))
+
+        keys = rows * SPAN + columns
+        for key in numpy.unique(keys).tolist():
+            where = numpy.flatnonzero(keys == key)
+            first = where[0]
+
+            yield self.chunk((int(columns[first]), int(rows[first]))), where, locals_[where]
+
+    def chunk(self, key: tuple[int, int]) -> Board:
+        """
+        Returns a chunk, generated the first time it is asked for.
+        """
+        chunk = self.chunks.get(key)
+
+        if chunk is None:
+            chunk = self.generate(key)
+            self.chunks[key] = chunk
+
+        return chunk
+
+    def objects(self, key: tuple[int, int]) -> numpy.ndarray:
+        """
+        Draws the bombs and the items of a chunk, from the seed of the board and
+        the coordinates of the chunk only.
+
+        Returns
+        -------
+        objects : numpy.ndarray
+            A (CHUNK_SIZE, CHUNK_SIZE) array holding the value of the object of
+            each cell, or 0.
+        """
+        rng = numpy.random.default_rng([self.seed, zigzag(key[0]), zigzag(key[1])])
+        draws = rng.random((CHUNK_SIZE, CHUNK_SIZE))
+
+        objects = numpy.zeros((CHUNK_SIZE, CHUNK_SIZE), dtype=numpy.int8)
+        objects[draws < self.bomb_probability] = BOMB
+
+        items = (self.bomb_probability <= draws) & (draws < self.bomb_probability + self.item_probability)
+        if self.item_weights:
+            objects[items] = rng.choice(list(self.item_weights), size=int(items.sum()),
+                                        p=list(self.item_weights.values()))
+
+        # la zone du premier clic ne contient aucun objet
+        for index in self.safe:
+            x, y = self.cell(index)
+
+            if (x >> CHUNK_SHIFT, y >> CHUNK_SHIFT) == key:
+                objects[y & (CHUNK_SIZE - 1), x & (CHUNK_SIZE - 1)] = 0
+
+        return objects
+
+    def generate(self, key: tuple[int, int]) -> Board:
+        """
+        Generates a chunk: its objects, and the number of objects around each
+        other cell, counted with the objects of the chunks around it.
+        """
+        # les objets du morceau, avec une bordure d'une cellule prise chez ses
+        # voisins
+        padded = numpy.block([[self.objects((key[0] + delta_column, key[1] + delta_row))
+                               for delta_column in [-1, 0, 1]] for delta_row in [-1, 0, 1]])
+        padded = padded[CHUNK_SIZE - 1:2 * CHUNK_SIZE + 1, CHUNK_SIZE - 1:2 * CHUNK_SIZE + 1]
+
+        mask = (padded < 0).astype(numpy.int8)
+        counts = numpy.zeros((CHUNK_SIZE, CHUNK_SIZE), dtype=numpy.int8)
+        for delta_row in [-1, 0, 1]:
+            for delta_column in [-1, 0, 1]:
+                if (delta_row, delta_column) != (0, 0):
+                    counts += mask[1 + delta_row:1 + delta_row + CHUNK_SIZE,
+                                   1 + delta_column:1 + delta_column + CHUNK_SIZE]
+
+        objects = padded[1:-1, 1:-1]
+        chunk = Board(CHUNK_SIZE, CHUNK_SIZE)
+        chunk.values[:] = numpy.where(objects < 0, objects, counts).ravel()
+
+        return chunk
+
+    def area(self, x, y, width, height):
+        """
+        Returns the values, the states and the collected flags of a rectangle of
+        cells. The chunks never touched are not generated: their cells are
+        returned hidden.
+        """
+        values = numpy.zeros((height, width), dtype=numpy.int8)
+        states = numpy.full((height, width), HIDDEN, dtype=numpy.int8)
+        collected = numpy.full((height, width), NOT_COLLECTED, dtype=numpy.bool_)
+
+        for row in range(y >> CHUNK_SHIFT, ((y + height - 1) >> CHUNK_SHIFT) + 1):
+            for column in range(x >> CHUNK_SHIFT, ((x + width - 1) >> CHUNK_SHIFT) + 1):
+                chunk = self.chunks.get((column, row))
+
+                if chunk is None:
+                    continue
+
+                # le rectangle commun au morceau et à la zone demandée
+                left = max(x, column * CHUNK_SIZE)
+                top = max(y, row * CHUNK_SIZE)
+                right = min(x + width, (column + 1) * CHUNK_SIZE)
+                bottom = min(y + height, (row + 1) * CHUNK_SIZE)
+                target = (slice(top - y, bottom - y), slice(left - x, right - x))
+                source = (slice(top - row * CHUNK_SIZE, bottom - row * CHUNK_SIZE),
+                          slice(left - column * CHUNK_SIZE, right - column * CHUNK_SIZE))
+
+                values[target] = chunk.as_2d(chunk.values)[source]
+                states[target] = chunk.as_2d(chunk.states)[source]
+                collected[target] = chunk.as_2d(chunk.collected)[source]
+
+        return values, states, collected
+
+    def animated(self):
+        """
+        Returns the global indices of the cells drawn with an animation, in the
+        chunks generated so far.
+        """
+        animated = [numpy.zeros(0, dtype=numpy.int64)]
+
+        for (column, row), chunk in self.chunks.items():
+            local = chunk.animated()
+            xs = column * CHUNK_SIZE + local % CHUNK_SIZE
+            ys = row * CHUNK_SIZE + local // CHUNK_SIZE
+            animated.append((ys + ORIGIN) * SPAN + xs + ORIGIN)
+
+        return numpy.concatenate(animated)
+
+    def digest(self, value=0):
+        """
+        Returns a CRC-32 of the chunks played on, in the order of their
+        coordinates. A chunk only generated, because it was read around a
+        played cell, is still hidden and is left out, so that the digest does
+        not depend on what was drawn on the screen.
+        """
+        for key in sorted(self.chunks):
+            chunk = self.chunks[key]
+
+            if (chunk.states != HIDDEN).any() or chunk.collected.any():
+                value = chunk.digest(zlib.crc32(struct.pack("<2i", *key), value))
+
+        return value
+
+    def spreading(self, cells, index):
+        """
+        Returns the empty cells among the given ones that lie within
+        FLOOD_RADIUS chunks of the chunk of index, where the flood started:
+        the flood stops there, so that a click reveals a bounded number of
+        cells and generates a bounded number of chunks.
+        """
+        x, y = self.cell(index)
+        xs = cells % SPAN - ORIGIN
+        ys = cells // SPAN - ORIGIN
+        near = ((numpy.abs((xs >> CHUNK_SHIFT) - (x >> CHUNK_SHIFT)) <= FLOOD_RADIUS)
+                & (numpy.abs((ys >> CHUNK_SHIFT) - (y >> CHUNK_SHIFT)) <= FLOOD_RADIUS))
+        cells = cells[near]
+
+        return cells[self.values[cells] == 0]
+
+    def safe_zone(self, cell):
+        """
+        Returns the sorted global indices of the given cell and its neighbours.
+        """
+        index = self.index(cell)
+
+        return numpy.sort(numpy.append(self.table.around(index), index))
+
+    def place(self, cell, items_to_pick, rng):
+        """
+        Keeps the first cell clicked and its neighbours free of objects. Nothing
+        is placed: the chunks draw their objects when they are generated, so
+        items_to_pick and rng are not used.
+        """
+        del items_to_pick, rng
+
+        self.safe = set(self.safe_zone(cell).tolist())
+        self.chunks.clear()
+
+
+class EndlessEngine(Engine):
+    """
+    The rules of an endless round, played on a ChunkedBoard. The bombs and the
+    items are as frequent as in a round of the same number, as given by the
+    loot table: its percentage of bombs, and its items spread according to
+    their chances. There is no flag to count down and the round cannot be won,
+    only lost.
+
+    Parameters
+    ----------
+    round_number : int, optional
+        The number of the round. The default is 1.
+    inventory : Inventory, optional
+        The items of the player. The default is an empty inventory.
+    rng : random.Random, optional
+        The random generator the seed of the board is drawn from, when none is
+        given. The default is the random module itself.
+    seed : int, optional
+        The seed of the board. The default is a seed drawn from rng.
+
+    Attributes
+    ----------
+    seed : int
+        The seed of the board.
+
+    The other attributes are the ones of Engine.
+    """
+
+    def __init__(self, round_number: int = 1, inventory: Inventory = None,
+                 rng: random.Random = random, seed: int = None):
+        self.initialize(round_number, inventory, rng, seed)
+
+        loot = LOOT.round(self.round)
+        self.board = ChunkedBoard(self.seed, loot.bomb_percentage / 100,
+                                  loot.bomb_percentage / 100 * loot.item_percentage / 100, loot.weights)
+        self.items_to_pick = {}
+        self.number_of_item_to_place = 0
+        self.flag_to_place = 0
+        self.safe_cells_number = None
+        # les morceaux tirent leurs objets eux-mêmes : la graine des
+        # dispositions n'est tirée que pour que l'attribut existe
+        self.layout_seed = self.rng.getrandbits(64)
+        # un plateau sans fin n'a pas de taille
+        self.log = InputLog(self.seed, self.round, 0, 0, SQUARE, True, self.inventory)
+
+    def create_grid(self, cell: tuple[int, int], candidate: int = 0):
+        """
+        Keeps the given cell and its neighbours free of objects. The chunks are
+        generated later, when they are touched, so there is no layout to pick
+        and candidate is ignored.
+        """
+        del candidate
+
+        self.log.append(FIRST_CLICK, 0, self.inventory, cell)
+        self.board.place(cell, self.items_to_pick, None)
+
+    def debug(self):
+        """
+        Reveals the chunks generated so far: the items are collected and the
+        bombs flagged.
+        """
+        self.log.append(DEBUG, 0, self.inventory)
+
+        for chunk in self.board.chunks.values():
+            values, states = chunk.values, chunk.states
+            items = (values < -1) & (states == HIDDEN)
+            bombs = (values == BOMB) & (states == HIDDEN)
+
+            for item in values[items].tolist():
+                self.inventory.picked(item)
+                self.inventory.discover(item)
+
+            self.flag_to_place -= int(numpy.count_nonzero(items)) + int(numpy.count_nonzero(bombs))
+            chunk.collected[items] = COLLECTED
+            states[items | ((values >= 0) & (states == HIDDEN))] = NOT_HIDDEN
+            states[bombs] = FLAGGED
+
+    def is_won(self) -> bool:
+        """
+        Returns False: an endless round cannot be won.
+        """
+        return False
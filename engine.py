@@ -0,0 +1,556 @@
+"""
+Projet démineur
+Auteurs :   Mathis Bulka
+            Samuel Cornier
+            Léo Simon
+            Sacha Trouvé
+
+    Module engine: règles du jeu, sans affichage ni pygame
+"""
+
+import random
+import struct
+import zlib
+
+import numpy
+
+from board import Board
+from inputlog import CLICK, DEBUG, FINISH, FIRST_CLICK, LAYOUT, USE, InputLog
+from loot import LOOT
+from topology import SQUARE, Topology
+
+LEFT_CLICK, MIDDLE_CLICK, RIGHT_CLICK, WHEELUP, WHEELDOWN = list(range(1, 6))
+
+BOMB = -1
+COIN = -2
+MAGNIFIER = -3
+METAL_SCRAP = -4
+SHIELD = -5
+UPGRADER = -6
+BIONIC_GLASSES = -7
+ARMOR = -8
+JAMMER = -9
+RIFLE = -10
+
+ITEMS = [COIN, MAGNIFIER, METAL_SCRAP, SHIELD, UPGRADER, BIONIC_GLASSES, ARMOR, JAMMER, RIFLE]
+PASSIVE_ITEMS = [SHIELD, ARMOR]
+
+HEALTH_POINTS = {
+    SHIELD: 1,
+    ARMOR: 2
+}
+
+UPGRADED = {
+    MAGNIFIER: BIONIC_GLASSES,
+    SHIELD: ARMOR
+}
+
+# les pièces gagnées en fin de manche : COIN_REWARD divisé par la durée
+COIN_REWARD = 2000
+
+# les prix du marchand, en pièces
+PRICES = {
+    MAGNIFIER: 10,
+    SHIELD: 10,
+    UPGRADER: 10
+}
+
+FLAGGED, HIDDEN, NOT_HIDDEN = -1, 0, 1
+NOT_COLLECTED, COLLECTED = False, True
+
+
+class Inventory:
+    """
+    The items of the player and their equipment, kept from one round to the
+    next.
+
+    Attributes
+    ----------
+    amounts : dict[int, int]
+        The amount of each item.
+    health : dict[int, int]
+        The health points left of each passive item.
+    active_equipped : int or None
+        The active item equipped.
+    passive_equipped : int or None
+        The passive item equipped.
+    discovered_items : list[int]
+        The items the player has discovered, in the order they were.
+    """
+
+    def __init__(self):
+        self.amounts = dict.fromkeys(ITEMS, 0)
+        self.health = dict.fromkeys(PASSIVE_ITEMS, 0)
+        self.active_equipped = None
+        self.passive_equipped = None
+        self.discovered_items = []
+
+    def picked(self, item: int, amount: int = 1):
+        """
+        Adds some of an item to the inventory.
+        """
+        self.amounts[item] += amount
+
+    def discover(self, item: int):
+        """
+        Marks an item as discovered.
+        """
+        if not item in self.discovered_items:
+            self.discovered_items.append(item)
+
+    def use(self, item: int, is_trading: bool = False):
+        """
+        Uses an item of the inventory, like a click on it would: equips or
+        unequips it, upgrades it with the equipped upgrader, or turns five metal
+        scraps into a jammer.
+
+        Parameters
+        ----------
+        item : int
+            The item clicked.
+        is_trading : bool, optional
+            Whether the player is at the trader, where only the rifle can be
+            used. The default is False.
+
+        Returns
+        -------
+        None
+        """
+        if is_trading:
+            if item == RIFLE:
+                if self.active_equipped != item:
+                    self.active_equipped = item
+                    self.amounts[item] -= 1
+
+                else:
+                    self.picked(item)
+                    self.active_equipped = None
+
+        elif item == COIN:
+            pass
+
+        elif self.active_equipped == UPGRADER and self.amounts[item] > 0 and item in UPGRADED:
+            self.amounts[item] -= 1
+            self.discover(UPGRADED[item])
+            self.picked(UPGRADED[item])
+            self.active_equipped = None
+
+        elif item == METAL_SCRAP:
+            if self.amounts[item] >= 5:
+                self.amounts[item] -= 5
+                self.picked(JAMMER)
+                self.discover(JAMMER)
+
+        elif item in PASSIVE_ITEMS:
+            if self.passive_equipped is None and self.amounts[item] > 0:
+                self.health[item] = HEALTH_POINTS[item]
+                self.passive_equipped = item
+                self.amounts[item] -= 1
+
+        elif self.active_equipped == item:
+            self.picked(item)
+            self.active_equipped = None
+
+        elif self.amounts[item] > 0:
+            if self.active_equipped is not None:
+                self.picked(self.active_equipped)
+
+            self.active_equipped = item
+            self.amounts[item] -= 1
+
+    def damage(self):
+        """
+        Takes a health point from the passive item equipped, and unequips it
+        when it has none left.
+        """
+        self.health[self.passive_equipped] -= 1
+
+        if self.health[self.passive_equipped] == 0:
+            self.passive_equipped = None
+
+
+def layout_rng(seed: int, candidate: int) -> numpy.random.Generator:
+    """
+    Returns the random generator of a candidate layout of a board. The
+    candidate 0 is the layout of a plain round.
+    """
+    return numpy.random.default_rng(seed if candidate == 0 else [seed, candidate])
+
+
+class Engine:
+    """
+    The rules of a round: the generation of the board, the reveal, the flags,
+    the pickup of the items, the jammers, the damage taken by the shield and
+    the armor, and the score. It draws nothing, so that rounds can be played
+    without a display.
+
+    Parameters
+    ----------
+    width : int
+        The width of the board.
+    height : int
+        The height of the board.
+    round_number : int, optional
+        The number of the round. The default is 1.
+    inventory : Inventory, optional
+        The items of the player. The default is an empty inventory.
+    topology : Topology, optional
+        The shape of the board. The default is SQUARE.
+    rng : random.Random, optional
+        The random generator the seed of the round is drawn from, when none is
+        given. The default is the random module itself.
+    seed : int, optional
+        The seed of the round, from which the loot and the board are drawn. The
+        default is a seed drawn from rng.
+
+    Attributes
+    ----------
+    round : int
+        The number of the round.
+    seed : int
+        The seed of the round.
+    rng : random.Random
+        The random generator of the round, seeded with seed.
+    layout_seed : int
+        The seed the candidate layouts of the board are drawn from.
+    log : InputLog
+        The inputs of the round, from which replay.py plays it again.
+    inventory : Inventory
+        The items of the player.
+    board : Board
+        The cells of the board.
+    items_to_pick : dict[int, int]
+        The amount of each item (and of bombs) to place on the board.
+    number_of_item_to_place : int
+        The total number of items, bombs excluded, to place on the board.
+    flag_to_place : int
+        The number of flags left to place.
+    safe_cells_number : int
+        The number of cells without a bomb.
+    not_hidden_cells : int
+        The number of revealed cells without a bomb.
+    items_flagged : list[tuple[int, int]]
+        The cells holding an item that are flagged.
+    jammer_to_give_back : int
+        The number of jammers placed on the board, given back at the end of the
+        round.
+    is_first_click : bool
+        Whether no cell has been clicked yet.
+    lost : bool
+        Whether a bomb exploded with no protection.
+    bombs_absorbed : int
+        The number of bombs that exploded on the shield or the armor.
+    """
+
+    def __init__(self, width: int, height: int, round_number: int = 1,
+                 inventory: Inventory = None, topology: Topology = SQUARE,
+                 rng: random.Random = random, seed: int = None):
+        self.initialize(round_number, inventory, rng, seed)
+        self.board = Board(width, height, topology)
+
+        total_cells = width * height
+
+        # les objets sont tirés en une fois, avec un générateur numpy tiré de
+        # celui de la manche
+        self.items_to_pick = LOOT.draw(self.round, total_cells, numpy.random.default_rng(self.rng.getrandbits(64)))
+        loot = LOOT.round(self.round)
+        bomb_number = self.items_to_pick.get(BOMB, 0)
+        self.number_of_item_to_place = sum(self.items_to_pick.values()) - bomb_number - int(loot.bonus.sum())
+        self.flag_to_place = sum(self.items_to_pick.values())
+        self.safe_cells_number = total_cells - bomb_number
+        # le générateur numpy est initialisé depuis celui de la manche
+        self.layout_seed = self.rng.getrandbits(64)
+        self.log = InputLog(self.seed, self.round, width, height, topology, False, self.inventory)
+
+    def initialize(self, round_number: int, inventory: Inventory, rng: random.Random, seed: int):
+        """
+        Sets up what every kind of round shares: its number, the inventory, the
+        seed and its generator, and the counters of a round not clicked yet.
+        The board, the loot and the log are left to the constructor.
+
+        Parameters
+        ----------
+        round_number : int
+            The number of the round.
+        inventory : Inventory
+            The items of the player, or None for an empty inventory.
+        rng : random.Random
+            The random generator the seed is drawn from, when none is given.
+        seed : int
+            The seed of the round, or None.
+
+        Returns
+        -------
+        None
+        """
+        self.round = round_number
+        self.inventory = Inventory() if inventory is None else inventory
+        self.seed = rng.getrandbits(64) if seed is None else seed
+        self.rng = random.Random(self.seed)
+        self.not_hidden_cells = 0
+        self.items_flagged = []
+        self.jammer_to_give_back = 0
+        self.is_first_click = True
+        self.lost = False
+        self.bombs_absorbed = 0
+
+    def create_grid(self, cell: tuple[int, int], candidate: int = 0):
+        """
+        Places the bombs and the items on the board, away from the given cell.
+
+        Parameters
+        ----------
+        cell : tuple[int, int]
+            The coordinates of the first cell clicked.
+        candidate : int, optional
+            The layout to place among the candidates drawn from layout_seed, as
+            picked by a no-guess search. The default is 0, the layout of a
+            plain round.
+
+        Returns
+        -------
+        None
+        """
+        if candidate:
+            self.log.append(LAYOUT, 0, self.inventory, cell, candidate)
+
+        self.log.append(FIRST_CLICK, 0, self.inventory, cell)
+        self.board.place(cell, self.items_to_pick, layout_rng(self.layout_seed, candidate))
+
+    def click(self, button: int, cell: tuple[int, int]) -> set[tuple[int, int]]:
+        """
+        Plays a click on a cell.
+
+        Parameters
+        ----------
+        button : int
+            The mouse button that was clicked, LEFT_CLICK or RIGHT_CLICK. Other
+            buttons do nothing.
+        cell : tuple[int, int]
+            The coordinates of the cell that was clicked.
+
+        Returns
+        -------
+        changed : set[tuple[int, int]]
+            The cells changed by the click.
+        """
+        self.log.append(CLICK, button, self.inventory, cell)
+
+        index = self.board.index(cell)
+        values, states = self.board.values, self.board.states
+        inventory = self.inventory
+        changed = []
+
+        if button == LEFT_CLICK:
+            if inventory.active_equipped == BIONIC_GLASSES and not self.is_first_click:
+                for temp_index in [index, *self.board.table.around(index)]:
+                    if states[temp_index] == HIDDEN:
+                        inventory.active_equipped = MAGNIFIER
+                        changed += self.dig(temp_index)
+
+                inventory.active_equipped = None
+
+            elif states[index] == HIDDEN:
+                changed += self.dig(index)
+
+            elif inventory.active_equipped == MAGNIFIER:
+                pass
+
+            elif states[index] == NOT_HIDDEN and values[index] < -1 and values[index] != JAMMER:
+                if self.board.collected[index] == NOT_COLLECTED:
+                    inventory.picked(int(values[index]))
+                    self.board.collected[index] = COLLECTED
+                    changed.append(index)
+
+            elif states[index] == NOT_HIDDEN and inventory.active_equipped == JAMMER:
+                self.jammer_to_give_back += 1
+                values[index] = JAMMER
+                inventory.active_equipped = None
+                changed.append(index)
+
+            else:
+                for temp_index in self.board.table.around(index):
+                    if states[temp_index] == HIDDEN:
+                        changed += self.dig(temp_index)
+
+        elif button == RIGHT_CLICK:
+            if states[index] == HIDDEN:
+                states[index] = FLAGGED
+                self.flag_to_place -= 1
+
+                if values[index] < -1:
+                    self.items_flagged.append(cell)
+
+                changed.append(index)
+
+            elif states[index] == FLAGGED:
+                states[index] = HIDDEN
+                self.flag_to_place += 1
+
+                if values[index] < -1:
+                    self.items_flagged.remove(cell)
+
+                changed.append(index)
+
+        self.is_first_click = False
+
+        return {self.board.cell(int(changed_index)) for changed_index in changed}
+
+    def dig(self, index: int) -> list[int]:
+        """
+        Reveals a hidden cell, like a left click on it would.
+
+        A cell with no bomb nor item around it reveals the whole empty region
+        around it in a single pass.
+
+        Parameters
+        ----------
+        index : int
+            The flat index of the hidden cell.
+
+        Returns
+        -------
+        changed : list[int]
+            The flat indices of the cells changed.
+        """
+        values, states = self.board.values, self.board.states
+        inventory = self.inventory
+
+        if values[index] < 0:
+            self.flag_to_place -= 1
+
+            if values[index] == BOMB:
+                if inventory.active_equipped == MAGNIFIER:
+                    states[index] = FLAGGED
+                    inventory.active_equipped = None
+
+                else:
+                    states[index] = NOT_HIDDEN
+
+                    if (values[self.board.table.around(index)] == JAMMER).any():
+                        pass
+
+                    elif inventory.passive_equipped in PASSIVE_ITEMS:
+                        self.bombs_absorbed += 1
+                        inventory.damage()
+
+                    else:
+                        self.lost = True
+
+            else:
+                inventory.discover(int(values[index]))
+                states[index] = NOT_HIDDEN
+                self.not_hidden_cells += 1
+
+            return [index]
+
+        if inventory.active_equipped in [MAGNIFIER, BIONIC_GLASSES] and not self.is_first_click:
+            states[index] = NOT_HIDDEN
+            inventory.active_equipped = None
+            revealed = [index]
+
+        elif values[index] > 0:
+            # un nombre ne révèle que sa cellule
+            states[index] = NOT_HIDDEN
+            revealed = [index]
+
+        else:
+            revealed = self.board.reveal(index).tolist()
+
+        self.not_hidden_cells += len(revealed)
+
+        return revealed
+
+    def debug(self):
+        """
+        Reveals the whole board: the items are collected and the bombs
+        flagged.
+        """
+        self.log.append(DEBUG, 0, self.inventory)
+
+        values, states = self.board.values, self.board.states
+        items = values < -1
+        bombs = values == BOMB
+
+        # les objets dans l'ordre de leur première cellule, comme cellule par
+        # cellule
+        found, first_index, counts = numpy.unique(values[items], return_index=True, return_counts=True)
+        for position in numpy.argsort(first_index):
+            self.inventory.picked(int(found[position]), int(counts[position]))
+            self.inventory.discover(int(found[position]))
+
+        self.flag_to_place -= int(numpy.count_nonzero(items)) + int(numpy.count_nonzero(bombs))
+        self.board.collected[items] = COLLECTED
+        states[~bombs] = NOT_HIDDEN
+        states[bombs] = FLAGGED
+
+    def use(self, item: int):
+        """
+        Uses an item of the inventory during the round, like a click on it in
+        the sidebar would.
+        """
+        self.log.append(USE, item, self.inventory)
+        self.inventory.use(item)
+
+    def is_circled(self, cell: tuple[int, int]) -> bool:
+        """
+        Returns whether every cell around the given one is revealed or is a
+        flagged bomb or item.
+        """
+        all_cells = self.board.table.around(self.board.index(cell))
+        states = self.board.states[all_cells]
+
+        return bool(((states == NOT_HIDDEN) | ((states == FLAGGED) & (self.board.values[all_cells] < 0))).all())
+
+    def is_won(self) -> bool:
+        """
+        Returns whether every cell without a bomb has been revealed.
+        """
+        return self.not_hidden_cells == self.safe_cells_number
+
+    def finish_round(self, elapsed: int) -> int:
+        """
+        Gives the jammers placed on the board back, and the coins earned in the
+        round.
+
+        Parameters
+        ----------
+        elapsed : int
+            The duration of the round, in the unit of Game.initial_time.
+
+        Returns
+        -------
+        coins_earned : int
+            The coins earned: the faster the round, the more coins.
+        """
+        self.log.append(FINISH, 0, self.inventory, extra=int(elapsed))
+
+        self.inventory.picked(JAMMER, self.jammer_to_give_back)
+        coins_earned = COIN_REWARD // max(int(elapsed), 1) + self.round
+        self.inventory.picked(COIN, coins_earned)
+
+        return coins_earned
+
+    def digest(self) -> int:
+        """
+        Returns a CRC-32 of the board, of the counters of the round and of the
+        inventory, by which a replayed round is compared to the one recorded.
+        """
+        inventory = self.inventory
+        state = struct.pack(f"<4i?{len(ITEMS) + len(PASSIVE_ITEMS)}i2b",
+                            self.flag_to_place, self.not_hidden_cells, self.jammer_to_give_back,
+                            self.bombs_absorbed, self.lost,
+                            *[inventory.amounts[item] for item in ITEMS],
+                            *[inventory.health[item] for item in PASSIVE_ITEMS],
+                            inventory.active_equipped or 0, inventory.passive_equipped or 0)
+
+        return zlib.crc32(state + bytes(item & 0xFF for item in inventory.discovered_items),
+                          self.board.digest())
+
+    def close(self):
+        """
+        Ends the log of the round with the digest of its final state. Nothing
+        more is recorded afterwards.
+        """
+        if not self.log.closed:
+            self.log.close(self.digest(), self.inventory)
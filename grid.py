@@ -8,13 +8,19 @@ Auteurs :   Mathis Bulka
     Module grid: gestion de l'affichage du plateau de jeu
 """
 
+import numpy
 import pygame
-import random
 
-from anim import Spritesheet
+from animation import FLAG
+from atlas import BLUE_FLAG_TILE, HIDDEN_TILE, HOLE_TILE
+from endless import EndlessEngine
+from engine import Engine
+from topology import SQUARE, Topology
 
 LEFT_CLICK, MIDDLE_CLICK, RIGHT_CLICK, WHEELUP, WHEELDOWN = list(range(1, 6))
 
+BOARD_SCENE, TRADER_SCENE, DEATH_SCENE = list(range(3))
+
 BOMB = -1
 COIN = -2
 MAGNIFIER = -3
@@ -77,20 +83,6 @@ FRAME_AND_FPS_NUMBER = {
 
 FRAME_NUMBER, FPS_NUMBER = 0, 1
 
-ITEM_PER_ROUND = {
-    1: {COIN: 0, MAGNIFIER: 0, METAL_SCRAP: 0,
-        SHIELD: 0, BOMB: 10},
-
-    2: {COIN: 100, MAGNIFIER: 0, METAL_SCRAP: 0, 
-        SHIELD: 0, BOMB: 15},
-
-    3: {COIN: 65, MAGNIFIER: 20, METAL_SCRAP: 15,
-        SHIELD: 0, BOMB: 16},
-
-    4: {COIN: 63, MAGNIFIER: 15, METAL_SCRAP: 15,
-        SHIELD: 7, BOMB: 19}
-}
-
 CELL_VALUE, CELL_STATE, IS_COLLECTED = 0, 1, 2
 FLAGGED, HIDDEN, NOT_HIDDEN = -1, 0, 1
 NOT_COLLECTED, COLLECTED = False, True
@@ -107,7 +99,8 @@ COLORS = {-1: (66, 36, 66),
 
 class Grid:
     """
-    This class is used to manage the display of the game grid.
+    This class is used to manage the display of the game grid. The rules of
+    the round are played by its engine, which draws nothing.
 
     Parameters
     ----------
@@ -117,6 +110,13 @@ class Grid:
         The width of the grid.
     height : int
         The height of the grid.
+    topology : Topology, optional
+        The shape of the grid (SQUARE, TOROIDAL or HEXAGONAL). The default is
+        SQUARE.
+    endless : bool, optional
+        Whether the grid has no edges, its chunks being generated when they are
+        touched. width, height and topology are then ignored. The default is
+        False.
 
     Attributes
     ----------
@@ -126,10 +126,16 @@ class Grid:
         The width of the grid.
     height : int
         The height of the grid.
-    grid : dict
-        A dictionary that stores the state of each cell on the grid. The keys are
-        tuples of (x, y) coordinates, and the values are a list containing the
-        following values:
+    engine : Engine
+        The rules of the round, played on the inventory of the game: an
+        EndlessEngine for an endless grid, or the engine given for a round
+        resumed from a save.
+    board : Board
+        The flat typed arrays storing the cells of the grid, indexed by
+        ``y * width + x``.
+    grid : BoardView
+        A dict-like view of board. The keys are tuples of (x, y) coordinates,
+        and the values are indexable with the following fields:
 
         * CELL_VALUE: The value of the cell, which can be a number, a bomb, or an
           item.
@@ -138,131 +144,52 @@ class Grid:
         * IS_COLLECTED: A boolean value indicating whether the cell contains an
           item that has been collected.
 
-    bomb_number : int
-        The number of bombs on the grid. This value is calculated based on the
-        current round.
-    items_to_pick : dict
-        A dictionary that stores the number of items of each type that need to be
-        placed on the grid. The keys are the item types, and the values are the
-        number of items.
-    number_of_item_to_place : int
-        The total number of items that need to be placed on the grid. This value
-        is calculated based on the bomb_number and the current round.
-    flag_to_place : int
-        The number of flags that need to be placed on the grid. This value is
-        calculated based on the bomb_number and the number of items that need to
-        be placed.
-    safe_cells_number : int
-        The number of safe cells on the grid. This value is calculated based on
-        the total number of cells and the bomb_number.
-    not_hidden_cells : int
-        The number of cells that are not currently hidden. This value is updated
-        as cells are revealed or flagged.
-
     Methods
     -------
     get_all_cells_around(cell)
         Returns a list of all the cells surrounding the given cell.
-    create_grid(cell)
+    create_grid(cell, candidate=0)
         Creates a grid of bombs and items around the given cell.
     cell_clicked(button, cell, play_sound=True)
         Handles a click on a cell.
     __str__()
         Returns a string representation of the grid.
     display(cell)
-        Renders the grid on the screen.
+        Renders a cell of the grid on the screen, with a single blit of its
+        tile from the tile atlas of the game when it is not animated. An
+        animated cell is only recorded in game.animations with its animation
+        and the ticks it started at, the game drawing it every frame.
+    display_all()
+        Renders every cell of the grid again.
+    tiles(x, y, width, height)
+        Returns the tile of every cell of a rectangle of the grid, for the
+        chunks of the viewport.
     """
 
-    def __init__(self, game, width: int, height: int):
+    def __init__(self, game, width: int, height: int, topology: Topology = SQUARE,
+                 endless: bool = False, engine: Engine = None):
         self.game = game
         self.width = width
         self.height = height
-        self.grid = {}
-        self.flag_to_place = 0
-
-        for h in range(height):
-            for w in range(width):
-                self.grid[(w, h)] = [CELL_VALUE, HIDDEN, NOT_COLLECTED]
-
-        total_cells = self.width * self.height
 
-        self.items_to_pick = {}
+        if engine is not None:
+            # une manche reprise d'une sauvegarde
+            self.engine = engine
 
-        if self.game.round <= 4:
-            local_round = self.game.round
-            bomb_percentage = ITEM_PER_ROUND[self.game.round][BOMB]
-            bomb_number = round(total_cells * bomb_percentage/100)
-
-            for item in ITEM_PER_ROUND[self.game.round]:
-                if item != BOMB:
-                    self.items_to_pick[item] = 0
-
-                else:
-                    self.items_to_pick[item] = bomb_number
+        elif endless:
+            self.engine = EndlessEngine(self.game.round, self.game.inventory)
 
         else:
-            local_round = 4
-            bomb_percentage = ITEM_PER_ROUND[4][BOMB] + 3 * (self.game.round - 4)
-
-            if bomb_percentage > 100:
-                bomb_percentage = 100
-
-            bomb_number = round(total_cells * bomb_percentage/100)
-
-            for item in ITEM_PER_ROUND[4]:
-                if item != BOMB:
-                    self.items_to_pick[item] = 0
-
-                else:
-                    self.items_to_pick[item] = bomb_number
-
-            if self.game.round == 6:
-                self.items_to_pick[RIFLE] = 1
-                self.flag_to_place += 1
-
-        if self.game.round > 1:
-            item_percentage = 10
-            if bomb_percentage + item_percentage > 100:
-                item_percentage = 100 - bomb_percentage
-
-            self.number_of_item_to_place = round(bomb_number * item_percentage/100)
-
-        else:
-            self.number_of_item_to_place = 0
-
-        for item_number in range(self.number_of_item_to_place):
-            random_number = round(random.random() * 100)
-
-            if random_number == 0:
-                random_number = 1
-
-            for item, chance in ITEM_PER_ROUND[local_round].items():
-                if item != BOMB and item != COIN and chance > 0:
-                    min = 0
-                    for i in range(item + 1, -1):
-                        min += ITEM_PER_ROUND[local_round][i]
+            self.engine = Engine(width, height, self.game.round, self.game.inventory, topology)
 
-                    max = 0
-                    for i in range(item, -1):
-                        max += ITEM_PER_ROUND[local_round][i]
-
-                    if min < random_number <= max:
-                        self.items_to_pick[item] += 1
-
-                elif item == COIN:
-                    if random_number <= chance:
-                        self.items_to_pick[item] += 1
-
-        self.flag_to_place += bomb_number + self.number_of_item_to_place
-        self.safe_cells_number = total_cells - bomb_number
-        self.not_hidden_cells = 0
-        self.items_flagged = []
-        self.jammer_to_give_back = 0
-        self.temp_animations = []
+        self.board = self.engine.board
+        self.grid = self.board.view
 
     def get_all_cells_around(self, cell: tuple[int, int]) -> list[tuple[int, int]]:
         """
-        Returns a list of all the cells surrounding the given cell.
+        Returns a list of all the cells surrounding the given cell, read from the
+        neighbour table of the board. The game logic itself reads the table
+        directly with ``self.board.table.around(index)``.
 
         Parameters
         ----------
@@ -274,15 +201,9 @@ class Grid:
         all_cells: list[tuple[int, int]]
             A list of tuples, each representing the coordinates of a cell.
         """
-        all_cells = []
-        for delta_row in [-1, 0, 1]:
-            for delta_column in [-1, 0, 1]:
-                if ((delta_row, delta_column)!= (0, 0) and 0 <= cell[1] + delta_row < self.height and 0 <= cell[0] + delta_column < self.width):
-                    all_cells.append((cell[0] + delta_column, cell[1] + delta_row))
-
-        return all_cells
+        return [self.board.cell(int(index)) for index in self.board.table.around(self.board.index(cell))]
 
-    def create_grid(self, cell: tuple[int, int]):
+    def create_grid(self, cell: tuple[int, int], candidate: int = 0):
         """
         Creates a grid of bombs and items around the given cell.
 
@@ -290,60 +211,23 @@ class Grid:
         ----------
         cell : tuple[int, int]
             The coordinates of the center cell.
+        candidate : int, optional
+            The layout picked by a no-guess search, 0 for a plain one. The
+            default is 0.
 
         Returns
         -------
         None
         """
-        shuffled_grid = [i for i in self.grid]
-        shuffled_grid.pop(shuffled_grid.index(cell))
-        all_cells = self.get_all_cells_around(cell)
-
-        for cell in all_cells:
-            shuffled_grid.pop(shuffled_grid.index(cell))
-
-        random.shuffle(shuffled_grid)
-
-        def pick_and_update_cells_around(item, amount):
-            """
-            A helper function that picks and updates cells around a given cell.
-
-            Parameters
-            ----------
-            to_pick : list[int, int]
-                A list containing the value and number of cells to pick.
-
-            Returns
-            -------
-            None
-            """
-            for index in range(len(shuffled_grid[:amount])):
-                if index >= len(shuffled_grid[:amount]):
-                    return
-
-                cell = shuffled_grid[index]
-                shuffled_grid.pop(index)
-                self.grid[cell][CELL_VALUE] = item
-
-                # la partie qui suit est l'algorithme proposé par Axel, permettant de
-                # définir pour chaque cellules pour lesquelles c'est nécessaire, le
-                # nombre de bombes se trouvant autour de celles-ci
-                all_cells = self.get_all_cells_around(cell)
-
-                for cell in all_cells:
-                    if self.grid[cell][CELL_VALUE] >= 0:
-                    # cette condition permet de vérifier si la
-                    # cellule n'est ni une bombe ni un item
-                        self.grid[cell][CELL_VALUE] += 1
-
-        for item, amount in self.items_to_pick.items():
-            pick_and_update_cells_around(item, amount)
+        self.engine.create_grid(cell, candidate)
 
     def cell_clicked(self, button: int,
                      cell: tuple[int, int],
                      play_sound: bool = True):
         """
-        Handles a click on a cell.
+        Handles a click on a cell: the engine plays it, then every cell changed
+        is redrawn once, and the caption and the avatar of the player are
+        updated.
 
         Parameters
         ----------
@@ -358,183 +242,84 @@ class Grid:
 
         Returns
         -------
-        None
+        changed : set[tuple[int, int]]
+            The cells changed by the click.
         """
-        if button == LEFT_CLICK:
-            if self.game.player.active_equipped == BIONIC_GLASSES and not self.game.is_first_click:
-                self.game.player.active_equipped = MAGNIFIER
-                self.cell_clicked(LEFT_CLICK, cell, False)
-
-                all_cells = self.get_all_cells_around(cell)
-                for temp_cell in all_cells:
-                    self.game.player.active_equipped = MAGNIFIER
-                    self.cell_clicked(LEFT_CLICK, temp_cell, False)
-
-                self.game.player.active_equipped = None
-
-            else:
-                if self.grid[cell][CELL_STATE] == HIDDEN:
-                    if play_sound and self.grid[cell][CELL_VALUE] != BOMB:
-                        # self.game.sweeping_sound.play()
-                        pass
-
-                    if self.grid[cell][CELL_VALUE] < 0:
-                        self.flag_to_place -= 1
-
-                        if self.grid[cell][CELL_VALUE] == BOMB:
-                            if self.game.player.active_equipped == MAGNIFIER:
-                                self.grid[cell][CELL_STATE] = FLAGGED
-                                self.game.player.active_equipped = None
-                                self.game.player_state = PLAYER_STATES[(self.game.player.active_equipped, self.game.player.passive_equipped)]
-
-                            else:
-                                jammer_near = False
-                                all_cells = self.get_all_cells_around(cell)
-                                for temp_cell in all_cells:
-                                    if self.grid[temp_cell][CELL_VALUE] == JAMMER:
-                                        jammer_near = True
-
-                                if jammer_near:
-                                    self.grid[cell][CELL_STATE] = NOT_HIDDEN
-
-                                elif self.game.player.passive_equipped in [SHIELD, ARMOR]:
-                                    self.game.bomb_exploding = True
-                                    self.game.latest_player_state = self.game.player_state
-                                    self.game.items[self.game.player.passive_equipped].health -= 1
-
-                                    if self.game.items[self.game.player.passive_equipped].health == 0:
-                                        self.game.player.passive_equipped = None
-                                        self.game.player_state = PLAYER_STATES[(self.game.player.active_equipped, self.game.player.passive_equipped)]
-
-                                    self.grid[cell][CELL_STATE] = NOT_HIDDEN
-
-                                else:
-                                    self.grid[cell][CELL_STATE] = NOT_HIDDEN
-                                    self.display(cell)
-                                    pygame.display.set_caption("Perdu")
-                                    self.game.player_state = PLAYER_EXPLODE
-
-                            self.display(cell)
-
-                        else:
-                            if not self.grid[cell][CELL_VALUE] in self.game.player.discovered_items:
-                                self.game.player.discovered_items.append(self.grid[cell][CELL_VALUE])
-
-                            self.grid[cell][CELL_STATE] = NOT_HIDDEN
-                            self.display(cell)
-                            self.not_hidden_cells += 1
+        engine = self.engine
+        inventory = self.game.inventory
+        equipment = (inventory.active_equipped, inventory.passive_equipped)
+        bombs_absorbed = engine.bombs_absorbed
+        lost = engine.lost
 
-                    else:
-                        self.grid[cell][CELL_STATE] = NOT_HIDDEN
-                        self.display(cell)
-
-                        if self.game.player.active_equipped in [MAGNIFIER, BIONIC_GLASSES] and not self.game.is_first_click:
-                            self.game.player.active_equipped = None
-
-                        elif self.grid[cell][CELL_VALUE] == 0:
-                            all_cells = self.get_all_cells_around(cell)
-
-                            for temp_cell in all_cells:
-                                if self.grid[temp_cell][CELL_STATE] == HIDDEN:
-                                    self.cell_clicked(LEFT_CLICK, temp_cell, False)
-                                    self.display(temp_cell)
-
-                        if self.not_hidden_cells == self.safe_cells_number and not self.game.k_pressed:
-                            pygame.display.set_caption("Gagné !")
-                            # pygame.time.delay(2000)
-
-                            self.game.items[JAMMER].amount += self.jammer_to_give_back
-                            current_time = pygame.time.get_ticks() // 60 * 10
-                            coins_earned = 2000 // int(current_time - self.game.initial_time) + self.game.round
-                            self.game.items[COIN].amount += coins_earned
-                            print(coins_earned)
+        changed = engine.click(button, cell)
 
-                            if self.game.space_pressed:
-                                self.game.round += 1
-                                self.game.space_pressed = False
+        if engine.bombs_absorbed != bombs_absorbed:
+            self.game.bomb_exploding = True
+            self.game.latest_player_state = self.game.player_state
 
-                            if self.game.round < 3:
-                                self.game.run()
+        if engine.lost and not lost:
+            pygame.display.set_caption("Perdu")
+            self.game.player_state = PLAYER_EXPLODE
 
-                            else:
-                                self.game.is_trading = True
-                                self.game.run()
+        elif (inventory.active_equipped, inventory.passive_equipped) != equipment:
+            if (inventory.active_equipped, inventory.passive_equipped) in PLAYER_STATES:
+                self.game.player_state = PLAYER_STATES[(inventory.active_equipped, inventory.passive_equipped)]
 
-                            # pygame.time.delay(1000)
-                            # pygame.mixer.music.fadeout(1000)```
+        if button == RIGHT_CLICK and changed:
+            pygame.display.set_caption(f"Vous avez {engine.flag_to_place} {'drapeau' if engine.flag_to_place in [-1, 0, 1] else 'drapeaux'} à placer ! (manche {self.game.round})")
 
-                else:
-                    if self.game.player.active_equipped == MAGNIFIER:
-                        pass
+        for changed_cell in changed:
+            self.display(changed_cell)
 
-                    elif self.grid[cell][CELL_STATE] == NOT_HIDDEN and self.grid[cell][CELL_VALUE] < -1 and self.grid[cell][CELL_VALUE] != JAMMER:
-                        self.game.items[self.grid[cell][CELL_VALUE]].picked()
-                        self.grid[cell][IS_COLLECTED] = COLLECTED
-                        # self.game.item_collected.play()
-                        self.display(cell)
-
-                    else:
-                        # self.game.sweeping_sound.play()
-                        if self.grid[cell][CELL_STATE] == NOT_HIDDEN and self.game.player.active_equipped == JAMMER:
-                            self.jammer_to_give_back += 1
-                            self.grid[cell][CELL_VALUE] = JAMMER
-                            self.game.player.active_equipped = None
-                            self.game.player_state = PLAYER_STATES[(self.game.player.active_equipped, self.game.player.passive_equipped)]
-                            self.display(cell)
-
-                        else:
-                            all_cells = self.get_all_cells_around(cell)
-
-                            for temp_cell in all_cells:
-                                if self.grid[temp_cell][CELL_STATE] == HIDDEN:
-                                    self.cell_clicked(LEFT_CLICK, temp_cell, False)
+        for item in engine.items_flagged:
+            if self.is_circled(item):
+                self.display(item)
 
-        elif button == RIGHT_CLICK:
-            if self.grid[cell][CELL_STATE] == HIDDEN:
-                self.grid[cell][CELL_STATE] = FLAGGED
-                self.flag_to_place -= 1
+        if button == LEFT_CLICK and changed and engine.is_won() and not self.game.k_pressed:
+            pygame.display.set_caption("Gagné !")
+            # pygame.time.delay(2000)
 
-                if self.grid[cell][CELL_VALUE] < -1:
-                    self.items_flagged.append(cell)
+            current_time = pygame.time.get_ticks() // 60 * 10
+            coins_earned = engine.finish_round(current_time - self.game.initial_time)
+            print(coins_earned)
 
-                pygame.display.set_caption(f"Vous avez {self.flag_to_place} {'drapeau' if self.flag_to_place in [-1, 0, 1] else 'drapeaux'} à placer ! (manche {self.game.round})")
-                self.display(cell)
+            if self.game.space_pressed:
+                self.game.round += 1
+                self.game.space_pressed = False
 
-            elif self.grid[cell][CELL_STATE] == FLAGGED:
-                self.grid[cell][CELL_STATE] = HIDDEN
-                self.flag_to_place += 1
+            if self.game.round < 3:
+                self.game.switch(BOARD_SCENE)
 
-                if self.grid[cell][CELL_VALUE] < -1:
-                    self.items_flagged.pop(self.items_flagged.index(cell))
+            else:
+                self.game.switch(TRADER_SCENE)
 
-                pygame.display.set_caption(f"Vous avez {self.flag_to_place} {'drapeau' if self.flag_to_place in [-1, 0, 1] else 'drapeaux'} à placer ! (manche {self.game.round})")
-                self.display(cell)
+            # pygame.time.delay(1000)
+            # pygame.mixer.music.fadeout(1000)```
 
-        for item in self.items_flagged:
-            if self.is_circled(item):
-                self.display(item)
+        return changed
 
     def debug(self):
-        for cell in self.grid:
-            if self.grid[cell][CELL_VALUE] < -1:
-                self.grid[cell][IS_COLLECTED] = COLLECTED
-                self.flag_to_place -= 1
-                self.grid[cell][CELL_STATE] = NOT_HIDDEN
-                self.game.items[self.grid[cell][CELL_VALUE]].picked()
+        self.engine.debug()
+        self.display_all()
 
-                if not self.grid[cell][CELL_VALUE] in self.game.player.discovered_items:
-                    self.game.player.discovered_items.append(self.grid[cell][CELL_VALUE])
-
-            elif self.grid[cell][CELL_VALUE] == BOMB:
-                self.grid[cell][CELL_STATE] = FLAGGED
-                self.flag_to_place -= 1
+    def display_all(self):
+        """
+        Renders every cell of the grid again, as after the debug key or a
+        round resumed from a save.
+        """
+        if self.game.viewport is None:
+            cells = range(self.board.size)
 
-            else:
-                self.grid[cell][CELL_STATE] = NOT_HIDDEN
+        else:
+            # la caméra redessine tout le plateau : seules les cellules animées
+            # sont à noter
+            self.game.viewport.clear()
+            cells = self.board.animated()
 
-            self.display(cell)
+        for index in cells:
+            self.display(self.board.cell(int(index)))
 
-        pygame.display.set_caption(f"Vous avez {self.flag_to_place} {'drapeau' if self.flag_to_place in [-1, 0, 1] else 'drapeaux'} à placer ! (manche {self.game.round})")
+        pygame.display.set_caption(f"Vous avez {self.engine.flag_to_place} {'drapeau' if self.engine.flag_to_place in [-1, 0, 1] else 'drapeaux'} à placer ! (manche {self.game.round})")
 
     def __str__(self) -> str:
         """
@@ -584,7 +369,12 @@ class Grid:
 
     def display(self, cell: tuple[int, int]):
         """
-        Renders the grid on the screen.
+        Renders a cell of the grid on the screen, with a single blit of its
+        tile from the tile atlas of the game when it is not animated. An
+        animated cell is only recorded in game.animations with its animation
+        and the ticks it started at, the game drawing it every frame. When the
+        board is seen through the viewport of the game, the chunk holding the
+        cell is rendered again instead.
 
         Parameters
         ----------
@@ -595,78 +385,85 @@ class Grid:
         -------
         None
         """
-        if self.grid[cell][CELL_STATE] == FLAGGED:
-            if self.grid[cell][CELL_VALUE] < -1 and self.is_circled(cell):
-                image = pygame.transform.scale(pygame.image.load(f"sprites/blue_flag.png").convert_alpha(), (self.game.square_size, self.game.square_size))
-                image_x = cell[0] * self.game.square_size + self.game.x_offset
-                image_y = cell[1] * self.game.square_size + self.game.y_offset
-                self.game.screen.blit(image, (image_x, image_y))
+        index = self.board.index(cell)
+        value = int(self.board.values[index])
+        state = self.board.states[index]
+        animation = None
+
+        if state == FLAGGED:
+            if value < -1 and self.is_circled(cell):
+                # le drapeau bleu remplace le drapeau animé
+                tile = BLUE_FLAG_TILE
 
             else:
-                animation = Spritesheet(f"sprites/flag_sheet.png", 4, 1, (self.game.square_size, self.game.square_size), 24)
-                self.game.animations[(cell[0], cell[1] * 99.9/100)] = animation
-
-        elif self.grid[cell][CELL_STATE] == NOT_HIDDEN:
-            color = (229, 194, 159) if (cell[0] + cell[1]) % 2 == 0 else (215, 184, 153)
-            pygame.draw.rect(self.game.screen, color,
-                             pygame.Rect(cell[0] * self.game.square_size + self.game.x_offset,
-                                         cell[1] * self.game.square_size + self.game.y_offset,
-                                         self.game.square_size, self.game.square_size))
-
-            if self.grid[cell][CELL_VALUE] < 0:
-                if self.grid[cell][IS_COLLECTED] == NOT_COLLECTED:
-                    if self.grid[cell][CELL_VALUE] in [JAMMER, BOMB]:
-                        animation = Spritesheet(f"sprites/{ITEM_IMAGES[self.grid[cell][CELL_VALUE]]}.png", FRAME_AND_FPS_NUMBER[self.grid[cell][CELL_VALUE]][FRAME_NUMBER], 1, (self.game.square_size * 0.9, self.game.square_size * 0.9), 24)
-                        self.game.animations[(cell[0], cell[1])] = animation
+                tile, animation = HIDDEN_TILE, FLAG
 
-                    else:
-                        image_name = ITEM_NAME[self.grid[cell][CELL_VALUE]]
-                        animation = Spritesheet(f"sprites/{image_name}.png", FRAME_AND_FPS_NUMBER[self.grid[cell][CELL_VALUE]][FRAME_NUMBER], 1, ((self.game.square_size * 0.9, self.game.square_size * 0.9)), 1)
-                        image = animation.get()
-                        image_x = self.game.square_size // 35 + cell[0] * self.game.square_size + self.game.x_offset
-                        image_y = self.game.square_size // 12 + cell[1] * self.game.square_size + self.game.y_offset
-                        self.game.screen.blit(image, (image_x, image_y))
-
-                else:
-                    image = pygame.transform.scale(pygame.image.load(f"sprites/hole.png").convert_alpha(), (self.game.square_size, self.game.square_size))
-                    image_x = cell[0] * self.game.square_size + self.game.x_offset
-                    image_y = cell[1] * self.game.square_size + self.game.y_offset
-                    self.game.screen.blit(image, (image_x, image_y))
+        elif state == NOT_HIDDEN and value < 0:
+            if self.board.collected[index] == COLLECTED:
+                tile = HOLE_TILE
+
+            elif value in [JAMMER, BOMB]:
+                tile, animation = 0, value
 
             else:
-                color = (229, 194, 159) if (cell[0] + cell[1]) % 2 == 0 else (215, 184, 153)
-                pygame.draw.rect(self.game.screen, color,
-                                pygame.Rect(cell[0] * self.game.square_size + self.game.x_offset,
-                                            cell[1] * self.game.square_size + self.game.y_offset,
-                                            self.game.square_size, self.game.square_size))
-
-                if self.grid[cell][CELL_VALUE] > 0:
-                    font_size = round(self.game.square_size * 80/100)
-                    font = pygame.font.SysFont("Arial", font_size)
-                    cell_value = str(self.grid[cell][CELL_VALUE])
-                    image = font.render(cell_value, True,
-                                        COLORS[self.grid[cell][CELL_VALUE]])
-                    image_x = self.game.square_size // 3.5 + cell[0] * self.game.square_size + self.game.x_offset
-                    image_y = self.game.square_size // 15 + cell[1] * self.game.square_size + self.game.y_offset
-                    self.game.screen.blit(image, (image_x, image_y))
-
-        elif self.grid[cell][CELL_STATE] == HIDDEN:
-            del self.game.animations[(cell[0], cell[1] * 99.9/100)]
-
-            color = (170, 215, 81) if (cell[0] + cell[1]) % 2 == 0 else (162, 209, 73)
-            pygame.draw.rect(self.game.screen, color,
-                             pygame.Rect(cell[0] * self.game.square_size + self.game.x_offset,
-                                         cell[1] * self.game.square_size + self.game.y_offset,
-                                         self.game.square_size, self.game.square_size))
+                tile = value
 
-    def is_circled(self, cell: tuple[int, int]):
-        all_cells = self.get_all_cells_around(cell)
-        good_cells = 0
-        for cell in all_cells:
-            if self.grid[cell][CELL_STATE] == NOT_HIDDEN or (self.grid[cell][CELL_STATE] == FLAGGED and self.grid[cell][CELL_VALUE] < 0):
-                good_cells += 1
+        elif state == NOT_HIDDEN:
+            tile = value
+
+        else:
+            tile = HIDDEN_TILE
+
+        if animation is None:
+            self.game.animations.pop(cell, None)
+
+        elif self.game.animations.get(cell, (None,))[0] != animation:
+            self.game.animations[cell] = (animation, pygame.time.get_ticks())
+
+        if self.game.viewport is not None:
+            self.game.viewport.invalidate(cell)
+            return
+
+        position = (cell[0] * self.game.square_size + self.game.x_offset,
+                    cell[1] * self.game.square_size + self.game.y_offset)
+        self.game.dirty.add((position, (self.game.square_size, self.game.square_size)))
+
+        if tile == HIDDEN_TILE:
+            self.game.background.restore(self.game.screen, (position, (self.game.square_size, self.game.square_size)))
+
+        else:
+            self.game.atlas.blit(self.game.screen, tile, cell, position)
+
+    def tiles(self, x: int, y: int, width: int, height: int) -> numpy.ndarray:
+        """
+        Returns the tile of every cell of a rectangle of the grid, the way
+        display() picks it for a single cell: HIDDEN_TILE for the hidden and
+        flagged cells, whose background is drawn without the atlas.
 
-        if good_cells == len(all_cells):
-            return True
+        Parameters
+        ----------
+        x, y : int
+            The coordinates of the top-left cell of the rectangle.
+        width, height : int
+            The size of the rectangle, in cells.
 
-        return False
\ No newline at end of file
+        Returns
+        -------
+        tiles : numpy.ndarray
+            A (height, width) array of tiles.
+        """
+        values, states, collected = self.board.area(x, y, width, height)
+
+        tiles = values.astype(numpy.int16)
+        tiles[(values < 0) & collected] = HOLE_TILE
+        tiles[((values == BOMB) | (values == JAMMER)) & ~collected] = 0
+        tiles[states != NOT_HIDDEN] = HIDDEN_TILE
+
+        for row, column in zip(*numpy.nonzero((states == FLAGGED) & (values < -1))):
+            if self.is_circled((x + int(column), y + int(row))):
+                tiles[row, column] = BLUE_FLAG_TILE
+
+        return tiles
+
+    def is_circled(self, cell: tuple[int, int]):
+        return self.engine.is_circled(cell)
@@ -98,8 +98,7 @@ class Button(pygame.sprite.Sprite):
         Surface: The image of the button.
         """
 
-        font = pygame.font.SysFont("Arial", font_size)
-        image = font.render(self.text, True, self.text_color)
+        image = self.game.assets.text(self.text, font_size, self.text_color)
 
         self.rect = image.get_rect()
         self.rect.width += value
@@ -0,0 +1,253 @@
+"""
+Projet démineur
+Auteurs :   Mathis Bulka
+            Samuel Cornier
+            Léo Simon
+            Sacha Trouvé
+
+    Module inputlog: journal binaire des actions d'une manche, pour la rejouer
+"""
+
+import struct
+import time
+
+from topology import HEXAGONAL, SQUARE, TOROIDAL, Topology
+
+COIN = -2
+MAGNIFIER = -3
+METAL_SCRAP = -4
+SHIELD = -5
+UPGRADER = -6
+BIONIC_GLASSES = -7
+ARMOR = -8
+JAMMER = -9
+RIFLE = -10
+
+ITEMS = [COIN, MAGNIFIER, METAL_SCRAP, SHIELD, UPGRADER, BIONIC_GLASSES, ARMOR, JAMMER, RIFLE]
+PASSIVE_ITEMS = [SHIELD, ARMOR]
+
+# les formes de plateau, par leur code dans l'en-tête
+TOPOLOGIES = [SQUARE, TOROIDAL, HEXAGONAL]
+
+MAGIC = b"DMNR"
+# la version 2 tire le butin des manches depuis loot.json
+VERSION = 2
+
+# magie, version, graine, manche, largeur, hauteur, forme, sans fin
+HEADER = struct.Struct("<4sBQHIIBB")
+# les quantités, les points de vie, l'équipement et le nombre d'objets
+# découverts, suivis de ces objets
+INVENTORY = struct.Struct(f"<{len(ITEMS)}i{len(PASSIVE_ITEMS)}ibbB")
+# type, bouton ou objet, objet actif, objet passif, x, y, instant en
+# millisecondes (durée de la manche pour FINISH, empreinte du plateau pour END,
+# plateau candidat retenu pour LAYOUT)
+RECORD = struct.Struct("<BbbbiiI")
+
+FIRST_CLICK, CLICK, USE, DEBUG, FINISH, END, LAYOUT = list(range(7))
+
+# None ne tient pas sur un octet signé
+NO_ITEM = 0
+
+
+class InputLog:
+    """
+    The inputs of a round, recorded in a compact binary log that only grows: a
+    header giving the seed, the round, the board and the inventory at the
+    start, then one RECORD.size bytes record per input. A round is replayed
+    from it by replay.py.
+
+    The log is kept in memory, and written to a file as well once open() has
+    been called; every record is then flushed at once, so that the log of a
+    round that crashed is complete.
+
+    Parameters:
+    seed (int): The seed of the round.
+    round_number (int): The number of the round.
+    width (int): The width of the board, 0 for an endless board.
+    height (int): The height of the board, 0 for an endless board.
+    topology (Topology): The shape of the board, one of TOPOLOGIES.
+    endless (bool): Whether the board is endless.
+    inventory (Inventory): The items of the player at the start of the round.
+
+    Attributes:
+    data (bytearray): The log.
+    start (float): The time the round started, from time.perf_counter().
+    file (file): The file the log is written to, or None.
+    closed (bool): Whether the END record has been written.
+    """
+
+    def __init__(self, seed: int, round_number: int, width: int, height: int,
+                 topology: Topology, endless: bool, inventory):
+        self.data = bytearray(HEADER.pack(MAGIC, VERSION, seed, round_number, width, height,
+                                          TOPOLOGIES.index(topology), endless))
+        self.data += pack_inventory(inventory)
+        self.start = time.perf_counter()
+        self.file = None
+        self.closed = False
+
+    def open(self, path: str):
+        """
+        Writes the log to the given file, then every record appended to it. A
+        file already there is replaced, so that the log of a round resumed from
+        a save goes on from its records.
+
+        The file stays open for the whole round, each record being flushed as it
+        is appended: it is closed by close(), or by release() when the round is
+        interrupted.
+        """
+        self.file = open(path, "wb")  # noqa: SIM115
+        self.file.write(self.data)
+        self.file.flush()
+
+    def append(self, kind: int, code: int, inventory, cell: tuple[int, int] = (0, 0),
+               extra: int = None):
+        """
+        Appends a record.
+
+        Parameters:
+        kind (int): FIRST_CLICK, CLICK, USE, DEBUG, FINISH, END or LAYOUT.
+        code (int): The mouse button of a CLICK, the item of a USE, 0
+        otherwise.
+        inventory (Inventory): The items of the player, whose equipment is
+        recorded.
+        cell (tuple): The cell of a FIRST_CLICK, a CLICK or a LAYOUT.
+        extra (int): The value of the last field, by default the time elapsed
+        since the start of the round, in milliseconds.
+
+        Returns:
+        None
+        """
+        if self.closed:
+            return
+
+        if extra is None:
+            extra = round((time.perf_counter() - self.start) * 1000)
+
+        record = RECORD.pack(kind, code, inventory.active_equipped or NO_ITEM,
+                             inventory.passive_equipped or NO_ITEM, cell[0], cell[1], extra & 0xFFFFFFFF)
+        self.data += record
+
+        if self.file is not None:
+            self.file.write(record)
+            self.file.flush()
+
+    def close(self, digest: int, inventory):
+        """
+        Appends the END record, holding the digest of the board at the end of the
+        round, and closes the file.
+
+        Parameters:
+        digest (int): The digest of the board and of the inventory, from
+        Engine.digest().
+        inventory (Inventory): The items of the player.
+
+        Returns:
+        None
+        """
+        self.append(END, 0, inventory, extra=digest)
+        self.closed = True
+
+        self.release()
+
+    def release(self):
+        """
+        Closes the file without ending the log, when the game stops in the
+        middle of a round: the records already written are kept.
+        """
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+def pack_inventory(inventory) -> bytes:
+    """
+    Returns the items of the player as they are written in a log or a save:
+    an INVENTORY struct, followed by the discovered items, one byte each.
+
+    Parameters:
+    inventory (Inventory): The items of the player.
+
+    Returns:
+    bytes: The packed inventory.
+    """
+    return INVENTORY.pack(*[inventory.amounts[item] for item in ITEMS],
+                          *[inventory.health[item] for item in PASSIVE_ITEMS],
+                          inventory.active_equipped or NO_ITEM,
+                          inventory.passive_equipped or NO_ITEM,
+                          len(inventory.discovered_items)) \
+        + bytes(item & 0xFF for item in inventory.discovered_items)
+
+
+def unpack_inventory(data: bytes, offset: int = 0) -> tuple[dict, int]:
+    """
+    Reads an inventory written by pack_inventory().
+
+    Parameters:
+    data (bytes): The log or the save.
+    offset (int): Where the inventory starts in data.
+
+    Returns:
+    tuple: The inventory as a dict (amounts, health, active_equipped,
+    passive_equipped, discovered_items), None standing for no item equipped,
+    and the offset of what follows it.
+    """
+    fields = INVENTORY.unpack_from(data, offset)
+    discovered_number = fields[-1]
+    offset += INVENTORY.size
+    discovered = [item - 256 if item > 127 else item for item in data[offset:offset + discovered_number]]
+
+    inventory = {
+        "amounts": dict(zip(ITEMS, fields[:len(ITEMS)])),
+        "health": dict(zip(PASSIVE_ITEMS, fields[len(ITEMS):len(ITEMS) + len(PASSIVE_ITEMS)])),
+        "active_equipped": fields[-3] or None,
+        "passive_equipped": fields[-2] or None,
+        "discovered_items": discovered
+    }
+
+    return inventory, offset + discovered_number
+
+
+def read_log(data: bytes) -> tuple[dict, list[tuple]]:
+    """
+    Reads a log written by InputLog. A ValueError is raised when data is not
+    a log of this version, or is cut in its header.
+
+    Parameters:
+    data (bytes): The log.
+
+    Returns:
+    tuple: The header as a dict (seed, round, width, height, topology as a
+    Topology, endless,
+    amounts, health, active_equipped, passive_equipped, discovered_items), and
+    the records as (kind, code, active_equipped, passive_equipped, x, y, extra)
+    tuples, None standing for no item equipped.
+    """
+    # un fichier vide ou coupé dans son en-tête n'est pas un journal
+    if len(data) < HEADER.size + INVENTORY.size:
+        raise ValueError("not a replay log: truncated header")
+
+    magic, version, seed, round_number, width, height, topology, endless = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("not a replay log of this version")
+
+    inventory, offset = unpack_inventory(data, HEADER.size)
+    if offset > len(data) or topology >= len(TOPOLOGIES):
+        raise ValueError("not a replay log: truncated header")
+
+    header = {
+        "seed": seed,
+        "round": round_number,
+        "width": width,
+        "height": height,
+        "topology": TOPOLOGIES[topology],
+        "endless": bool(endless),
+        **inventory
+    }
+
+    # un dernier enregistrement incomplet (la manche s'est arrêtée pendant
+    # l'écriture) est ignoré
+    end = offset + (len(data) - offset) // RECORD.size * RECORD.size
+    records = [(kind, code, active or None, passive or None, x, y, extra)
+               for kind, code, active, passive, x, y, extra in RECORD.iter_unpack(data[offset:end])]
+
+    return header, records
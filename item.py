@@ -37,11 +37,6 @@ ITEM_VALUES = {
     "rifle_sheet": RIFLE
 }
 
-UPGRADED = {
-    ITEM_VALUES["magnifier"]: ITEM_VALUES["bionic_glasses"],
-    ITEM_VALUES["shield"]: ITEM_VALUES["armor"]
-}
-
 PLAYER_STATES = {
     (None, None): 1,
     (MAGNIFIER, None): 2,
@@ -87,7 +82,11 @@ class Item():
     size (int): The size of the item's sprite image.
     image (Surface): The sprite image of the item.
     rect (Rect): The bounding rectangle of the item's image.
-    amount (int): The amount of the item.
+    amount (int): The amount of the item, stored in the inventory of the game.
+    health (int): The health points left of a passive item, stored in the
+    inventory of the game.
+    amount_image (Surface): The amount text, rendered again only when the
+    amount changes.
     player_equipped (dict): A dictionary that stores the
     equipped items for the player's passive and active slots.
     value (int): The value of the item. This is used to
@@ -125,12 +124,25 @@ class Item():
         self.rect.y = self.y
         self.amount = 0
         self.amount += 100
+        self.displayed_amount = None
+        self.amount_image = None
+        self.text_rect = None
+
+    @property
+    def amount(self) -> int:
+        return self.game.inventory.amounts[self.value]
 
-        if self.value == SHIELD:
-            self.health_point = 1
+    @amount.setter
+    def amount(self, amount: int):
+        self.game.inventory.amounts[self.value] = amount
 
-        elif self.value == ARMOR:
-            self.health_point = 2
+    @property
+    def health(self) -> int:
+        return self.game.inventory.health[self.value]
+
+    @health.setter
+    def health(self, health: int):
+        self.game.inventory.health[self.value] = health
 
     def display(self):
         """
@@ -146,8 +158,12 @@ class Item():
         None
         """
         self.game.screen.blit(self.image, (self.x, self.y))
-        font = pygame.font.SysFont("Arial", self.image.get_height() // 3)
-        image = font.render("x" + str(self.amount), True, (255, 255, 255))
+
+        if self.amount != self.displayed_amount:
+            self.displayed_amount = self.amount
+            self.amount_image = self.game.assets.text("x" + str(self.amount), self.image.get_height() // 3, (255, 255, 255))
+
+        image = self.amount_image
 
         if self.text_position == "bottom-right":
             text_y = self.y + self.image.get_height() - image.get_height()
@@ -158,6 +174,12 @@ class Item():
         text_x = round(self.x + self.image.get_width() * 100.5/100)
         self.game.screen.blit(image, (text_x, text_y))
 
+        # l'ancien texte peut être plus large que le nouveau
+        text_rect = image.get_rect(topleft=(text_x, text_y))
+        self.game.dirty.add(text_rect.union(self.text_rect or text_rect))
+        self.game.dirty.add(self.image.get_rect(topleft=(self.x, self.y)))
+        self.text_rect = text_rect
+
     def anim(self):
         """
         Anim the item using the SpriteSheet object
@@ -176,14 +198,12 @@ class Item():
         Returns:
             None
         """
-        self.amount += 1
+        self.game.inventory.picked(self.value)
 
-    def is_clicked(self):
+    def hover(self):
         """
-        Check if the item is clicked.
-
-        This function checks if the mouse cursor is currently hovering over the item.
-        If it is, it decrements the item's amount and equips it if it is possible to do so.
+        Animate the item while the mouse cursor is hovering over it, and reset
+        its animation otherwise.
 
         Parameters:
             None
@@ -193,70 +213,35 @@ class Item():
         """
         if self.rect.collidepoint(pygame.mouse.get_pos()):
             self.anim()
-            if not self.game.is_trading:
-                if self.value != COIN:
-                    for event in pygame.event.get():
-                        if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
-                            if self.game.player.active_equipped == ITEM_VALUES["upgrader"] and self.amount > 0 and (self.value in UPGRADED.keys()):
-                                self.amount -= 1
-
-                                if not UPGRADED[self.value] in self.game.player.discovered_items:
-                                    self.game.player.discovered_items.append(UPGRADED[self.value])
-
-                                self.game.items[UPGRADED[self.value]].picked()
-                                self.game.player.active_equipped = None
-
-                            else:
-                                if self.value != METAL_SCRAP:
-                                    if self.item_type == PASSIVE:
-                                        if self.game.player.passive_equipped is None:
-                                            if self.amount > 0:
-                                                self.health = self.health_point
-                                                self.game.player.passive_equipped = self.value
-                                                self.amount -= 1
-
-                                    elif self.item_type == ACTIVE:
-                                        if self.game.player.active_equipped == self.value:
-                                            self.picked()
-                                            self.game.player.active_equipped = None
-
-                                        else:
-                                            if self.amount > 0:
-                                                if self.game.player.active_equipped is None:
-
-                                                    self.game.player.active_equipped = self.value
-                                                    self.amount -= 1
-
-                                                elif self.game.player.active_equipped != self.value:
-                                                    self.game.items[self.game.player.active_equipped].picked()
-                                                    self.game.player.active_equipped = self.value
-                                                    self.amount -= 1
-
-                                elif self.value == METAL_SCRAP:
-                                    if self.amount >= 5:
-                                        self.amount -= 5
-                                        self.game.items[JAMMER].amount += 1
-
-                                        if not JAMMER in self.game.player.discovered_items:
-                                            self.game.player.discovered_items.append(JAMMER)
-
-            else:
-                if self.value == RIFLE:
-                    for event in pygame.event.get():
-                        if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
-                            if self.game.player.active_equipped != self.value:
-                                self.game.player.active_equipped = self.value
-                                self.amount -= 1
-
-                            else:
-                                self.picked()
-                                self.game.player.active_equipped = None
-
-            if (self.game.player.active_equipped, self.game.player.passive_equipped) in PLAYER_STATES.keys():
-                self.game.player_state = PLAYER_STATES[(self.game.player.active_equipped, self.game.player.passive_equipped)]
 
         else:
-            self.image = pygame.image.load(f"sprites/{self.item}.png").convert_alpha()
             self.image = self.animation.make_anim(0, 0, 0, None, [False, 0])
             self.animation.sprite_index = 0
-            self.animation.lock_anim = False
\ No newline at end of file
+            self.animation.lock_anim = False
+
+    def clicked(self, event: pygame.event.Event):
+        """
+        Handle a click on the item.
+
+        The game dispatches the click here once it has found the item under
+        event.pos. The inventory of the game uses the item: it decrements its
+        amount and equips it if it is possible to do so.
+
+        Parameters:
+            event (pygame.event.Event): The MOUSEBUTTONDOWN event.
+
+        Returns:
+            None
+        """
+        if event.button != 1:
+            return
+
+        if not self.game.is_trading and self.value != COIN:
+            # l'objet est utilisé par la manche, qui le note dans son journal
+            self.game.grid.engine.use(self.value)
+
+        elif self.game.is_trading and self.value == RIFLE:
+            self.game.inventory.use(self.value, self.game.is_trading)
+
+        if (self.game.player.active_equipped, self.game.player.passive_equipped) in PLAYER_STATES.keys():
+            self.game.player_state = PLAYER_STATES[(self.game.player.active_equipped, self.game.player.passive_equipped)]
@@ -0,0 +1,235 @@
+"""
+Projet démineur
+Auteurs :   Mathis Bulka
+            Samuel Cornier
+            Léo Simon
+            Sacha Trouvé
+
+    Module loot: tables des bombes et des objets de chaque manche, lues dans
+    loot.json
+"""
+
+import json
+import os
+
+import numpy
+
+BOMB = -1
+COIN = -2
+MAGNIFIER = -3
+METAL_SCRAP = -4
+SHIELD = -5
+UPGRADER = -6
+BIONIC_GLASSES = -7
+ARMOR = -8
+JAMMER = -9
+RIFLE = -10
+
+# les noms du fichier de données
+NAMES = {
+    "BOMB": BOMB,
+    "COIN": COIN,
+    "MAGNIFIER": MAGNIFIER,
+    "METAL_SCRAP": METAL_SCRAP,
+    "SHIELD": SHIELD,
+    "UPGRADER": UPGRADER,
+    "BIONIC_GLASSES": BIONIC_GLASSES,
+    "ARMOR": ARMOR,
+    "JAMMER": JAMMER,
+    "RIFLE": RIFLE
+}
+
+LOOT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "loot.json")
+
+
+class RoundLoot:
+    """
+    The loot of one round number, compiled once: the objects to place, in
+    their placing order, and the probability of every item.
+
+    Parameters
+    ----------
+    bomb_percentage : int
+        The percentage of the cells holding a bomb.
+    item_percentage : int
+        The number of items, in percentage of the number of bombs.
+    chances : dict[int, int]
+        The chance of every item, in percent, in the order of the table. What
+        is left to 100 gives no item.
+    bonus : dict[int, int]
+        The items always placed in the round, on top of the drawn ones.
+
+    Attributes
+    ----------
+    bomb_percentage : int
+        The percentage of the cells holding a bomb.
+    item_percentage : int
+        The number of items in percentage of the number of bombs, 0 when the
+        round has no item.
+    order : list[int]
+        The objects of Engine.items_to_pick, in their placing order: the items
+        of the table and the bomb, then the bonus items.
+    probabilities : numpy.ndarray
+        The probability of every object of order to be drawn for an item, then
+        the one of no item.
+    weights : dict[int, float]
+        The share of every item that can be drawn among the items drawn.
+    bonus : numpy.ndarray
+        The number of every object of order always placed.
+    """
+
+    def __init__(self, bomb_percentage: int, item_percentage: int, chances: dict[int, int],
+                 bonus: dict[int, int]):
+        self.bomb_percentage = bomb_percentage
+        self.order = list(chances) + [item for item in bonus if item not in chances]
+
+        probabilities = numpy.array([chances.get(item, 0) if item != BOMB else 0 for item in self.order],
+                                    dtype=numpy.float64) / 100
+        # des chances de plus de 100 % sont des poids relatifs
+        total = probabilities.sum()
+        if total > 1:
+            probabilities /= total
+
+        self.item_percentage = item_percentage if total > 0 else 0
+        self.probabilities = numpy.append(probabilities, max(1 - probabilities.sum(), 0.0))
+        self.weights = {item: probability / probabilities.sum()
+                        for item, probability in zip(self.order, probabilities) if probability > 0}
+        self.bonus = numpy.array([bonus.get(item, 0) for item in self.order], dtype=numpy.int64)
+
+    def numbers(self, total_cells: int) -> tuple[int, int]:
+        """
+        Returns the number of bombs of a board of total_cells cells, and the
+        number of items to draw for it.
+        """
+        bomb_number = round(total_cells * self.bomb_percentage / 100)
+
+        return bomb_number, round(bomb_number * self.item_percentage / 100)
+
+    def counts(self, total_cells: int, rng: numpy.random.Generator, boards: int) -> numpy.ndarray:
+        """
+        Draws the objects of several boards at once, in one multinomial draw
+        whatever the number of items and of boards.
+
+        Parameters
+        ----------
+        total_cells : int
+            The number of cells of a board.
+        rng : numpy.random.Generator
+            The random generator of the draw.
+        boards : int
+            The number of boards.
+
+        Returns
+        -------
+        counts : numpy.ndarray
+            The number of every object of order, for every board (boards,
+            len(order)).
+        """
+        bomb_number, item_number = self.numbers(total_cells)
+
+        # la dernière colonne est l'absence d'objet
+        counts = rng.multinomial(item_number, self.probabilities, size=boards)[:, :-1]
+        counts += self.bonus
+        if BOMB in self.order:
+            counts[:, self.order.index(BOMB)] = bomb_number
+
+        return counts
+
+
+class LootTable:
+    """
+    The loot of every round, read from a data file such as loot.json: the
+    percentage of bombs and the chances of the items of the rounds it lists,
+    the number of items in percentage of the number of bombs, the bombs added
+    every round after the last one listed, and the bonus items of some rounds,
+    like the rifle of the round 6.
+
+    A round is compiled into a RoundLoot the first time it is played, and kept.
+
+    Parameters
+    ----------
+    data : dict
+        The content of the data file.
+
+    Attributes
+    ----------
+    data : dict
+        The content of the data file.
+    compiled : dict[int, RoundLoot]
+        The loot of every round played so far, by round number.
+    rounds : dict[int, dict[int, int]]
+        The percentage of bombs and the chances of the items of every round
+        listed, by round number.
+    bonus : dict[int, dict[int, int]]
+        The bonus items of every round that has some, by round number.
+    """
+
+    def __init__(self, data: dict):
+        self.data = data
+        self.compiled = {}
+        self.update(data)
+
+    def update(self, data: dict):
+        """
+        Replaces the tables by the ones of the given data, for the rounds
+        created from now on.
+        """
+        self.data = data
+        self.compiled.clear()
+        self.rounds = {int(round_number): {NAMES[name]: chance for name, chance in chances.items()}
+                       for round_number, chances in data["rounds"].items()}
+        self.bonus = {int(round_number): {NAMES[name]: amount for name, amount in items.items()}
+                      for round_number, items in data.get("bonus", {}).items()}
+
+    def round(self, round_number: int) -> RoundLoot:
+        """
+        Returns the compiled loot of a round.
+        """
+        if round_number not in self.compiled:
+            # après la dernière manche de la table, ses objets reviennent avec
+            # plus de bombes à chaque manche
+            last = max(number for number in self.rounds if number <= round_number) \
+                if round_number >= min(self.rounds) else min(self.rounds)
+            chances = self.rounds[last]
+            bomb_percentage = min(chances.get(BOMB, 0) + self.data.get("bomb_ramp", 0) * (round_number - last),
+                                  self.data.get("max_bomb_percentage", 100))
+            item_percentage = min(self.data["item_percentage"], 100 - bomb_percentage)
+
+            self.compiled[round_number] = RoundLoot(bomb_percentage, item_percentage, chances,
+                                                    self.bonus.get(round_number, {}))
+
+        return self.compiled[round_number]
+
+    def draw(self, round_number: int, total_cells: int, rng: numpy.random.Generator) -> dict[int, int]:
+        """
+        Draws the objects of a board.
+
+        Parameters
+        ----------
+        round_number : int
+            The number of the round.
+        total_cells : int
+            The number of cells of the board.
+        rng : numpy.random.Generator
+            The random generator of the draw.
+
+        Returns
+        -------
+        items_to_pick : dict[int, int]
+            The number of every object to place, as in Engine.items_to_pick.
+        """
+        loot = self.round(round_number)
+
+        return dict(zip(loot.order, loot.counts(total_cells, rng, 1)[0].tolist()))
+
+
+def load_loot(path: str = LOOT_PATH) -> LootTable:
+    """
+    Returns the loot table of a data file.
+    """
+    with open(path, encoding="utf-8") as file:
+        return LootTable(json.load(file))
+
+
+# la table du jeu ; update() la remplace pour toutes les manches à venir
+LOOT = load_loot()
@@ -8,17 +8,41 @@ Auteurs :   Mathis Bulka
     Module principal du jeu démineur.
 """
 
+import os
 import pygame
 import sys
 
-from grid import Grid
+from collections import deque
+
+from animation import AnimationClock
+from assets import AssetCache
+from atlas import TileAtlas
+from engine import Inventory
+from grid import PLAYER_STATES, Grid
 from gui import Gui
 from item import Item
+from noguess import NoGuessGenerator
 from player import Player
+from profiler import ANIMATION, BLIT, EVENTS, FLIP, GRID, FrameProfiler
+from render import BoardBackground, DirtyRegion, ProbabilityOverlay
+from save import AutoSaver, SaveGame, encode, read_save
 from trader import Trader
+from viewport import DEFAULT_SQUARE_SIZE, MIN_SQUARE_SIZE, Viewport
 
 LEFT_CLICK, MIDDLE_CLICK, RIGHT_CLICK, = list(range(1, 4))
 
+BOARD_SCENE, TRADER_SCENE, DEATH_SCENE = list(range(3))
+
+# les journaux des manches, que replay.py rejoue
+REPLAY_DIRECTORY = "replays"
+
+# la sauvegarde de la partie, reprise avec python main.py resume
+SAVE_PATH = "game.save"
+
+# le temps laissé chaque image aux estimations de la surimpression, en
+# secondes
+OVERLAY_BUDGET = 0.003
+
 BOMB =              -1
 COIN =              -2
 MAGNIFIER =         -3
@@ -33,6 +57,9 @@ FLAG =              -11
 
 PASSIVE, ACTIVE = 0, 1
 
+# les objets de la barre latérale encore affichés chez le marchand
+TRADER_ITEMS = [COIN, RIFLE]
+
 ITEM_VALUES = {
     "flag_sheet":       FLAG,
     "bomb_sheet":       BOMB,
@@ -106,12 +133,23 @@ class Game:
     screen (pygame.Surface): The screen on which to draw the game.
     width (int): The number of cells horizontally.
     height (int): The number of cells vertically.
+    endless (bool): Whether the board has no edges, width and height being then
+    ignored.
+    no_guess (bool): Whether the boards are searched for a layout that needs no
+    guess. Ignored for an endless board.
+    save_path (str): The file the game is saved in, or None for no save.
+    replay_directory (str): The directory the input logs of the rounds are
+    written to, or None for no log file.
 
     Attributes:
     screen (pygame.Surface): The screen on which to draw the game.
+    assets (assets.AssetCache): The images shared by every element of the game.
+    dirty (render.DirtyRegion): The parts of the screen to push at the end of
+    the frame.
     clock (pygame.time.Clock): The clock used to control the game loop.
     width (int): The number of cells horizontally.
     height (int): The number of cells vertically.
+    endless (bool): Whether the board has no edges.
     screen_width (int): The width of the screen in pixels.
     screen_height (int): The height of the screen in pixels.
     gui_width (int): The width of the GUI in pixels.
@@ -130,9 +168,32 @@ class Game:
     square_size (int): The size of each square in pixels.
     x_offset (int): The x-coordinate of the left edge of the game grid in pixels.
     y_offset (int): The y-coordinate of the top edge of the game grid in pixels.
+    atlas (atlas.TileAtlas): Every appearance of a cell, rendered for square_size.
+    viewport (viewport.Viewport): The camera through which a board too large for
+    the window is seen, or None when the whole board fits in it.
+    scene (int): The scene shown: BOARD_SCENE (a round), TRADER_SCENE or
+    DEATH_SCENE (once the trader has been shot).
+    next_scene (int): The scene queued by switch(), entered at the beginning of
+    the next frame, or None.
+    pending_events (deque): The events drained from the queue and not handled
+    yet.
+    grid (grid.Grid): The grid of the round, or None before the first one.
+    generator (noguess.NoGuessGenerator): The processes searching for layouts
+    that need no guess, or None.
+    search (noguess.NoGuessSearch): The search started by the first click of the
+    round, polled every frame until it is done, or None.
+    overlay (render.ProbabilityOverlay): The tint of the hidden cells by their
+    probability of holding a bomb, toggled with F4.
+    saver (save.AutoSaver): The thread writing the saves of the game in
+    save_path, at every change of scene and when the game is quit, or None.
+    replay_directory (str): The directory of the input logs, or None.
+    resumed (save.SaveGame): The save whose round is played when the board
+    scene is next entered, or None.
     """
 
-    def __init__(self, screen, width: int, height: int):
+    def __init__(self, screen, width: int, height: int, endless: bool = False,
+                 no_guess: bool = False, save_path: str = SAVE_PATH,
+                 replay_directory: str = REPLAY_DIRECTORY):
         #self.sweeping_sound = pygame.mixer.Sound("sounds/sweeping.wav")
         #self.item_collected = pygame.mixer.Sound("sounds/item_collected.wav")
         self.k_pressed = False
@@ -141,13 +202,18 @@ class Game:
         self.space_pressed = False
         self.round = 1
         self.screen = screen
+        self.assets = AssetCache()
+        self.dirty = DirtyRegion(self.screen)
+        self.profiler = FrameProfiler()
         self.clock = pygame.time.Clock()
         self.width = width  # le nombre de cellules à l'horizontal
         self.height = height  # le nombre de cellules à la verticale
+        self.endless = endless
         self.screen_width = pygame.display.get_surface().get_width()
         self.screen_height = pygame.display.get_surface().get_height()
         self.gui_width = self.screen_width * 10 / 100
         self.gui = Gui(self, self.gui_width)
+        self.inventory = Inventory()
         self.player = Player(self)
         self.player_suicide = False
         self.bomb_exploding = False
@@ -178,19 +244,42 @@ class Game:
         self.trader = Trader(self)
         self.is_trading = True
         self.is_trader_dead = False
+        self.scene = None
+        self.next_scene = TRADER_SCENE
+        self.grid = None
+        self.generator = NoGuessGenerator() if no_guess and not endless else None
+        self.search = None
+        self.overlay = ProbabilityOverlay(self)
+        self.saver = AutoSaver(save_path) if save_path is not None else None
+        self.replay_directory = replay_directory
+        self.resumed = None
+        self.pending_events = deque()
         self.white = True
         self.current_time_already_exists = False
 
         self.square_size = int(min((self.screen_width - self.gui_width) / self.width, self.screen_height / self.height))
         self.x_offset = round((self.screen_width - self.gui_width - self.width * self.square_size) / 2)
         self.y_offset = round((self.screen_height - self.height * self.square_size) / 2)
+
+        # un plateau trop grand pour la fenêtre est vu à travers une caméra
+        self.viewport = None
+        if self.endless or self.square_size < MIN_SQUARE_SIZE:
+            self.viewport = Viewport(self, pygame.Rect(0, 0, int(self.screen_width - self.gui_width), self.screen_height),
+                                     DEFAULT_SQUARE_SIZE)
+
+        self.atlas = TileAtlas(self.assets, self.square_size)
+        self.animation_clock = AnimationClock(self.assets)
+        self.background = None
         self.animations = {}
         self.player_state = PLAYER_INACTIVE
         self.latest_player_state = self.player_state
 
     def handling_events(self):
         """
-        This function handles all the events that occur in the game.
+        This function handles all the events that occur in the game. The event
+        queue is drained once per frame, and each event is dispatched to the
+        handler of what it hits. The events left when a scene is queued are
+        kept for the next scene, so that no click is lost.
 
         Parameters:
             None
@@ -199,92 +288,223 @@ class Game:
             None
         """
         for item in self.player.discovered_items:
-            self.items[item].is_clicked()
+            self.items[item].hover()
+
+        if self.search is not None and self.search.poll():
+            # le plateau sans hasard est trouvé, ou le temps est écoulé
+            self.first_click(self.search.cell, self.search.result())
+            self.search = None
+
+        if self.viewport is not None and not self.is_trading:
+            self.viewport.update(pygame.key.get_pressed())
 
         if self.m_pressed:
             self.round += 1
-            self.run()
+            self.switch(BOARD_SCENE)
+            return
 
         elif self.l_pressed and self.round > 1:
             self.round -= 1
-            self.run()
+            self.switch(BOARD_SCENE)
+            return
 
-        events = pygame.event.get()
-        for event in events:
-            if event.type == pygame.QUIT or event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
-                # pygame.mixer.music.fadeout(1000)
-                # pygame.time.delay(1000)
-                pygame.quit()
-                sys.exit()
+        self.pending_events.extend(pygame.event.get())
+        while self.pending_events and self.next_scene is None:
+            self.dispatch(self.pending_events.popleft())
 
-        if not self.is_trading:
-            for event in events:
-                if event.type == pygame.MOUSEBUTTONDOWN and event.button in [1, 2, 3]:
-                    # This block of code handles mouse clicks.
+    def dispatch(self, event: pygame.event.Event):
+        """
+        Sends an event to its handler: the viewport, the board, an item of the
+        sidebar, the player, the trader or the keyboard shortcuts.
+
+        Parameters:
+            event (pygame.event.Event): The event to handle.
+
+        Returns:
+            None
+        """
+        if event.type == pygame.QUIT or event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
+            # pygame.mixer.music.fadeout(1000)
+            # pygame.time.delay(1000)
+            if self.scene is not None and (self.grid is None or not self.grid.engine.lost):
+                # la partie est sauvegardée telle qu'elle est quittée
+                self.autosave()
+
+            if self.saver is not None:
+                error = self.saver.close()
+                if error is not None:
+                    print(f"the game could not be saved in {self.saver.path}: {error}")
+
+            if self.grid is not None:
+                self.grid.engine.close()
 
-                    mouse_position = pygame.mouse.get_pos()
-                    cell = ((mouse_position[0] - self.x_offset) // self.square_size,
-                            (mouse_position[1] - self.y_offset) // self.square_size)
+            if self.generator is not None:
+                print("\n".join(self.generator.report()))
+                self.generator.shutdown()
 
-                    if cell in self.grid.grid:
-                        if self.is_first_click:
-                            self.grid.create_grid(cell)
-                            # on tire les bombes au hasard
-                            # en donnant cell afin que
-                            # celui-ci ne soit pas une bombe
+            pygame.quit()
+            sys.exit()
 
-                            self.grid.cell_clicked(LEFT_CLICK, cell)
-                            # afin de définir la cellules
-                            # comme découverte (puisque
-                            # elle ne peut pas être une bombe)
-                            self.is_first_click = False
-                            pygame.display.set_caption(f"Vous avez {self.grid.flag_to_place} {'drapeau' if self.grid.flag_to_place in [-1, 0, 1] else 'drapeaux'} à placer ! (manche {self.round})")
+        elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+            self.profiler.toggle()
 
-                        else:
-                            self.grid.cell_clicked(event.button, cell)
+        elif event.type == pygame.KEYDOWN and event.key == pygame.K_F4:
+            self.overlay.toggle()
 
-                    else:
-                        for item in self.player.discovered_items:
-                            if item != COIN:
-                                self.items[item].is_clicked()
+        elif not self.is_trading:
+            if self.viewport is not None:
+                # la caméra garde les événements qui la déplacent
+                event = self.viewport.filter(event)
 
-                        self.player.is_clicked()
+            if event is None:
+                return
 
-                elif event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_m:
-                        self.m_pressed = True
+            elif event.type == pygame.MOUSEBUTTONDOWN and event.button in [LEFT_CLICK, MIDDLE_CLICK, RIGHT_CLICK]:
+                self.board_clicked(event)
 
-                    elif event.key == pygame.K_l:
-                        self.l_pressed = True
+            elif event.type == pygame.KEYDOWN:
+                self.key_pressed(event)
 
-                    elif event.key == pygame.K_SPACE:
-                        self.space_pressed = True
+        elif not self.is_trader_dead:
+            if event.type == pygame.MOUSEBUTTONDOWN and event.button == LEFT_CLICK:
+                item = self.item_at(event.pos)
 
-                    elif event.key == pygame.K_k and not self.k_pressed:
-                        self.k_pressed = True
+                if item is not None:
+                    item.clicked(event)
 
-                        if self.is_first_click:
-                            mouse_position = pygame.mouse.get_pos()
-                            cell = ((mouse_position[0] - self.x_offset) // self.square_size,
-                                    (mouse_position[1] - self.y_offset) // self.square_size)
+                else:
+                    self.trader.clicked(event)
 
-                            if not cell in self.grid.grid:
-                                cell = (9, 9)
+    def item_at(self, position: tuple[int, int]):
+        """
+        Returns the discovered item of the sidebar at the given position of the
+        screen, or None. In the trader scene, only the items still drawn over
+        the trader can be hit.
+        """
+        items = self.player.discovered_items
+        if self.is_trading:
+            items = [item for item in items if item in TRADER_ITEMS]
 
-                            self.grid.create_grid(cell)
-                            self.grid.cell_clicked(LEFT_CLICK, cell)
-                            self.is_first_click = False
+        for item in items:
+            if self.items[item].rect.collidepoint(position):
+                return self.items[item]
 
-                        self.grid.debug()
+        return None
 
-        elif self.is_trading and not self.is_trader_dead:
-            for event in events:
-                if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
-                    self.trader.handling_events()
+    def board_clicked(self, event: pygame.event.Event):
+        """
+        Handles a click during a round: on a cell of the grid, on an item of the
+        sidebar or on the player.
+
+        Parameters:
+            event (pygame.event.Event): The MOUSEBUTTONDOWN event.
+
+        Returns:
+            None
+        """
+        cell = ((event.pos[0] - self.x_offset) // self.square_size,
+                (event.pos[1] - self.y_offset) // self.square_size)
+
+        # un plateau sans fin a des cellules sous la barre latérale
+        if cell in self.grid.grid and (self.viewport is None or self.viewport.rect.collidepoint(event.pos)):
+            self.profiler.mark(EVENTS)
+
+            if self.is_first_click and self.generator is not None:
+                # le plateau est cherché pendant que le jeu continue ; les
+                # clics suivants attendent qu'il soit placé
+                if self.search is None:
+                    self.search = self.generator.start(self.grid.engine, cell)
+                    pygame.display.set_caption(f"Recherche d'un plateau sans hasard... (manche {self.round})")
+
+            elif self.is_first_click:
+                self.first_click(cell)
+
+            else:
+                self.grid.cell_clicked(event.button, cell)
+
+            self.profiler.mark(GRID)
+
+        else:
+            item = self.item_at(event.pos)
+
+            if item is not None:
+                item.clicked(event)
+
+            else:
+                self.player.clicked(event)
+
+    def first_click(self, cell: tuple[int, int], candidate: int = 0):
+        """
+        Places the bombs and the items away from the first cell clicked, then
+        reveals it.
+
+        Parameters:
+            cell (tuple): The first cell clicked.
+            candidate (int): The layout found by a no-guess search, 0 for a
+            plain one.
+
+        Returns:
+            None
+        """
+        self.grid.create_grid(cell, candidate)
+        # on tire les bombes au hasard
+        # en donnant cell afin que
+        # celui-ci ne soit pas une bombe
+
+        self.grid.cell_clicked(LEFT_CLICK, cell)
+        # afin de définir la cellules
+        # comme découverte (puisque
+        # elle ne peut pas être une bombe)
+        self.is_first_click = False
+        pygame.display.set_caption(f"Vous avez {self.grid.engine.flag_to_place} {'drapeau' if self.grid.engine.flag_to_place in [-1, 0, 1] else 'drapeaux'} à placer ! (manche {self.round})")
+
+    def key_pressed(self, event: pygame.event.Event):
+        """
+        Handles the keyboard shortcuts of a round.
+
+        Parameters:
+            event (pygame.event.Event): The KEYDOWN event.
+
+        Returns:
+            None
+        """
+        if event.key == pygame.K_m:
+            self.m_pressed = True
+
+        elif event.key == pygame.K_l:
+            self.l_pressed = True
+
+        elif event.key == pygame.K_SPACE:
+            self.space_pressed = True
+
+        elif event.key == pygame.K_k and not self.k_pressed:
+            self.k_pressed = True
+            self.profiler.mark(EVENTS)
+
+            if self.search is not None:
+                self.search.cancel()
+                self.search = None
+
+            if self.is_first_click:
+                mouse_position = pygame.mouse.get_pos()
+                cell = ((mouse_position[0] - self.x_offset) // self.square_size,
+                        (mouse_position[1] - self.y_offset) // self.square_size)
+
+                if not cell in self.grid.grid:
+                    cell = (9, 9)
+
+                self.grid.create_grid(cell)
+                self.grid.cell_clicked(LEFT_CLICK, cell)
+                self.is_first_click = False
+
+            self.grid.debug()
+            self.profiler.mark(GRID)
 
     def display(self):
         """
         This function is used to display the game elements on the screen.
+        Only the parts of the screen that changed are pushed to the window,
+        unless most of it did.
 
         Parameters:
             None
@@ -292,6 +512,17 @@ class Game:
         Returns:
             None
         """
+        self.profiler.clear(self)
+        if self.viewport is not None and not self.is_trading:
+            if self.viewport.changed:
+                # la caméra efface toute la surimpression
+                self.overlay.forget()
+
+            self.viewport.draw(self.screen)
+
+        if self.overlay.visible and not self.is_trading and not self.is_first_click and not self.endless:
+            self.overlay.draw(OVERLAY_BUDGET)
+
         self.gui.display()
         for item in self.player.discovered_items:
             self.items[item].display()
@@ -316,33 +547,22 @@ class Game:
             self.player.display(self.player_state, 0, ANIMATION_SETTINGS[self.player_state][FRAME_NUMBER], ANIMATION_SETTINGS[self.player_state][FPS_NUMBER], ANIMATION_SETTINGS[self.player_state][LOOP])
 
         if not self.is_trading:
-            pygame.draw.rect(self.screen, (152, 199, 64),
-                pygame.Rect(0, 0,
-                            self.x_offset, self.screen_height))
-
-            pygame.draw.rect(self.screen, (152, 199, 64),
-               pygame.Rect(self.screen_width - self.x_offset - self.gui_width, 0,
-                           self.x_offset, self.screen_height))
-
-            for coordinates, animation in self.animations.items():
-                if animation.filename[8:-4] != "flag_sheet":
-                    color = (229, 194, 159) if (coordinates[0] + coordinates[1]) % 2 == 0 else (215, 184, 153)
-
-                else:
-                    color = (170, 215, 81) if (coordinates[0] + round(coordinates[1])) % 2 == 0 else (162, 209, 73)
+            if self.viewport is None:
+                self.background.restore(self.screen, (0, 0, self.x_offset, self.screen_height))
+                self.background.restore(self.screen, (self.screen_width - self.x_offset - self.gui_width, 0,
+                                                      self.x_offset, self.screen_height))
 
-                pygame.draw.rect(self.screen, color,
-                                pygame.Rect(round(coordinates[0]) * self.square_size + self.x_offset,
-                                            round(coordinates[1]) * self.square_size + self.y_offset,
-                                            self.square_size, self.square_size))
-
-                image = animation.make_anim(0, 0, ANIMATION_SETTINGS[ITEM_VALUES[animation.filename[8:-4]]][FRAME_NUMBER], ANIMATION_SETTINGS[ITEM_VALUES[animation.filename[8:-4]]][FPS_NUMBER], ANIMATION_SETTINGS[ITEM_VALUES[animation.filename[8:-4]]][LOOP])
-                image_x = self.square_size // 35 + coordinates[0] * self.square_size + self.x_offset
-                image_y = self.square_size // 12 + coordinates[1] * self.square_size + self.y_offset
-                self.screen.blit(image, (image_x, image_y))
+            else:
+                self.screen.set_clip(self.viewport.rect)
 
+            self.profiler.mark(BLIT)
+            self.animation_clock.tick(pygame.time.get_ticks())
+            self.profiler.mark(ANIMATION)
+            self.animation_clock.draw(self)
+            self.screen.set_clip(None)
 
         elif self.is_trading and not self.is_trader_dead:
+            self.dirty.invalidate()
             self.trader.display()
             self.trader.sign_hovered()
             self.coin.display()
@@ -351,6 +571,8 @@ class Game:
                 self.items[RIFLE].display()
 
         elif self.is_trading and self.is_trader_dead:
+            self.dirty.invalidate()
+
             if self.white:
                 self.screen.fill((255, 255, 255))
                 if not self.current_time_already_exists:
@@ -364,38 +586,81 @@ class Game:
             else:
                 self.screen.fill((0, 0, 0))
 
-        pygame.display.flip()
+        self.profiler.mark(BLIT)
+        self.profiler.display(self)
+        self.dirty.flush()
+        self.profiler.mark(FLIP)
 
-    def run(self):
+    def switch(self, scene: int):
         """
-        This function initializes the game and runs the main game loop.
+        Queues a change of scene. It is entered at the beginning of the next
+        frame, from the main loop, so that the game never runs a loop inside
+        another one.
 
         Parameters:
+            scene (int): BOARD_SCENE to start a new round, TRADER_SCENE or
+            DEATH_SCENE.
+
+        Returns:
             None
+        """
+        self.next_scene = scene
+
+    def enter(self, scene: int):
+        """
+        Enters a scene. A new round is set up when the scene is BOARD_SCENE, or
+        the saved one resumed, its inputs being logged in replay_directory; the
+        log of the round left is ended. The game is then saved.
+
+        Parameters:
+            scene (int): BOARD_SCENE, TRADER_SCENE or DEATH_SCENE.
 
         Returns:
             None
         """
+        if self.grid is not None:
+            # le journal de la manche quittée est terminé
+            self.grid.engine.close()
 
-        if not self.is_trading:
-            self.screen.fill((152, 199, 64))
+        if self.search is not None:
+            self.search.cancel()
+            self.search = None
+
+        self.scene = scene
+        self.next_scene = None
+        self.is_trading = scene != BOARD_SCENE
+        self.is_trader_dead = scene == DEATH_SCENE
+
+        if scene == BOARD_SCENE:
+            if self.atlas.square_size != self.square_size:
+                self.atlas = TileAtlas(self.assets, self.square_size)
+
+            if self.viewport is not None:
+                # la caméra dessine le plateau, morceau par morceau
+                self.viewport.reset()
+                self.background = self.viewport
+
+            else:
+                # le fond n'est rendu qu'une fois par taille de plateau
+                key = ((int(self.screen_width - self.gui_width), self.screen_height),
+                       self.width, self.height, self.square_size, (self.x_offset, self.y_offset))
+                if self.background is None or self.background.key != key:
+                    self.background = BoardBackground(*key)
+
+                self.screen.blit(self.background.surface, (0, 0))
 
-            for y in range(0, self.height * self.square_size, self.square_size):
-                for x in range(0, self.width * self.square_size, self.square_size):
-                    if (x // self.square_size + y // self.square_size) % 2 == 0:
-                        color = (170, 215, 81)
-                    else:
-                        color = (162, 209, 73)
+            self.profiler.forget()
+            self.dirty.invalidate()
 
-                    pygame.draw.rect(self.screen, color,
-                                    pygame.Rect(x + self.x_offset,
-                                                y + self.y_offset,
-                                                self.square_size,
-                                                self.square_size))
+            engine = self.resumed.engine(self.inventory) if self.resumed is not None else None
+            self.grid = Grid(self, self.width, self.height, endless=self.endless, engine=engine)
 
-            self.grid = Grid(self, self.width, self.height)
+            if self.replay_directory is not None:
+                os.makedirs(self.replay_directory, exist_ok=True)
+                self.grid.engine.log.open(os.path.join(self.replay_directory,
+                                                       f"{self.round}-{self.grid.engine.seed:016x}.replay"))
 
-            self.is_first_click = True
+            self.is_first_click = self.grid.engine.is_first_click
             self.k_pressed = False
             self.l_pressed = False
             self.m_pressed = False
@@ -403,20 +668,132 @@ class Game:
             pygame.display.set_caption(f"Bonne chance ! (manche {self.round})")
             self.initial_time = pygame.time.get_ticks() // 60 * 10
 
-        while True:
-            self.handling_events()
-            self.display()
-            self.clock.tick(60)
+            if self.resumed is not None:
+                # la manche reprise garde ses cellules et sa durée
+                self.initial_time -= self.resumed.elapsed // 60 * 10
+                self.grid.display_all()
+                self.resumed = None
 
-# pygame.mixer.init(channels = 1, buffer = 2048)
-# pygame.mixer.music.load("sounds/music.ogg")
-pygame.init()
-# pygame.mixer.music.set_volume(0.25)
-# pygame.mixer.music.play(-1)
+        self.autosave()
+
+    def autosave(self):
+        """
+        Saves the game in save_path from the thread of the saver: the scene,
+        the round number and the inventory, with the board of the round in
+        progress. An endless board is not saved; its round starts again when
+        the game is resumed. Nothing is saved without a saver.
 
-screen = pygame.display.set_mode((1200, 650))
-game = Game(screen, 18, 18)
-game.run()
+        Parameters:
+            None
 
-pygame.quit()
-sys.exit()
\ No newline at end of file
+        Returns:
+            None
+        """
+        if self.saver is None:
+            return
+
+        engine = self.grid.engine if self.scene == BOARD_SCENE else None
+        self.saver.save(encode(self.scene, self.round, self.inventory, self.width, self.height,
+                               endless=self.endless, engine=engine))
+
+    def resume(self, save: SaveGame):
+        """
+        Resumes a saved game: its round number and inventory are restored, and
+        its scene is entered at the next frame, with the saved board if a round
+        was in progress.
+
+        Parameters:
+            save (save.SaveGame): The save, as read by save.read_save().
+
+        Returns:
+            None
+        """
+        self.round = save.round
+        save.restore_inventory(self.inventory)
+        self.resumed = save if save.has_board else None
+        self.next_scene = save.scene
+
+        equipment = (self.inventory.active_equipped, self.inventory.passive_equipped)
+        if equipment in PLAYER_STATES:
+            self.player_state = PLAYER_STATES[equipment]
+
+    def step(self):
+        """
+        Runs one frame of the game: the scene queued is entered, then the
+        events are handled and the screen is drawn.
+
+        Parameters:
+            None
+
+        Returns:
+            None
+        """
+        if self.next_scene is not None:
+            self.enter(self.next_scene)
+
+        self.profiler.start()
+        self.handling_events()
+        self.profiler.mark(EVENTS)
+        self.display()
+        self.profiler.end()
+
+    def run(self):
+        """
+        This function runs the main game loop, one frame at a time, until the
+        window is closed.
+
+        Parameters:
+            None
+
+        Returns:
+            None
+        """
+        try:
+            while True:
+                self.step()
+                self.clock.tick(60)
+
+        finally:
+            # le journal d'une manche interrompue par une erreur est fermé tel
+            # qu'il est
+            if self.grid is not None:
+                self.grid.engine.log.release()
+
+
+if __name__ == "__main__":
+    # pygame.mixer.init(channels = 1, buffer = 2048)
+    # pygame.mixer.music.load("sounds/music.ogg")
+    pygame.init()
+    # pygame.mixer.music.set_volume(0.25)
+    # pygame.mixer.music.play(-1)
+
+    # la taille du plateau peut être donnée : python main.py 500 500, ou
+    # python main.py endless pour un plateau sans fin ; noguess en plus pour
+    # des plateaux qui se résolvent sans deviner ; resume reprend la partie
+    # sauvegardée, avec la taille de ses plateaux
+    arguments = [argument for argument in sys.argv[1:] if argument not in ["noguess", "resume"]]
+    no_guess = "noguess" in sys.argv[1:]
+    endless = arguments == ["endless"]
+    width, height = map(int, arguments[:2]) if len(arguments) > 1 else (18, 18)
+
+    save = None
+    if "resume" in sys.argv[1:] and os.path.exists(SAVE_PATH):
+        try:
+            save = read_save(SAVE_PATH)
+
+        except (OSError, ValueError) as error:
+            # une sauvegarde illisible n'empêche pas de jouer
+            print(f"{SAVE_PATH} cannot be resumed ({error}): a new game is started")
+
+    if save is not None:
+        width, height, endless = save.width, save.height, save.endless
+
+    screen = pygame.display.set_mode((1200, 650))
+    game = Game(screen, width, height, endless, no_guess)
+    if save is not None:
+        game.resume(save)
+
+    game.run()
+
+    pygame.quit()
+    sys.exit()
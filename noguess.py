@@ -0,0 +1,346 @@
+"""
+Projet démineur
+Auteurs :   Mathis Bulka
+            Samuel Cornier
+            Léo Simon
+            Sacha Trouvé
+
+    Module noguess: génération de plateaux sans hasard, sur plusieurs processus
+
+    python noguess.py --size 30 16 --rounds 1 2 3 4 5 6 --searches 10
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from board import Board
+from engine import Engine, layout_rng
+from inputlog import TOPOLOGIES
+from solver import is_solvable
+
+HIDDEN = 0
+
+# le temps laissé à une recherche, en secondes, avant de garder un plateau
+# ordinaire
+BUDGET = 1.5
+# le nombre de plateaux candidats vérifiés par un processus à la fois
+BATCH = 4
+# le nombre de lots en cours par processus
+IN_FLIGHT = 2
+
+
+def check_batch(width: int, height: int, topology: int, items_to_pick: dict[int, int],
+                cell: tuple[int, int], seed: int, first: int, count: int,
+                deadline: float) -> tuple[int, int]:
+    """
+    Checks a batch of candidate layouts, in a process of the pool.
+
+    Parameters
+    ----------
+    width, height : int
+        The size of the board.
+    topology : int
+        The shape of the board, as its index in TOPOLOGIES.
+    items_to_pick : dict[int, int]
+        The bombs and the items to place, as in Engine.items_to_pick.
+    cell : tuple[int, int]
+        The first cell clicked.
+    seed : int
+        The seed of the candidates, Engine.layout_seed.
+    first, count : int
+        The candidates to check, from first on.
+    deadline : float
+        The time.time() after which the batch is given up.
+
+    Returns
+    -------
+    candidate : int or None
+        The first candidate that needs no guess, or None.
+    attempts : int
+        The number of candidates checked.
+    """
+    board = Board(width, height, TOPOLOGIES[topology])
+
+    for candidate in range(first, first + count):
+        if time.time() > deadline:
+            return None, candidate - first
+
+        board.place(cell, items_to_pick, layout_rng(seed, candidate))
+        board.states[:] = HIDDEN
+
+        if is_solvable(board, cell, deadline=deadline):
+            return candidate, candidate - first + 1
+
+    return None, count
+
+
+class RoundStats:
+    """
+    The no-guess searches of one round number.
+
+    Attributes
+    ----------
+    searches : int
+        The number of searches finished.
+    successes : int
+        The number of searches that found a layout needing no guess.
+    attempts : int
+        The number of candidate layouts checked.
+    elapsed : float
+        The time spent searching, in seconds.
+    """
+
+    def __init__(self):
+        self.searches = 0
+        self.successes = 0
+        self.attempts = 0
+        self.elapsed = 0.0
+
+    def attempts_per_second(self) -> float:
+        """
+        Returns the number of candidates checked per second of search.
+        """
+        return self.attempts / self.elapsed if self.elapsed else 0.0
+
+    def success_rate(self) -> float:
+        """
+        Returns the share of the searches that found a layout.
+        """
+        return self.successes / self.searches if self.searches else 0.0
+
+
+class NoGuessGenerator:
+    """
+    Finds board layouts that can be cleared from the first click without
+    guessing. The candidate layouts of a round are checked by the solver over
+    a pool of processes; the first one that needs no guess, in the order of
+    the candidates, is kept, so that a search with enough time always picks
+    the same layout. When the time budget runs out, the plain layout is kept.
+
+    A search never blocks: the game starts it on the first click, then polls
+    it once per frame.
+
+    Parameters
+    ----------
+    budget : float, optional
+        The time given to a search, in seconds. The default is BUDGET.
+    workers : int, optional
+        The number of processes. The default is the number of processors.
+
+    Attributes
+    ----------
+    budget : float
+        The time given to a search, in seconds.
+    workers : int
+        The number of processes.
+    pool : ProcessPoolExecutor
+        The processes, started with the first search.
+    stats : dict[int, RoundStats]
+        The searches of every round number.
+    """
+
+    def __init__(self, budget: float = BUDGET, workers: int = None):
+        self.budget = budget
+        self.workers = workers or os.cpu_count() or 1
+        self.pool = None
+        self.stats = {}
+
+    def start(self, engine: Engine, cell: tuple[int, int]) -> "NoGuessSearch":
+        """
+        Starts the search of a layout for the board of an engine, whose first
+        click is on the given cell.
+        """
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(self.workers)
+
+        return NoGuessSearch(self, engine, cell)
+
+    def record(self, round_number: int, attempts: int, success: bool, elapsed: float):
+        """
+        Adds a finished search to the stats of its round.
+        """
+        stats = self.stats.setdefault(round_number, RoundStats())
+        stats.searches += 1
+        stats.successes += success
+        stats.attempts += attempts
+        stats.elapsed += elapsed
+
+    def report(self) -> list[str]:
+        """
+        Returns one line of stats per round number.
+        """
+        return [f"round {round_number}: {stats.searches} searches, "
+                f"{stats.success_rate():.0%} without guess, "
+                f"{stats.attempts_per_second():.0f} attempts/s"
+                for round_number, stats in sorted(self.stats.items())]
+
+    def shutdown(self):
+        """
+        Stops the processes, dropping the batches not started.
+        """
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = None
+
+
+class NoGuessSearch:
+    """
+    One search, polled by its owner until it is done.
+
+    Parameters
+    ----------
+    generator : NoGuessGenerator
+        The generator whose processes check the candidates.
+    engine : Engine
+        The engine whose board is searched for.
+    cell : tuple[int, int]
+        The first cell clicked.
+
+    Attributes
+    ----------
+    cell : tuple[int, int]
+        The first cell clicked.
+    candidate : int or None
+        The layout found, once done, or None.
+    done : bool
+        Whether the search is over: found, out of time or cancelled.
+    attempts : int
+        The number of candidates checked.
+    """
+
+    def __init__(self, generator: NoGuessGenerator, engine: Engine, cell: tuple[int, int]):
+        board = engine.board
+        self.generator = generator
+        self.round = engine.round
+        self.cell = cell
+        self.arguments = (board.width, board.height, TOPOLOGIES.index(board.topology),
+                          engine.items_to_pick, cell, engine.layout_seed)
+        self.start = time.time()
+        self.deadline = self.start + generator.budget
+        self.futures = deque()
+        self.next_candidate = 0
+        self.candidate = None
+        self.done = False
+        self.attempts = 0
+
+        self.fill()
+
+    def fill(self):
+        """
+        Sends batches of candidates to the processes, IN_FLIGHT per process.
+        """
+        while len(self.futures) < IN_FLIGHT * self.generator.workers:
+            self.futures.append(self.generator.pool.submit(check_batch, *self.arguments,
+                                                           self.next_candidate, BATCH, self.deadline))
+            self.next_candidate += BATCH
+
+    def poll(self) -> bool:
+        """
+        Reads the batches checked so far, without waiting, and returns whether
+        the search is over. A batch that failed ends the search with the plain
+        layout; its error is printed.
+        """
+        if self.done:
+            return True
+
+        # les lots sont lus dans l'ordre des candidats
+        while self.futures and self.futures[0].done():
+            try:
+                candidate, attempts = self.futures.popleft().result()
+
+            except Exception as error:
+                # une erreur d'un processus n'arrête pas la partie : le
+                # plateau ordinaire est gardé
+                print(f"no-guess search failed, the plain layout is kept: {error!r}", file=sys.stderr)
+                self.finish(None)
+                return True
+
+            self.attempts += attempts
+
+            if candidate is not None:
+                self.finish(candidate)
+                return True
+
+        if time.time() >= self.deadline:
+            self.finish(None)
+            return True
+
+        self.fill()
+
+        return False
+
+    def finish(self, candidate: int):
+        """
+        Ends the search with the given candidate, and records it in the stats.
+        """
+        self.stop()
+        self.candidate = candidate
+        self.generator.record(self.round, self.attempts, candidate is not None, time.time() - self.start)
+
+    def stop(self):
+        """
+        Drops the batches left; the ones already checked count as attempts.
+        """
+        self.done = True
+
+        for future in self.futures:
+            if not future.cancel() and future.done() and future.exception() is None:
+                self.attempts += future.result()[1]
+
+        self.futures.clear()
+
+    def cancel(self):
+        """
+        Cancels the search, which is not recorded in the stats.
+        """
+        if not self.done:
+            self.stop()
+
+    def result(self) -> int:
+        """
+        Returns the layout to place: the one found, or the plain one.
+        """
+        return 0 if self.candidate is None else self.candidate
+
+
+def main(arguments: list[str] = None) -> int:
+    """
+    Runs searches for the rounds given on the command line and prints their
+    stats.
+    """
+    parser = argparse.ArgumentParser(description="Measures the no-guess generation of boards.")
+    parser.add_argument("--size", type=int, nargs=2, default=[30, 16], metavar=("WIDTH", "HEIGHT"))
+    parser.add_argument("--rounds", type=int, nargs="+", default=[1, 2, 3, 4, 5, 6])
+    parser.add_argument("--searches", type=int, default=10, help="the number of searches per round")
+    parser.add_argument("--budget", type=float, default=BUDGET)
+    parser.add_argument("--workers", type=int, default=None)
+    arguments = parser.parse_args(arguments)
+
+    width, height = arguments.size
+    generator = NoGuessGenerator(arguments.budget, arguments.workers)
+    rng = random.Random(0)
+
+    try:
+        for round_number in arguments.rounds:
+            for _ in range(arguments.searches):
+                engine = Engine(width, height, round_number, rng=rng)
+                search = generator.start(engine, (width // 2, height // 2))
+
+                while not search.poll():
+                    time.sleep(0.001)
+
+        print("\n".join(generator.report()))
+
+    finally:
+        generator.shutdown()
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -32,6 +32,9 @@ class Player:
     Parameters:
         game (Game): The game instance the player belongs to.
 
+    The discovered and equipped items are stored in the inventory of the
+    game, and only read from the player.
+
     Attributes:
         discovered_items (list): A list of items that the player has discovered.
         game (Game): The game instance the player belongs to.
@@ -43,8 +46,8 @@ class Player:
     """
 
     def __init__(self, game):
-        self.discovered_items = [COIN, MAGNIFIER, METAL_SCRAP, SHIELD, UPGRADER, BIONIC_GLASSES, ARMOR, JAMMER, RIFLE]
         self.game = game
+        self.discovered_items = [COIN, MAGNIFIER, METAL_SCRAP, SHIELD, UPGRADER, BIONIC_GLASSES, ARMOR, JAMMER, RIFLE]
         self.x = self.game.screen_width - self.game.gui_width
         self.y = self.game.screen_height - self.game.gui_width
 
@@ -58,6 +61,30 @@ class Player:
         self.passive_equipped = None
         self.active_equipped = None
 
+    @property
+    def discovered_items(self) -> list:
+        return self.game.inventory.discovered_items
+
+    @discovered_items.setter
+    def discovered_items(self, discovered_items: list):
+        self.game.inventory.discovered_items = discovered_items
+
+    @property
+    def passive_equipped(self):
+        return self.game.inventory.passive_equipped
+
+    @passive_equipped.setter
+    def passive_equipped(self, item):
+        self.game.inventory.passive_equipped = item
+
+    @property
+    def active_equipped(self):
+        return self.game.inventory.active_equipped
+
+    @active_equipped.setter
+    def active_equipped(self, item):
+        self.game.inventory.active_equipped = item
+
     def display(self, line: int, start_frame: int, end_frame: int, fps: int, loop: bool):
         """
         Display the player on the screen.
@@ -70,19 +97,20 @@ class Player:
         """
         self.image = self.animation.make_anim(line, start_frame, end_frame, fps, loop)
         self.game.screen.blit(self.image, (self.x, self.y))
+        self.game.dirty.add(self.image.get_rect(topleft=(self.x, self.y)))
 
-    def is_clicked(self):
+    def clicked(self, event: pygame.event.Event):
         """
-        Check if the player is clicked.
+        Handle a click outside the grid.
 
-        This function checks if the mouse cursor is currently hovering over the player.
-        If it is and if the player has the rifle equipped, it changes the animation.
+        If the click is on the player and if the player has the rifle equipped,
+        it changes the animation.
 
         Parameters:
-            None
+            event (pygame.event.Event): The MOUSEBUTTONDOWN event.
 
         Returns:
             None
         """
-        if self.rect.collidepoint(pygame.mouse.get_pos()) and self.active_equipped == RIFLE:
-            self.game.player_suicide = True
\ No newline at end of file
+        if self.rect.collidepoint(event.pos) and self.active_equipped == RIFLE:
+            self.game.player_suicide = True
@@ -0,0 +1,378 @@
+"""
+Projet démineur
+Auteurs :   Mathis Bulka
+            Samuel Cornier
+            Léo Simon
+            Sacha Trouvé
+
+    Module probability: estimation par Monte-Carlo du risque de chaque
+    cellule cachée
+"""
+
+import time
+
+import numpy
+
+from solver import Solver
+
+BOMB = -1
+JAMMER = -9
+
+FLAGGED, HIDDEN, NOT_HIDDEN = -1, 0, 1
+
+# le nombre de chaînes tirées ensemble
+CHAINS = 256
+# la sévérité envers les contraintes non respectées : les chaînes incohérentes
+# y reviennent vite, sans rester bloquées
+BETA = 2.0
+# au-delà, la frontière est trop grande pour être estimée dans le budget d'une
+# image
+FRONTIER_LIMIT = 1024
+
+
+class ProbabilityEngine:
+    """
+    Estimates the probability for every hidden cell of a round to hold a bomb,
+    from what the player can see: the revealed numbers and the number of flags
+    left to place.
+
+    The hidden region is completed by CHAINS Markov chains at once, as the
+    rows of a boolean array, so that a step of all of them is a few numpy
+    operations. Only the cells of the frontier (around a revealed number) are
+    drawn one by one; the others are alike, and only their number of objects
+    matters, which is weighted by the number of ways to spread it among them.
+    A step flips one frontier cell in every chain, and is accepted by the
+    Metropolis rule; the completions breaking a number are allowed but made
+    unlikely, and only the ones breaking none are counted, so that the counts
+    follow the consistent completions of the board. The step then swaps two
+    frontier cells the same way, so that the chains still move when the
+    number of objects of the frontier is settled.
+
+    The constraints are kept sparse: every frontier cell has the list of the
+    constraints it is in, and a move only updates the residuals of these
+    constraints. Above FRONTIER_LIMIT frontier cells, no estimate is made.
+
+    The numbers count the bombs and the items alike, so the chains complete
+    objects. An object is a bomb with the share of bombs among the objects
+    left, which is what probabilities() returns.
+
+    A jammer placed on a revealed cell may cover a bomb that the numbers
+    around it still count, so the jammers of the frontier are drawn as well;
+    they are not among the objects left, and get no probability.
+
+    The chains are kept from one click to the next: the frontier is updated
+    and the counts start again, but the chains start from where they were,
+    which is close to a consistent completion.
+
+    Parameters
+    ----------
+    engine : Engine
+        The engine of the round. Its board is only read.
+    chains : int, optional
+        The number of chains. The default is CHAINS.
+    seed : int, optional
+        The seed of the chains. The default is None, for a random one.
+
+    Attributes
+    ----------
+    engine : Engine
+        The engine of the round.
+    states : numpy.ndarray
+        The states of the board the chains were set up for.
+    frontier : numpy.ndarray
+        The flat indices of the frontier cells.
+    interior : numpy.ndarray
+        The flat indices of the other hidden cells.
+    counted : numpy.ndarray
+        Whether each frontier cell is hidden, rather than a jammer, so that its
+        object counts among the objects left.
+    table : numpy.ndarray
+        The constraints of every frontier cell, as a (frontier, degree) array
+        padded with the index of a last residual that never changes.
+    limited : bool
+        Whether the frontier is too large to be estimated.
+    left : int
+        The number of objects in the hidden cells.
+    samples : int
+        The number of consistent completions counted since the last click.
+    """
+
+    def __init__(self, engine, chains: int = CHAINS, seed: int = None):
+        self.engine = engine
+        self.solver = Solver(engine.board)
+        self.rng = numpy.random.default_rng(seed)
+        self.chains = chains
+        self.rows = numpy.arange(chains)
+        self.states = None
+        self.frontier = numpy.zeros(0, dtype=numpy.int64)
+        self.interior = numpy.zeros(0, dtype=numpy.int64)
+        self.counted = numpy.zeros(0, dtype=numpy.bool_)
+        self.left = 0
+        self.table = numpy.zeros((0, 0), dtype=numpy.int64)
+        self.limited = False
+        self.completions = numpy.zeros((chains, 0), dtype=numpy.bool_)
+        self.residuals = numpy.zeros((chains, 1), dtype=numpy.int16)
+        self.errors = numpy.zeros(chains, dtype=numpy.int32)
+        self.inside = numpy.zeros(chains, dtype=numpy.int64)
+        self.frontier_counts = numpy.zeros(0)
+        self.interior_count = 0.0
+        self.samples = 0
+
+    def setup(self):
+        """
+        Sets the chains up for the current board: its frontier, its constraints
+        and the objects left, keeping the cells of the chains still on the
+        frontier.
+        """
+        board = self.engine.board
+        states = board.states
+        self.states = states.copy()
+
+        unknown, objects, jammers = self.solver.known()
+        cells, rows, targets = self.solver.flat_constraints(unknown, objects)
+
+        # les objets restants sont publics : les drapeaux à placer, plus ceux
+        # déjà posés (qui peuvent être faux)
+        self.left = self.engine.flag_to_place + int(numpy.count_nonzero(states == FLAGGED))
+
+        frontier, columns = numpy.unique(cells, return_inverse=True)
+        self.limited = len(frontier) > FRONTIER_LIMIT
+        if self.limited:
+            return
+
+        hidden = unknown & ~jammers
+        count = int(numpy.count_nonzero(hidden))
+        hidden[frontier] = False
+        self.interior = numpy.flatnonzero(hidden)
+        counted = ~jammers[frontier]
+
+        # les contraintes de chaque cellule, dans l'ordre des cellules ; les
+        # places libres renvoient au dernier résidu, qui reste nul
+        order = numpy.argsort(columns, kind="stable")
+        degrees = numpy.bincount(columns, minlength=len(frontier))
+        firsts = numpy.cumsum(degrees) - degrees
+        self.table = numpy.full((len(frontier), degrees.max(initial=0)), len(targets), dtype=numpy.int64)
+        self.table[columns[order], numpy.arange(len(order)) - firsts[columns[order]]] = rows[order]
+
+        # les chaînes gardent les cellules restées sur la frontière ; les
+        # nouvelles sont tirées avec la densité d'objets restante
+        density = self.left / count if count else 0.0
+        completions = self.rng.random((self.chains, len(frontier))) < density
+        kept = numpy.isin(frontier, self.frontier)
+        completions[:, kept] = self.completions[:, numpy.searchsorted(self.frontier, frontier[kept])]
+
+        self.frontier = frontier
+        self.counted = counted
+        self.completions = completions
+        self.residuals = numpy.zeros((self.chains, len(targets) + 1), dtype=numpy.int16)
+        self.residuals[:, :-1] -= targets.astype(numpy.int16)
+        if len(targets):
+            starts = numpy.searchsorted(rows, numpy.arange(len(targets)))
+            self.residuals[:, :-1] += numpy.add.reduceat(completions[:, columns].astype(numpy.int16), starts, axis=1)
+
+        self.errors = numpy.abs(self.residuals).sum(axis=1)
+        self.inside = self.left - completions[:, counted].sum(axis=1)
+
+        self.frontier_counts = numpy.zeros(len(frontier))
+        self.interior_count = 0.0
+        self.samples = 0
+
+    def step(self):
+        """
+        Moves every chain twice, each move being accepted by the Metropolis
+        rule, then counts the consistent completions. The first move flips a
+        frontier cell, which moves an object between the frontier and the
+        interior; the second one swaps two frontier cells, which keeps the
+        number of objects of the frontier.
+        """
+        if self.limited:
+            return
+
+        size = len(self.frontier)
+        interior = len(self.interior)
+        chains = self.rows
+
+        if size:
+            cells = self.rng.integers(size, size=self.chains)
+            signs = 1 - 2 * self.completions[chains, cells].astype(numpy.int16)
+            change = self.change(cells, signs)
+
+            # le nombre de façons de répartir les autres objets dans
+            # l'intérieur change d'un facteur k / (n - k + 1) quand un objet le
+            # quitte, et (n - k) / (k + 1) quand il y entre ; un brouilleur ne
+            # change pas les objets de l'intérieur
+            counted = self.counted[cells]
+            inside = self.inside - signs * counted
+            with numpy.errstate(divide="ignore", invalid="ignore"):
+                ratios = numpy.where(signs > 0, self.inside / (interior - self.inside + 1),
+                                     (interior - self.inside) / (self.inside + 1))
+                weights = numpy.where(counted, numpy.log(ratios), 0.0)
+
+            self.accept((inside >= 0) & (inside <= interior), weights, change, cells, inside)
+
+            first = self.rng.integers(size, size=self.chains)
+            second = self.rng.integers(size, size=self.chains)
+            signs = 1 - 2 * self.completions[chains, first].astype(numpy.int16)
+            change = self.change(first, signs, second)
+            valid = ((self.completions[chains, first] != self.completions[chains, second])
+                     & (self.counted[first] == self.counted[second]))
+
+            self.accept(valid, 0.0, change, first, self.inside, second)
+
+        consistent = (self.errors == 0) & (self.inside >= 0) & (self.inside <= interior)
+        count = int(numpy.count_nonzero(consistent))
+        if count:
+            self.frontier_counts += self.completions[consistent].sum(axis=0)
+            self.interior_count += self.inside[consistent].sum()
+            self.samples += count
+
+    def change(self, cells: numpy.ndarray, signs: numpy.ndarray,
+               others: numpy.ndarray = None) -> tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray]:
+        """
+        Computes a move of every chain from the constraints of the cells it
+        flips only.
+
+        Parameters
+        ----------
+        cells : numpy.ndarray
+            The frontier cell flipped by each chain.
+        signs : numpy.ndarray
+            The change of each of these cells, 1 when it gets an object and -1
+            when it loses it.
+        others : numpy.ndarray, optional
+            The second frontier cell flipped by each chain, for a swap: it
+            changes the other way.
+
+        Returns
+        -------
+        columns : numpy.ndarray
+            The residuals touched by each chain, as a (chains, touched) array.
+        residuals : numpy.ndarray
+            Their values after the move.
+        errors : numpy.ndarray
+            The number of objects the constraints of each chain are off by
+            after the move.
+        """
+        last = self.residuals.shape[1] - 1
+        columns = self.table[cells]
+        deltas = signs[:, None] * (columns != last)
+
+        if others is not None:
+            # une contrainte des deux cellules reçoit les deux changements, et
+            # n'est gardée qu'une fois
+            other_columns = self.table[others]
+            other_deltas = -signs[:, None] * (other_columns != last)
+            shared = other_columns[:, :, None] == columns[:, None, :]
+            deltas = deltas + (shared * other_deltas[:, :, None]).sum(axis=1, dtype=numpy.int16)
+            repeated = shared.any(axis=2)
+            other_columns[repeated] = last
+            other_deltas[repeated] = 0
+
+            columns = numpy.concatenate((columns, other_columns), axis=1)
+            deltas = numpy.concatenate((deltas, other_deltas), axis=1)
+
+        before = self.residuals[self.rows[:, None], columns]
+        after = before + deltas
+        errors = self.errors + (numpy.abs(after) - numpy.abs(before)).sum(axis=1)
+
+        return columns, after, errors
+
+    def accept(self, valid: numpy.ndarray, weights, change: tuple,
+               cells: numpy.ndarray, inside: numpy.ndarray, others: numpy.ndarray = None):
+        """
+        Applies the moves of the chains accepted by the Metropolis rule.
+
+        Parameters
+        ----------
+        valid : numpy.ndarray
+            Whether the move of each chain is possible.
+        weights : numpy.ndarray or float
+            The logarithm of the ratio of the weights of the completions after
+            and before the move, the broken numbers aside.
+        change : tuple
+            The residuals touched by the move, as returned by change().
+        cells : numpy.ndarray
+            The frontier cell flipped by each chain.
+        inside : numpy.ndarray
+            The number of objects of the interior after the move.
+        others : numpy.ndarray, optional
+            The second frontier cell flipped by each chain, for a swap.
+
+        Returns
+        -------
+        None
+        """
+        columns, residuals, errors = change
+        with numpy.errstate(invalid="ignore"):
+            log_acceptance = weights - BETA * (errors - self.errors)
+
+        accepted = valid & (numpy.log(self.rng.random(self.chains)) < log_acceptance)
+        rows = self.rows[accepted]
+
+        self.completions[rows, cells[accepted]] ^= True
+        if others is not None:
+            self.completions[rows, others[accepted]] ^= True
+
+        self.residuals[rows[:, None], columns[accepted]] = residuals[accepted]
+        self.errors[accepted] = errors[accepted]
+        self.inside[accepted] = inside[accepted]
+
+    def update(self, budget: float):
+        """
+        Sets the chains up again if the board changed, then steps them for the
+        given time.
+
+        Parameters
+        ----------
+        budget : float
+            The time to spend, in seconds.
+
+        Returns
+        -------
+        None
+        """
+        start = time.perf_counter()
+
+        if self.states is None or not numpy.array_equal(self.states, self.engine.board.states):
+            self.setup()
+
+        while True:
+            self.step()
+
+            if time.perf_counter() - start >= budget:
+                break
+
+    def probabilities(self) -> numpy.ndarray:
+        """
+        Returns the estimated probability for every cell of the board to hold a
+        bomb, NaN for the revealed cells, and for all the hidden ones while no
+        consistent completion has been counted or when the frontier is too
+        large.
+        """
+        board = self.engine.board
+        result = numpy.full(board.size, numpy.nan)
+
+        if self.limited:
+            return result
+
+        if not self.samples or not self.left:
+            if not self.left:
+                result[self.frontier[self.counted]] = 0.0
+                result[self.interior] = 0.0
+
+            return result
+
+        # une case qui contient un objet contient une bombe avec la part des
+        # bombes parmi les objets restants ; les bombes sous les brouilleurs
+        # sont inconnues, mais les objets découverts ne sont jamais brouillés
+        items_to_pick = self.engine.items_to_pick
+        items_left = sum(items_to_pick.values()) - items_to_pick.get(BOMB, 0)
+        items_left -= int(numpy.count_nonzero((board.states == NOT_HIDDEN) & (board.values < BOMB)
+                                              & (board.values != JAMMER)))
+        share = min(max((self.left - items_left) / self.left, 0.0), 1.0)
+
+        result[self.frontier[self.counted]] = self.frontier_counts[self.counted] / self.samples * share
+        if len(self.interior):
+            result[self.interior] = self.interior_count / self.samples / len(self.interior) * share
+
+        return result
@@ -0,0 +1,180 @@
+"""
+Projet démineur
+Auteurs :   Mathis Bulka
+            Samuel Cornier
+            Léo Simon
+            Sacha Trouvé
+
+    Module profiler: temps passé dans chaque phase d'une image, affichés en
+    surimpression avec F3
+"""
+
+from collections import deque
+from time import perf_counter_ns
+
+import pygame
+
+EVENTS, GRID, ANIMATION, BLIT, FLIP = list(range(5))
+
+PHASE_NAMES = {
+    EVENTS:     "events",
+    GRID:       "grid",
+    ANIMATION:  "animation",
+    BLIT:       "blit",
+    FLIP:       "flip"
+}
+
+WINDOW = 120
+PERCENTILES = [50, 95, 99]
+
+TEXT_SIZE = 14
+TEXT_COLOR = (255, 255, 255)
+PANEL_COLOR = (0, 0, 0, 180)
+PANEL_POSITION = (4, 4)
+LINE_HEIGHT = TEXT_SIZE + 2
+
+
+class FrameProfiler:
+    """
+    Measures the time spent in each phase of a frame with perf_counter_ns(),
+    and draws the percentiles of the last frames over the screen.
+
+    The main loop calls start() at the beginning of a frame, mark(phase) at
+    the end of each phase and end() at the end of the frame. When the profiler
+    is off, these calls return at once, so they are left in the code.
+
+    Parameters:
+    window (int): The number of frames the percentiles are computed on.
+
+    Attributes:
+    enabled (bool): Whether the phases are measured and the overlay drawn.
+    frames (dict): The duration of each phase in the last frames, in
+    nanoseconds, keyed by phase.
+    current (list): The duration of each phase in the current frame.
+    last (int): The time of the last mark, in nanoseconds.
+    rect (Rect): The part of the screen covered by the overlay, or None.
+    under (Surface): What the overlay covers on the screen, restored at the
+    beginning of the next frame.
+    """
+
+    def __init__(self, window: int = WINDOW):
+        self.enabled = False
+        self.frames = {phase: deque(maxlen=window) for phase in PHASE_NAMES}
+        self.current = [0] * len(PHASE_NAMES)
+        self.last = 0
+        self.rect = None
+        self.under = None
+
+    def toggle(self):
+        """
+        Turns the profiler on or off. The frames measured so far are
+        forgotten.
+        """
+        self.enabled = not self.enabled
+
+        for frames in self.frames.values():
+            frames.clear()
+
+    def start(self):
+        """
+        Starts a frame.
+        """
+        if not self.enabled:
+            return
+
+        self.current = [0] * len(PHASE_NAMES)
+        self.last = perf_counter_ns()
+
+    def mark(self, phase: int):
+        """
+        Ends a phase: the time elapsed since the last mark is added to it.
+        """
+        if not self.enabled:
+            return
+
+        now = perf_counter_ns()
+        self.current[phase] += now - self.last
+        self.last = now
+
+    def end(self):
+        """
+        Ends a frame, and keeps the duration of its phases.
+        """
+        if not self.enabled:
+            return
+
+        for phase, duration in enumerate(self.current):
+            self.frames[phase].append(duration)
+
+    def percentiles(self, durations) -> list[float]:
+        """
+        Returns the PERCENTILES of the given durations, in milliseconds.
+        """
+        durations = sorted(durations)
+        if not durations:
+            return [0.0] * len(PERCENTILES)
+
+        return [durations[min(len(durations) - 1, len(durations) * percentile // 100)] / 1_000_000
+                for percentile in PERCENTILES]
+
+    def clear(self, game):
+        """
+        Restores what the overlay covered in the previous frame, before anything
+        else is drawn.
+        """
+        if self.under is not None:
+            game.screen.blit(self.under, self.rect.topleft)
+            game.dirty.add(self.rect)
+            self.under = None
+
+    def forget(self):
+        """
+        Forgets what the overlay covered, once the whole screen has been drawn
+        again under it.
+        """
+        self.under = None
+
+    def display(self, game):
+        """
+        Draws the overlay over the screen: the percentiles of each phase and of
+        the whole frame, the number of animated cells, of cached surfaces and of
+        rects pushed by the last frame (0 when the whole screen was). Its own
+        drawing is not measured.
+
+        Parameters:
+        game (Game): The game being profiled.
+        """
+        if not self.enabled:
+            return
+
+        totals = [sum(durations) for durations in zip(*self.frames.values())]
+        header = "".join(f"{'p' + str(percentile):>8}" for percentile in PERCENTILES)
+        lines = [f"{'ms':<10}{header}"]
+
+        for phase, name in PHASE_NAMES.items():
+            lines.append(f"{name:<10}" + "".join(f"{value:>8.2f}" for value in self.percentiles(self.frames[phase])))
+
+        lines.append(f"{'frame':<10}" + "".join(f"{value:>8.2f}" for value in self.percentiles(totals)))
+
+        assets = game.assets
+        lines.append(f"animations {len(game.animations)}")
+        lines.append(f"surfaces   {len(assets.images) + len(assets.scaled) + len(assets.texts)}")
+        lines.append(f"dirty      {game.dirty.pushed}")
+
+        # le texte change à chaque image : il n'est pas mis en cache
+        font = assets.font(TEXT_SIZE, "Courier New")
+        images = [font.render(line, True, TEXT_COLOR) for line in lines]
+
+        self.rect = pygame.Rect(PANEL_POSITION, (max(image.get_width() for image in images) + 8,
+                                                 len(images) * LINE_HEIGHT + 8)).clip(game.screen.get_rect())
+        self.under = game.screen.subsurface(self.rect).copy()
+
+        panel = pygame.Surface(self.rect.size, pygame.SRCALPHA)
+        panel.fill(PANEL_COLOR)
+        for line, image in enumerate(images):
+            panel.blit(image, (4, 4 + line * LINE_HEIGHT))
+
+        game.screen.blit(panel, self.rect.topleft)
+        game.dirty.add(self.rect)
+
+        self.last = perf_counter_ns()
@@ -0,0 +1,273 @@
+"""
+Projet démineur
+Auteurs :   Mathis Bulka
+            Samuel Cornier
+            Léo Simon
+            Sacha Trouvé
+
+    Module render: envoi à l'écran des seules zones modifiées, et fond du
+    plateau
+"""
+
+import numpy
+import pygame
+
+from probability import ProbabilityEngine
+
+MARGIN_COLOR = (152, 199, 64)
+HIDDEN_COLORS = [(170, 215, 81), (162, 209, 73)]
+
+HIDDEN = 0
+
+# les teintes de la surimpression, du vert (sûr) au rouge (bombe)
+SAFE_TINT = (50, 170, 60)
+BOMB_TINT = (230, 30, 30)
+TINT_ALPHA = 130
+TINT_LEVELS = 10
+
+
+class DirtyRegion:
+    """
+    Keeps track of the parts of the screen drawn during a frame, so that only
+    those are pushed to the window with pygame.display.update(rects).
+
+    The whole window is pushed with pygame.display.flip() instead when it has
+    been invalidated, or when the dirty rects cover more than a threshold
+    fraction of it.
+
+    Parameters:
+    screen (pygame.Surface): The screen surface.
+    threshold (float): The fraction of the screen above which a full flip is
+    done.
+
+    Attributes:
+    screen (pygame.Surface): The screen surface.
+    threshold (float): The fraction of the screen above which a full flip is
+    done.
+    rects (list): The rects drawn since the last flush.
+    area (int): The total area of rects, in pixels (overlaps counted twice).
+    full (bool): Whether the whole screen will be pushed at the next flush.
+    pushed (int): The number of rects pushed by the last flush, 0 for a flip.
+    """
+
+    def __init__(self, screen: pygame.Surface, threshold: float = 0.4):
+        self.screen = screen
+        self.threshold = threshold
+        self.rects = []
+        self.area = 0
+        self.full = True
+        self.pushed = 0
+
+    def add(self, rect):
+        """
+        Marks a part of the screen as drawn.
+
+        Parameters:
+        rect (Rect or tuple): The part of the screen drawn.
+        """
+        if self.full:
+            return
+
+        rect = pygame.Rect(rect).clip(self.screen.get_rect())
+        if rect.width and rect.height:
+            self.rects.append(rect)
+            self.area += rect.width * rect.height
+
+            if self.area > self.threshold * self.screen.get_width() * self.screen.get_height():
+                self.invalidate()
+
+    def invalidate(self):
+        """
+        Marks the whole screen as drawn.
+        """
+        self.full = True
+        self.rects = []
+        self.area = 0
+
+    def flush(self):
+        """
+        Pushes the parts of the screen drawn since the last flush to the window.
+        """
+        self.pushed = 0
+
+        if self.full:
+            pygame.display.flip()
+
+        elif self.rects:
+            pygame.display.update(self.rects)
+            self.pushed = len(self.rects)
+
+        self.full = False
+        self.rects = []
+        self.area = 0
+
+
+class BoardBackground:
+    """
+    The background of the play area at the start of a round: the margins and
+    the checkerboard of the hidden cells, rendered once in an off-screen
+    surface with the same coordinates as the screen. Any cell or margin can
+    then be cleared with a single area blit of it.
+
+    The checkerboard is built with one pixel per cell, then scaled to the
+    size of the board without smoothing.
+
+    Parameters:
+    size (tuple): The size of the play area (the screen without the gui).
+    width (int): The number of columns of the board.
+    height (int): The number of rows of the board.
+    square_size (int): The size of a cell in pixels.
+    offset (tuple): The position of the board on the screen.
+
+    Attributes:
+    key (tuple): The arguments the background was built with.
+    surface (pygame.Surface): The rendered background.
+    """
+
+    def __init__(self, size: tuple[int, int], width: int, height: int,
+                 square_size: int, offset: tuple[int, int]):
+        self.key = (size, width, height, square_size, offset)
+        self.surface = pygame.Surface(size)
+        if pygame.display.get_surface() is not None:
+            self.surface = self.surface.convert()
+
+        self.surface.fill(MARGIN_COLOR)
+
+        # une cellule par pixel, indexée [x][y] comme dans pygame.surfarray
+        parities = numpy.add.outer(numpy.arange(width), numpy.arange(height)) % 2
+        cells = pygame.surfarray.make_surface(numpy.array(HIDDEN_COLORS, dtype=numpy.uint8)[parities])
+        self.surface.blit(pygame.transform.scale(cells, (width * square_size, height * square_size)), offset)
+
+    def restore(self, screen: pygame.Surface, rect):
+        """
+        Draws the background back on a part of the screen.
+
+        Parameters:
+        screen (pygame.Surface): The screen surface.
+        rect (Rect or tuple): The part of the screen to clear.
+        """
+        screen.blit(self.surface, pygame.Rect(rect).topleft, rect)
+
+
+class ProbabilityOverlay:
+    """
+    Tints the hidden cells of the board by their probability of holding a
+    bomb, estimated by a ProbabilityEngine for the round. It is toggled with
+    F4.
+
+    The probabilities are rounded to TINT_LEVELS levels, and a cell is only
+    drawn again when its level changes: its background is restored, then the
+    tint of its level is blitted over it. On a board seen through the
+    viewport, only the cells in the play area are drawn.
+
+    Parameters:
+    game (Game): The game the overlay is drawn for.
+
+    Attributes:
+    game (Game): The game the overlay is drawn for.
+    visible (bool): Whether the overlay is shown.
+    engine (ProbabilityEngine): The estimates for the round, or None.
+    levels (numpy.ndarray): The level drawn on every cell, as a (height,
+    width) array, -1 for none.
+    tints (list): The tinted squares of every level, for the size of the
+    cells they were rendered for.
+    """
+
+    def __init__(self, game):
+        self.game = game
+        self.visible = False
+        self.engine = None
+        self.levels = None
+        self.tints = []
+
+    def toggle(self):
+        """
+        Shows or hides the overlay, restoring the cells it tinted.
+        """
+        self.visible = not self.visible
+
+        if not self.visible and self.levels is not None and not self.game.is_trading:
+            self.draw_levels(numpy.full(self.levels.shape, -1, dtype=numpy.int8))
+
+        self.engine = None
+        self.levels = None
+
+    def forget(self):
+        """
+        Marks every cell as not tinted, after the play area was drawn again.
+        """
+        if self.levels is not None:
+            self.levels[:] = -1
+
+    def draw(self, budget: float):
+        """
+        Refreshes the estimates for the given time, then tints the cells whose
+        level changed.
+
+        Parameters:
+        budget (float): The time given to the estimates, in seconds.
+        """
+        game = self.game
+        engine = game.grid.engine
+
+        if self.engine is None or self.engine.engine is not engine:
+            self.engine = ProbabilityEngine(engine)
+            self.levels = numpy.full((game.height, game.width), -1, dtype=numpy.int8)
+
+        self.engine.update(budget)
+
+        probabilities = engine.board.as_2d(self.engine.probabilities())
+        levels = numpy.minimum(numpy.nan_to_num(probabilities, nan=-1.0) * TINT_LEVELS, TINT_LEVELS - 1)
+        levels = numpy.where(numpy.isnan(probabilities) | (engine.board.as_2d(engine.board.states) != HIDDEN),
+                             -1, levels).astype(numpy.int8)
+
+        self.draw_levels(levels)
+
+    def draw_levels(self, levels: numpy.ndarray):
+        """
+        Draws the cells whose level differs from the one drawn.
+        """
+        game = self.game
+        square_size = game.square_size
+
+        if not self.tints or self.tints[0].get_width() != square_size:
+            self.tints = []
+            for level in range(TINT_LEVELS):
+                ratio = level / (TINT_LEVELS - 1)
+                tint = pygame.Surface((square_size, square_size), pygame.SRCALPHA)
+                tint.fill([round(safe + (bomb - safe) * ratio) for safe, bomb in zip(SAFE_TINT, BOMB_TINT)]
+                          + [TINT_ALPHA])
+                self.tints.append(tint)
+
+        if game.viewport is None:
+            window = (slice(None), slice(None))
+            left = top = 0
+
+        else:
+            columns, rows = game.viewport.visible_cells()
+            window = (slice(rows.start, rows.stop), slice(columns.start, columns.stop))
+            left, top = columns.start, rows.start
+
+        drawn = self.levels[window]
+        states = game.grid.board.as_2d(game.grid.board.states)[window]
+        blits = []
+
+        if game.viewport is not None:
+            game.screen.set_clip(game.viewport.rect)
+
+        for row, column in zip(*numpy.nonzero(levels[window] != drawn)):
+            level = int(levels[window][row, column])
+            rect = pygame.Rect((left + column) * square_size + game.x_offset,
+                               (top + row) * square_size + game.y_offset, square_size, square_size)
+
+            # une cellule révélée a déjà été redessinée par la grille
+            if states[row, column] == HIDDEN:
+                game.background.restore(game.screen, rect)
+                game.dirty.add(rect)
+
+            if level >= 0:
+                blits.append((self.tints[level], rect))
+
+        game.screen.blits(blits, doreturn=False)
+        game.screen.set_clip(None)
+        drawn[:] = levels[window]
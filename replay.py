@@ -0,0 +1,138 @@
+"""
+Projet démineur
+Auteurs :   Mathis Bulka
+            Samuel Cornier
+            Léo Simon
+            Sacha Trouvé
+
+    Module replay: rejoue sans affichage les journaux des manches
+
+    python replay.py replays/*.replay
+    python replay.py replays/4-0123456789abcdef.replay --repeat 20
+"""
+
+import argparse
+import sys
+import time
+
+from endless import EndlessEngine
+from engine import Engine, Inventory
+from inputlog import CLICK, DEBUG, END, FINISH, FIRST_CLICK, LAYOUT, USE, read_log
+
+OK, MISMATCH, UNCHECKED = "ok", "mismatch", "unchecked"
+
+
+def new_engine(header: dict) -> Engine:
+    """
+    Returns the engine of the round described by the header of a log, with the
+    inventory the player had at its start.
+    """
+    inventory = Inventory()
+    inventory.amounts.update(header["amounts"])
+    inventory.health.update(header["health"])
+    inventory.active_equipped = header["active_equipped"]
+    inventory.passive_equipped = header["passive_equipped"]
+    inventory.discovered_items = list(header["discovered_items"])
+
+    if header["endless"]:
+        return EndlessEngine(header["round"], inventory, seed=header["seed"])
+
+    return Engine(header["width"], header["height"], header["round"], inventory,
+                  header["topology"], seed=header["seed"])
+
+
+def replay(data: bytes) -> tuple[Engine, str, str]:
+    """
+    Plays a logged round again, at full speed.
+
+    Parameters:
+    data (bytes): The log of the round.
+
+    Returns:
+    tuple: The engine of the round once replayed, the result (OK, MISMATCH or
+    UNCHECKED when the log has no END record, the round having been
+    interrupted) and a message saying where the replay went wrong, or None.
+    """
+    header, records = read_log(data)
+    engine = new_engine(header)
+    inventory = engine.inventory
+    candidate = 0
+
+    for number, (kind, code, active, passive, x, y, extra) in enumerate(records):
+        # l'équipement noté doit être celui de la manche rejouée
+        if (inventory.active_equipped, inventory.passive_equipped) != (active, passive):
+            return engine, MISMATCH, f"record {number}: equipment {(inventory.active_equipped, inventory.passive_equipped)}, logged {(active, passive)}"
+
+        if kind == LAYOUT:
+            # le plateau retenu par la recherche sans hasard
+            candidate = extra
+
+        elif kind == FIRST_CLICK:
+            engine.create_grid((x, y), candidate)
+
+        elif kind == CLICK:
+            engine.click(code, (x, y))
+
+        elif kind == USE:
+            engine.use(code)
+
+        elif kind == DEBUG:
+            engine.debug()
+
+        elif kind == FINISH:
+            engine.finish_round(extra)
+
+        elif kind == END:
+            if engine.digest() != extra:
+                return engine, MISMATCH, f"record {number}: digest {engine.digest():08x}, logged {extra:08x}"
+
+            return engine, OK, None
+
+    return engine, UNCHECKED, None
+
+
+def main(arguments: list[str] = None) -> int:
+    """
+    Replays the logs given on the command line and prints, for each one, the
+    number of inputs, the time taken by a replay and its result.
+
+    Returns:
+    int: 1 when a replay does not match its log, 0 otherwise.
+    """
+    parser = argparse.ArgumentParser(description="Replays logged rounds headlessly and checks their final state.")
+    parser.add_argument("paths", nargs="+", help="the .replay files written by the game")
+    parser.add_argument("--repeat", type=int, default=1, help="the number of replays of each log, to time them")
+    arguments = parser.parse_args(arguments)
+
+    status = 0
+
+    for path in arguments.paths:
+        with open(path, "rb") as file:
+            data = file.read()
+
+        try:
+            records = read_log(data)[1]
+
+        except ValueError as error:
+            print(f"{path}: {error}")
+            status = 1
+            continue
+
+        start = time.perf_counter()
+        for _ in range(arguments.repeat):
+            engine, result, message = replay(data)
+
+        elapsed = (time.perf_counter() - start) / arguments.repeat
+
+        print(f"{path}: round {engine.round}, seed {engine.seed:016x}, "
+              f"{len(records)} records, {elapsed * 1000:.2f} ms, {result}"
+              + (f" ({message})" if message else ""))
+
+        if result == MISMATCH:
+            status = 1
+
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
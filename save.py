@@ -0,0 +1,331 @@
+"""
+Projet démineur
+Auteurs :   Mathis Bulka
+            Samuel Cornier
+            Léo Simon
+            Sacha Trouvé
+
+    Module save: sauvegarde binaire des parties, pour les reprendre
+"""
+
+import mmap
+import os
+import struct
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy
+
+from engine import Engine, Inventory
+from inputlog import INVENTORY, TOPOLOGIES, pack_inventory, unpack_inventory
+from topology import SQUARE, Topology
+
+FLAGGED, HIDDEN, NOT_HIDDEN = -1, 0, 1
+
+MAGIC = b"DMNS"
+VERSION = 1
+
+# magie, version, scène, manche, largeur, hauteur, forme, sans fin, plateau
+# présent, graine, durée de la manche en millisecondes, drapeaux à placer, cellules
+# découvertes, cellules sans bombe, brouilleurs à rendre, bombes absorbées,
+# premier clic à faire, manche perdue, début du plateau, taille du journal
+HEADER = struct.Struct("<4sBBHIIB??QIiiiii??QI")
+
+# le plateau commence sur une limite de 64 octets, pour être lu en place
+ALIGNMENT = 64
+
+# l'état d'une cellule sur 2 bits : cachée, découverte, découverte et ramassée,
+# marquée d'un drapeau
+HIDDEN_CODE, NOT_HIDDEN_CODE, COLLECTED_CODE, FLAGGED_CODE = range(4)
+STATES = numpy.array([HIDDEN, NOT_HIDDEN, NOT_HIDDEN, FLAGGED], dtype=numpy.int8)
+
+
+def pack_states(states: numpy.ndarray, collected: numpy.ndarray) -> numpy.ndarray:
+    """
+    Packs the states and the collected flags of a board, 2 bits per cell and 4
+    cells per byte.
+
+    Parameters
+    ----------
+    states : numpy.ndarray
+        The states of the cells.
+    collected : numpy.ndarray
+        Whether the item of each cell has been collected.
+
+    Returns
+    -------
+    packed : numpy.ndarray
+        The packed cells, as ceil(size / 4) bytes.
+    """
+    # -1 & 3 donne le code du drapeau ; une case ramassée est découverte
+    codes = numpy.zeros(-(-len(states) // 4) * 4, dtype=numpy.uint8)
+    numpy.bitwise_and(states.view(numpy.uint8), 3, out=codes[:len(states)])
+    codes[:len(states)] += collected
+
+    # les 4 octets d'un mot sont ramenés sur ses 8 premiers bits
+    words = codes.view("<u4")
+
+    return ((words | words >> 6 | words >> 12 | words >> 18) & 0xFF).astype(numpy.uint8)
+
+
+def unpack_states(packed: numpy.ndarray, size: int) -> tuple[numpy.ndarray, numpy.ndarray]:
+    """
+    Unpacks the cells packed by pack_states().
+
+    Parameters
+    ----------
+    packed : numpy.ndarray
+        The packed cells.
+    size : int
+        The number of cells of the board.
+
+    Returns
+    -------
+    states : numpy.ndarray
+        The states of the cells.
+    collected : numpy.ndarray
+        Whether the item of each cell has been collected.
+    """
+    # chaque code retrouve son octet d'un mot de 4 octets
+    words = packed.astype("<u4")
+    codes = ((words | words << 6 | words << 12 | words << 18) & 0x03030303).view(numpy.uint8)[:size]
+
+    return numpy.take(STATES, codes), codes == COLLECTED_CODE
+
+
+def encode(scene: int, round_number: int, inventory: Inventory, width: int, height: int,
+           topology: Topology = SQUARE, endless: bool = False, engine: Engine = None) -> list[bytes]:
+    """
+    Encodes a game into the parts of a save: the header, with the counters of
+    the round and the inventory, then the board if there is one. The board
+    holds the values of the cells, one signed byte each, then their states
+    packed by pack_states(), then the input log of the round, so that a
+    resumed round can still be replayed.
+
+    Everything is copied, so that the game can go on while the parts are
+    written.
+
+    Parameters
+    ----------
+    scene : int
+        The scene the game is resumed in.
+    round_number : int
+        The number of the round.
+    inventory : Inventory
+        The items of the player.
+    width, height : int
+        The size of the boards of the game.
+    topology : Topology, optional
+        The shape of the boards of the game. The default is SQUARE.
+    endless : bool, optional
+        Whether the boards of the game are endless. The default is False.
+    engine : Engine, optional
+        The round in progress, whose board is saved. The default is None, for a
+        save with no board; an endless board is never saved.
+
+    Returns
+    -------
+    parts : list[bytes]
+        The parts of the save, to write one after the other.
+    """
+    fields = [0, 0, 0, 0, 0, 0, 0, False, False]
+    board = []
+
+    if engine is not None and not endless:
+        # le journal sait depuis quand la manche est jouée
+        elapsed = round((time.perf_counter() - engine.log.start) * 1000)
+        fields = [engine.seed, elapsed, engine.flag_to_place, engine.not_hidden_cells,
+                  engine.safe_cells_number, engine.jammer_to_give_back, engine.bombs_absorbed,
+                  engine.is_first_click, engine.lost]
+        board = [engine.board.values.tobytes(),
+                 pack_states(engine.board.states, engine.board.collected).tobytes(),
+                 bytes(engine.log.data)]
+
+    inventory = pack_inventory(inventory)
+    start = -(-(HEADER.size + len(inventory)) // ALIGNMENT) * ALIGNMENT
+    header = HEADER.pack(MAGIC, VERSION, scene, round_number, width, height, TOPOLOGIES.index(topology),
+                         endless, bool(board), *fields, start, len(board[2]) if board else 0)
+
+    return [header, inventory, bytes(start - len(header) - len(inventory))] + board
+
+
+def write(path: str, parts: list[bytes]):
+    """
+    Writes the parts of a save to a file, atomically: they are written to a
+    temporary file of the same directory, which then replaces the file. A save
+    interrupted leaves the previous one whole.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    descriptor, temporary = tempfile.mkstemp(prefix=".save-", dir=directory)
+
+    try:
+        with os.fdopen(descriptor, "wb") as file:
+            file.writelines(parts)
+            file.flush()
+            os.fsync(file.fileno())
+
+        os.replace(temporary, path)
+
+    except BaseException:
+        os.remove(temporary)
+        raise
+
+
+class SaveGame:
+    """
+    A save read by read_save(). The file is mapped in memory rather than read:
+    the values of the cells are used in place, and only the pages of the board
+    that are touched are ever loaded.
+
+    Parameters
+    ----------
+    data : mmap.mmap
+        The file, mapped copy-on-write so that the board can be played on
+        without changing the file.
+
+    Attributes
+    ----------
+    scene : int
+        The scene the game is resumed in.
+    round : int
+        The number of the round.
+    width, height : int
+        The size of the boards of the game.
+    topology : Topology
+        The shape of the boards of the game.
+    endless : bool
+        Whether the boards of the game are endless.
+    has_board : bool
+        Whether a round in progress is saved.
+    seed : int
+        The seed of the round.
+    elapsed : int
+        The time the round had been played, in milliseconds.
+    inventory : dict
+        The items of the player, as read by unpack_inventory().
+    """
+
+    def __init__(self, data: mmap.mmap):
+        # un fichier coupé dans son en-tête n'est pas une sauvegarde
+        if len(data) < HEADER.size + INVENTORY.size:
+            raise ValueError("not a save: truncated header")
+
+        (magic, version, self.scene, self.round, self.width, self.height, topology, self.endless,
+         self.has_board, self.seed, self.elapsed, *self.counters, self.start, log_size) = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("not a save of this version")
+
+        self.inventory, offset = unpack_inventory(data, HEADER.size)
+        if offset > len(data) or topology >= len(TOPOLOGIES):
+            raise ValueError("not a save: truncated header")
+
+        size = self.width * self.height
+        if self.has_board and self.start + size + -(-size // 4) + log_size > len(data):
+            raise ValueError("not a save: truncated board")
+
+        self.topology = TOPOLOGIES[topology]
+        self.data = data
+        self.log_size = log_size
+
+    def restore_inventory(self, inventory: Inventory):
+        """
+        Gives the saved items and equipment to an inventory.
+        """
+        inventory.amounts.update(self.inventory["amounts"])
+        inventory.health.update(self.inventory["health"])
+        inventory.active_equipped = self.inventory["active_equipped"]
+        inventory.passive_equipped = self.inventory["passive_equipped"]
+        inventory.discovered_items = list(self.inventory["discovered_items"])
+
+    def engine(self, inventory: Inventory) -> Engine:
+        """
+        Returns the saved round, played on the given inventory, or None when no
+        board is saved. The loot is drawn again from the seed; the cells and
+        the counters are the saved ones.
+        """
+        if not self.has_board:
+            return None
+
+        engine = Engine(self.width, self.height, self.round, inventory, self.topology, seed=self.seed)
+        board = engine.board
+
+        # les valeurs sont lues en place dans le fichier
+        board.values = numpy.frombuffer(self.data, dtype=numpy.int8, count=board.size, offset=self.start)
+        packed = numpy.frombuffer(self.data, dtype=numpy.uint8, count=-(-board.size // 4),
+                                  offset=self.start + board.size)
+        board.states, board.collected = unpack_states(packed, board.size)
+
+        (engine.flag_to_place, engine.not_hidden_cells, engine.safe_cells_number,
+         engine.jammer_to_give_back, engine.bombs_absorbed, engine.is_first_click, engine.lost) = self.counters
+        engine.items_flagged = [board.cell(int(index)) for index in
+                                numpy.flatnonzero((board.states == FLAGGED) & (board.values < -1))]
+
+        # le journal reprend après les actions enregistrées
+        offset = self.start + board.size + len(packed)
+        engine.log.data = bytearray(self.data[offset:offset + self.log_size])
+        engine.log.start = time.perf_counter() - self.elapsed / 1000
+
+        return engine
+
+
+def read_save(path: str) -> SaveGame:
+    """
+    Returns the save written in a file. A ValueError is raised when the file
+    is not a save of this version, or is cut.
+    """
+    with open(path, "rb") as file:
+        # un fichier vide ne peut pas être mappé
+        if os.fstat(file.fileno()).st_size < HEADER.size:
+            raise ValueError("not a save: truncated header")
+
+        return SaveGame(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_COPY))
+
+
+class AutoSaver:
+    """
+    Writes the saves of a game on a thread of its own, so that the game does
+    not wait for the disk. The saves are written in the order they were made;
+    a save is encoded before it is handed to the thread, so it is the state of
+    the game when save() was called.
+
+    Parameters
+    ----------
+    path : str
+        The file of the saves.
+
+    Attributes
+    ----------
+    path : str
+        The file of the saves.
+    error : Exception
+        The first error raised by a write, or None.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.error = None
+
+    def save(self, parts: list[bytes]):
+        """
+        Queues parts made by encode() to be written.
+        """
+        self.executor.submit(write, self.path, parts).add_done_callback(self.record)
+
+    def record(self, future):
+        """
+        Keeps the error of a finished write, if it is the first one.
+        """
+        if self.error is None:
+            self.error = future.exception()
+
+    def close(self) -> Exception:
+        """
+        Waits for the saves queued, then stops the thread. The first error
+        raised by a write is returned rather than raised, so that the game can
+        still be quit; None when every save was written.
+        """
+        self.executor.shutdown(wait=True)
+
+        return self.error
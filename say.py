@@ -1,5 +1,7 @@
 import pygame
 
+from assets import SMOOTH
+
 class Speech_bubble:
     """
     Manages the creation and display of text bubbles.
@@ -10,8 +12,8 @@ class Speech_bubble:
         """
         self.game = game
         self.speech = speech
-        self.bubble_image = pygame.image.load("sprites/bubble.png").convert_alpha()
-        self.spike_image = pygame.image.load("sprites/spike.png").convert_alpha()
+        self.bubble_image = self.game.assets.image("sprites/bubble.png")
+        self.spike_image = self.game.assets.image("sprites/spike.png")
 
     def display(self):
         """
@@ -55,11 +57,10 @@ class Speech_bubble:
                 longer_element = speech_list[index]
 
         font_size = round(self.game.square_size * 30 / 100)
-        font = pygame.font.SysFont("Arial", font_size)
-        text_image = font.render(longer_element, True, (0, 0, 0))
+        text_image = self.game.assets.text(longer_element, font_size, (0, 0, 0))
         width = text_image.get_width() * 1.2
         height = text_image.get_height() * 1.1 * len(speech_list)
-        self.bubble_image = pygame.transform.smoothscale(self.bubble_image, (width, height))
+        self.bubble_image = self.game.assets.image("sprites/bubble.png", (width, height), SMOOTH)
 
         #if is_speech_short == True:
             #self.spike_image = pygame.transform.smoothscale(self.spike_image, (self.spike_image.get_width() * 95 / 100, self.spike_image.get_height() * 95 / 100))
@@ -79,7 +80,7 @@ class Speech_bubble:
                 self.game.screen.blit(self.spike_image, spike_position)
 
                 for t in range(len(speech_list)):
-                    text_image = font.render(speech_list[t], True, (0, 0, 0))
+                    text_image = self.game.assets.text(speech_list[t], font_size, (0, 0, 0))
                     text_position = (self.game.screen_width * 42 / 100 - self.bubble_image.get_width() * 95 / 100, self.game.screen_height * 38 / 100 - self.bubble_image.get_height() + t*text_image.get_height() + self.bubble_image.get_height() * 5 / 100)
                     self.game.screen.blit(text_image, text_position)
 
@@ -90,7 +91,7 @@ class Speech_bubble:
                 self.game.screen.blit(self.spike_image, spike_position)
 
                 for t in range(len(speech_list)):
-                    text_image = font.render(speech_list[t], True, (0, 0, 0))
+                    text_image = self.game.assets.text(speech_list[t], font_size, (0, 0, 0))
                     text_position = (self.game.player.x - self.bubble_image.get_width() * 90 / 100 + self.bubble_image.get_width() * 5 / 100, self.game.player.y - self.bubble_image.get_height() + self.game.gui_width * 1/2 + t*text_image.get_height() + self.bubble_image.get_height() * 5 / 100)
                     self.game.screen.blit(text_image, text_position)
 
@@ -0,0 +1,587 @@
+"""
+Projet démineur
+Auteurs :   Mathis Bulka
+            Samuel Cornier
+            Léo Simon
+            Sacha Trouvé
+
+    Module solver: déduction des cellules sûres et des objets d'un plateau
+"""
+
+import time
+
+import numpy
+
+from board import Board
+
+JAMMER = -9
+
+FLAGGED, HIDDEN, NOT_HIDDEN = -1, 0, 1
+
+# au-delà, une composante de la frontière n'est pas énumérée
+ENUMERATION_LIMIT = 48
+MEMO_SIZE = 1 << 16
+
+
+class Solver:
+    """
+    Finds the hidden cells of a board that surely hold an object (a bomb or an
+    item) and the ones that surely hold none, from the revealed numbers only.
+
+    A number counts the bombs and the items around its cell, so the solver
+    cannot tell a bomb from an item: both are objects, as they are flag
+    targets in Engine.flag_to_place. A revealed item or bomb is a known object.
+    A jammer placed by the player on a revealed cell hides what was there: the
+    numbers around it still count the bomb it may have covered, so it is an
+    unknown cell of the constraints, but it is never reported, and it is left
+    out of the total of objects.
+
+    Every revealed number with hidden cells around it gives a constraint: its
+    hidden neighbours, as a bitset, hold its number minus the known objects
+    around it. The constraints are split into independent components of the
+    frontier, then, for each component:
+
+    * the single-cell rules settle the constraints with no object left or
+      with as many objects as cells,
+    * the pairwise rules derive new constraints from overlapping ones (the
+      difference of a subset, and the 1-2 rule),
+    * what is left is enumerated exactly, the independent parts being solved
+      apart. Every subproblem solved is kept in a memo table, which is shared
+      by the following steps: the same local patterns keep coming back from
+      one step to the next.
+
+    The board is only read, never written.
+
+    Parameters
+    ----------
+    board : Board
+        The board to solve, of any topology. The endless board is not
+        supported.
+    trust_flags : bool, optional
+        Whether the flagged cells are known objects. The flags of the player
+        can be wrong, so they are hidden cells by default.
+
+    Attributes
+    ----------
+    board : Board
+        The board to solve.
+    trust_flags : bool
+        Whether the flagged cells are known objects.
+    memo : dict[frozenset, tuple]
+        The subproblems solved so far: a frozenset of (bitset, objects)
+        constraints, and the objects found in all its solutions, in at least
+        one, and their minimum and maximum number, or None when there is no
+        solution.
+    """
+
+    def __init__(self, board: Board, trust_flags: bool = False):
+        self.board = board
+        self.trust_flags = trust_flags
+        self.memo = {}
+
+    def known(self) -> tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray]:
+        """
+        Returns the flat boolean masks of the unknown cells, of the known
+        objects and of the jammers, which are unknown cells as well.
+        """
+        values, states = self.board.values, self.board.states
+        revealed = states == NOT_HIDDEN
+        jammers = revealed & (values == JAMMER)
+        objects = revealed & (values < 0) & ~jammers
+
+        if self.trust_flags:
+            flagged = states == FLAGGED
+            objects |= flagged
+            revealed = revealed | flagged
+
+        return ~revealed | jammers, objects, jammers
+
+    def constraints(self, unknown: numpy.ndarray, objects: numpy.ndarray) -> list[tuple[numpy.ndarray, int]]:
+        """
+        Returns the constraint of every revealed number with unknown cells
+        around it: the flat indices of these cells, and the number of objects
+        they hold.
+        """
+        cells, rows, targets = self.flat_constraints(unknown, objects)
+        ends = numpy.searchsorted(rows, numpy.arange(1, len(targets) + 1))
+
+        return [(cells[start:end], count) for start, end, count
+                in zip([0, *ends[:-1].tolist()], ends.tolist(), targets.tolist())]
+
+    def flat_constraints(self, unknown: numpy.ndarray,
+                         objects: numpy.ndarray) -> tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray]:
+        """
+        Returns the constraints of constraints() as flat arrays, without a
+        Python loop.
+
+        Parameters
+        ----------
+        unknown : numpy.ndarray
+            The flat boolean mask of the unknown cells.
+        objects : numpy.ndarray
+            The flat boolean mask of the known objects.
+
+        Returns
+        -------
+        cells : numpy.ndarray
+            The unknown cells of all the constraints, one constraint after the
+            other.
+        rows : numpy.ndarray
+            The constraint of each of these cells, in increasing order.
+        targets : numpy.ndarray
+            The number of objects of every constraint.
+        """
+        values, states = self.board.values, self.board.states
+        table = self.board.table
+
+        numbers = numpy.flatnonzero((states == NOT_HIDDEN) & (values >= 0))
+        lengths = table.degrees(numbers)
+        numbers, lengths = numbers[lengths > 0], lengths[lengths > 0]
+        if not len(numbers):
+            empty = numpy.zeros(0, dtype=numpy.int64)
+            return empty, empty, empty
+
+        # les nombres sans cellule inconnue autour sont écartés d'un coup
+        neighbours = table.gather(numbers).astype(numpy.int64, copy=False)
+        owners = numpy.repeat(numpy.arange(len(numbers)), lengths)
+        hidden = unknown[neighbours]
+        hidden_count = numpy.bincount(owners[hidden], minlength=len(numbers))
+        object_count = numpy.bincount(owners[objects[neighbours]], minlength=len(numbers))
+
+        kept = hidden_count > 0
+        renumbered = numpy.cumsum(kept) - 1
+        targets = values[numbers].astype(numpy.int64) - object_count
+
+        return neighbours[hidden], renumbered[owners[hidden]], targets[kept]
+
+    def solve(self, total: int = None) -> tuple[set[tuple[int, int]], set[tuple[int, int]]]:
+        """
+        Deduces what can be from the revealed cells.
+
+        Parameters
+        ----------
+        total : int, optional
+            The number of objects on the whole board, when it is known: the
+            cells away from the frontier can then be settled as well, when the
+            frontier needs all the objects left or leaves exactly enough for
+            them. The default is None.
+
+        Returns
+        -------
+        safe : set[tuple[int, int]]
+            The unknown cells that surely hold no object.
+        objects : set[tuple[int, int]]
+            The unknown cells that surely hold an object.
+        """
+        unknown, known_objects, jammers = self.known()
+        constraints = self.constraints(unknown, known_objects)
+
+        safe, objects = [], []
+        minimum = maximum = 0
+        frontier = set()
+        jammed = set(numpy.flatnonzero(jammers).tolist())
+
+        for cells, constraint_list in components(constraints):
+            frontier.update(cells)
+            bits = {cell: 1 << bit for bit, cell in enumerate(cells)}
+            local = {}
+            for members, count in constraint_list:
+                mask = 0
+                for cell in members:
+                    mask |= bits[cell]
+
+                local[mask] = count
+
+            found_objects, found_safe, low, high = self.solve_component(local, len(cells))
+
+            # les objets sous les brouilleurs ne comptent pas dans le total
+            minimum += max(low - len(jammed.intersection(cells)), 0)
+            maximum += high
+
+            for bit, cell in enumerate(cells):
+                if cell in jammed:
+                    continue
+
+                if found_objects >> bit & 1:
+                    objects.append(cell)
+
+                elif found_safe >> bit & 1:
+                    safe.append(cell)
+
+        if total is not None:
+            left = total - int(numpy.count_nonzero(known_objects))
+            interior = numpy.flatnonzero(unknown & ~jammers)
+            if frontier:
+                interior = interior[~numpy.isin(interior, numpy.fromiter(frontier, dtype=numpy.int64))]
+
+            # la frontière prend tous les objets restants, ou en laisse juste
+            # assez pour remplir le reste
+            if minimum == left:
+                safe += interior.tolist()
+
+            elif maximum + len(interior) == left:
+                objects += interior.tolist()
+
+        cell = self.board.cell
+
+        return {cell(index) for index in safe}, {cell(index) for index in objects}
+
+    def solve_component(self, constraints: dict[int, int], size: int) -> tuple[int, int, int, int]:
+        """
+        Solves one component of the frontier, in its local bits.
+
+        Parameters
+        ----------
+        constraints : dict[int, int]
+            The number of objects held by every bitset of cells.
+        size : int
+            The number of cells of the component.
+
+        Returns
+        -------
+        objects : int
+            The bitset of the cells that surely hold an object.
+        safe : int
+            The bitset of the cells that surely hold none.
+        minimum, maximum : int
+            The bounds of the number of objects in the component.
+        """
+        everything = (1 << size) - 1
+        objects, safe, constraints = propagate(constraints)
+
+        if constraints is None:
+            # un plateau incohérent (des drapeaux crus à tort) : rien n'est sûr
+            return 0, 0, 0, size
+
+        left = 0
+        for mask in constraints:
+            left |= mask
+
+        if not left:
+            count = objects.bit_count()
+            return objects, everything & ~objects, count, count
+
+        if left.bit_count() > ENUMERATION_LIMIT:
+            # trop grand pour être énuméré : seules les règles comptent
+            known = objects.bit_count()
+            return objects, safe, known, known + left.bit_count()
+
+        result = self.enumerate(frozenset(constraints.items()))
+        if result is None:
+            return 0, 0, 0, size
+
+        always, sometimes, low, high = result
+        objects |= always
+        safe |= left & ~sometimes
+        known = objects.bit_count() - always.bit_count()
+
+        return objects, safe, known + low, known + high
+
+    def enumerate(self, constraints: frozenset) -> tuple[int, int, int, int]:
+        """
+        Enumerates the solutions of a set of constraints, through a memo table.
+
+        Parameters
+        ----------
+        constraints : frozenset[tuple[int, int]]
+            The (bitset, objects) constraints, with no trivial one.
+
+        Returns
+        -------
+        result : tuple[int, int, int, int] or None
+            The bitset of the cells holding an object in every solution, the one
+            of the cells holding an object in at least one, and the minimum and
+            maximum number of objects, or None when there is no solution.
+        """
+        if constraints in self.memo:
+            return self.memo[constraints]
+
+        parts = split(constraints)
+        if len(parts) > 1:
+            # les parties indépendantes sont résolues à part
+            result = (0, 0, 0, 0)
+            for part in parts:
+                found = self.enumerate(part)
+                if found is None:
+                    result = None
+                    break
+
+                result = (result[0] | found[0], result[1] | found[1],
+                          result[2] + found[2], result[3] + found[3])
+
+        else:
+            # on fixe une cellule de la plus petite contrainte
+            smallest = min(constraints, key=lambda constraint: constraint[0].bit_count())[0]
+            bit = smallest & -smallest
+            result = None
+
+            for value in [1, 0]:
+                reduced = {}
+                for mask, count in constraints:
+                    if mask & bit:
+                        mask, count = mask & ~bit, count - value
+
+                    if reduced.get(mask, count) != count:
+                        reduced = None
+                        break
+
+                    reduced[mask] = count
+
+                if reduced is None:
+                    continue
+
+                objects, safe, rest = propagate(reduced)
+                if rest is None:
+                    continue
+
+                objects |= bit * value
+                found = self.enumerate(frozenset(rest.items())) if rest else (0, 0, 0, 0)
+                if found is None:
+                    continue
+
+                count = objects.bit_count()
+                found = (found[0] | objects, found[1] | objects, found[2] + count, found[3] + count)
+                if result is None:
+                    result = found
+
+                else:
+                    result = (result[0] & found[0], result[1] | found[1],
+                              min(result[2], found[2]), max(result[3], found[3]))
+
+        if len(self.memo) >= MEMO_SIZE:
+            self.memo.clear()
+
+        self.memo[constraints] = result
+
+        return result
+
+
+def propagate(constraints: dict[int, int]) -> tuple[int, int, dict[int, int]]:
+    """
+    Applies the single-cell and pairwise rules until nothing changes.
+
+    Parameters
+    ----------
+    constraints : dict[int, int]
+        The number of objects held by every bitset of cells.
+
+    Returns
+    -------
+    objects : int
+        The bitset of the cells found to hold an object.
+    safe : int
+        The bitset of the cells found to hold none.
+    constraints : dict[int, int] or None
+        The constraints left, on the cells not found, or None when they
+        contradict each other.
+    """
+    objects = safe = 0
+
+    while True:
+        # les règles à une contrainte
+        settled = False
+        reduced = {}
+        for mask, count in constraints.items():
+            count -= (mask & objects).bit_count()
+            mask &= ~(objects | safe)
+            size = mask.bit_count()
+
+            if count < 0 or count > size or reduced.get(mask, count) != count:
+                return objects, safe, None
+
+            if not mask:
+                continue
+
+            if count == 0:
+                safe |= mask
+                settled = True
+
+            elif count == size:
+                objects |= mask
+                settled = True
+
+            else:
+                reduced[mask] = count
+
+        constraints = reduced
+        if settled:
+            continue
+
+        # les règles à deux contraintes, entre contraintes qui se recouvrent
+        by_bit = {}
+        for mask in constraints:
+            rest = mask
+            while rest:
+                bit = rest & -rest
+                by_bit.setdefault(bit, []).append(mask)
+                rest ^= bit
+
+        derived = {}
+        for first, first_count in constraints.items():
+            others = set()
+            rest = first
+            while rest:
+                bit = rest & -rest
+                others.update(by_bit[bit])
+                rest ^= bit
+
+            for second in others:
+                if second == first:
+                    continue
+
+                second_count = constraints[second]
+                only_second = second & ~first
+
+                if not first & ~second:
+                    # la première est incluse dans la seconde
+                    if only_second not in constraints:
+                        derived[only_second] = second_count - first_count
+
+                elif second_count - first_count == only_second.bit_count():
+                    # règle 1-2 : la différence contient tous les objets de plus
+                    objects |= only_second
+                    safe |= first & ~second
+                    settled = True
+
+        if settled:
+            constraints = {**constraints, **derived}
+            continue
+
+        if not derived:
+            return objects, safe, constraints
+
+        constraints = {**constraints, **derived}
+
+
+def split(constraints: frozenset) -> list[frozenset]:
+    """
+    Splits a set of (bitset, objects) constraints into the groups that share no
+    cell.
+    """
+    groups = []
+    for constraint in constraints:
+        mask = constraint[0]
+        merged = [constraint]
+        kept = []
+
+        for group_mask, group in groups:
+            if group_mask & mask:
+                mask |= group_mask
+                merged += group
+
+            else:
+                kept.append((group_mask, group))
+
+        groups = kept + [(mask, merged)]
+
+    return [frozenset(group) for _, group in groups]
+
+
+def components(constraints: list[tuple[numpy.ndarray, int]]) -> list[tuple[list[int], list[tuple[list[int], int]]]]:
+    """
+    Groups the constraints of a board into the components of its frontier: two
+    constraints are in the same component when they share a cell, directly or
+    through other constraints.
+
+    Returns
+    -------
+    components : list
+        The sorted flat indices of the cells of every component, with its
+        constraints as (cells, objects) pairs.
+    """
+    parent = {}
+
+    def find(cell):
+        root = cell
+        while parent[root] != root:
+            root = parent[root]
+
+        while parent[cell] != root:
+            parent[cell], cell = root, parent[cell]
+
+        return root
+
+    lists = []
+    for cells, count in constraints:
+        cells = cells.tolist()
+        lists.append((cells, count))
+
+        for cell in cells:
+            parent.setdefault(cell, cell)
+
+        root = find(cells[0])
+        for cell in cells[1:]:
+            other = find(cell)
+            if other != root:
+                parent[other] = root
+
+    grouped = {}
+    for cells, count in lists:
+        grouped.setdefault(find(cells[0]), []).append((cells, count))
+
+    cells_of = {}
+    for cell in parent:
+        cells_of.setdefault(find(cell), []).append(cell)
+
+    return [(sorted(cells_of[root]), group) for root, group in grouped.items()]
+
+
+def is_solvable(board: Board, cell: tuple[int, int], total: int = None,
+                deadline: float = None) -> bool:
+    """
+    Returns whether a generated board can be cleared from its first click
+    without guessing: the solver reveals the safe cells and flags the objects
+    it finds, until every cell without an object is revealed or nothing more
+    can be deduced. Telling a bomb from an item among the objects is left out.
+
+    The states of the board are restored afterwards.
+
+    Parameters
+    ----------
+    board : Board
+        The board, once its bombs and items are placed.
+    cell : tuple[int, int]
+        The first cell clicked, whose safe zone is empty.
+    total : int, optional
+        The number of objects on the board, given to the solver. The default is
+        the number of objects of the board, which the player knows from the
+        flags to place.
+    deadline : float, optional
+        The time.time() after which the board is given up as not solvable. The
+        default is None, for no limit.
+
+    Returns
+    -------
+    solvable : bool
+        Whether the board needs no guess.
+    """
+    saved = board.states.copy()
+    if total is None:
+        total = int(numpy.count_nonzero(board.values < 0))
+
+    solver = Solver(board, trust_flags=True)
+
+    try:
+        board.reveal(board.index(cell))
+        goal = int(numpy.count_nonzero(board.values >= 0))
+
+        while True:
+            if int(numpy.count_nonzero((board.states == NOT_HIDDEN) & (board.values >= 0))) == goal:
+                return True
+
+            if deadline is not None and time.time() > deadline:
+                return False
+
+            safe, objects = solver.solve(total)
+            if not safe:
+                return False
+
+            for index in map(board.index, objects):
+                board.states[index] = FLAGGED
+
+            for index in map(board.index, safe):
+                if board.states[index] == HIDDEN:
+                    board.reveal(index)
+
+    finally:
+        board.states[:] = saved
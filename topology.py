@@ -0,0 +1,388 @@
+"""
+Projet démineur
+Auteurs :   Mathis Bulka
+            Samuel Cornier
+            Léo Simon
+            Sacha Trouvé
+
+    Module topology: voisinage des cellules selon la forme du plateau
+"""
+
+import functools
+from abc import ABC, abstractmethod
+
+import numpy
+
+
+class NeighbourTable:
+    """
+    The neighbours of every cell of a board, computed once and stored in the
+    CSR format: the neighbours of the cell of flat index ``i`` are
+    ``indices[offsets[i]:offsets[i + 1]]``.
+
+    Parameters
+    ----------
+    width : int
+        The width of the board.
+    height : int
+        The height of the board.
+    candidates : numpy.ndarray
+        A (width * height, k) array giving up to k neighbours for every cell,
+        -1 standing for no neighbour.
+    distinct : bool, optional
+        Whether the candidates of a cell are known to be distinct from each
+        other and from the cell itself. The default is True.
+
+    Attributes
+    ----------
+    width : int
+        The width of the board.
+    height : int
+        The height of the board.
+    offsets : numpy.ndarray
+        The start of the neighbours of each cell in indices (int32, size + 1).
+    indices : numpy.ndarray
+        The neighbours of every cell, one cell after the other (int32).
+    """
+
+    def __init__(self, width: int, height: int, candidates: numpy.ndarray,
+                 distinct: bool = True):
+        self.width = width
+        self.height = height
+        size = width * height
+        valid = candidates >= 0
+
+        if not distinct:
+            # on retire les doublons et les cellules voisines d'elles-mêmes,
+            # ce qui arrive sur les petits plateaux toriques
+            candidates = numpy.sort(candidates, axis=1)
+            valid = candidates >= 0
+            valid[:, 1:] &= candidates[:, 1:] != candidates[:, :-1]
+            valid &= candidates != numpy.arange(size)[:, None]
+
+        self.offsets = numpy.zeros(size + 1, dtype=numpy.int32)
+        numpy.cumsum(valid.sum(axis=1), out=self.offsets[1:])
+        self.indices = candidates[valid].astype(numpy.int32)
+
+        self.offsets.flags.writeable = False
+        self.indices.flags.writeable = False
+
+    def around(self, index: int) -> numpy.ndarray:
+        """
+        Returns the neighbours of the given cell, as a read-only view of the
+        table (nothing is copied).
+        """
+        return self.indices[self.offsets[index]:self.offsets[index + 1]]
+
+    def degrees(self, indices: numpy.ndarray) -> numpy.ndarray:
+        """
+        Returns the number of neighbours of every given cell.
+        """
+        indices = numpy.asarray(indices, dtype=numpy.int64)
+
+        return self.offsets[indices + 1] - self.offsets[indices]
+
+    def gather(self, indices: numpy.ndarray) -> numpy.ndarray:
+        """
+        Returns the neighbours of every given cell, one cell after the other
+        (a cell surrounding several of them appears several times).
+        """
+        indices = numpy.asarray(indices, dtype=numpy.int64)
+        starts = self.offsets[indices].astype(numpy.int64)
+        lengths = self.offsets[indices + 1] - starts
+        ends = numpy.cumsum(lengths)
+        positions = numpy.arange(ends[-1] if len(ends) else 0) + numpy.repeat(starts - ends + lengths, lengths)
+
+        return self.indices[positions]
+
+    def around_all(self, indices: numpy.ndarray) -> numpy.ndarray:
+        """
+        Returns the sorted flat indices of every cell surrounding at least one of
+        the given cells.
+        """
+        return numpy.unique(self.gather(indices))
+
+
+class GridTable:
+    """
+    The neighbours of the cells of a square board, computed from the indices
+    themselves, like the ones of an endless board: nothing is stored per cell,
+    so that a large board costs no memory. The methods are the ones of
+    NeighbourTable.
+
+    The cells are sorted into at most 16 classes, by whether they are on the
+    first or last column and on the first or last row. The cells of a class
+    have their neighbours at the same distances from their index, which are
+    computed once, on a representative cell of the class.
+
+    Parameters
+    ----------
+    topology : Square
+        The shape of the board, whose candidates give the distances.
+    width : int
+        The width of the board.
+    height : int
+        The height of the board.
+
+    Attributes
+    ----------
+    width : int
+        The width of the board.
+    height : int
+        The height of the board.
+    deltas : numpy.ndarray
+        The distances from a cell to its neighbours, for every class (16, 8),
+        padded with 0.
+    valid : numpy.ndarray
+        Which distances of deltas are neighbours (16, 8).
+    counts : numpy.ndarray
+        The number of neighbours of every class (16).
+    column_classes, row_classes : numpy.ndarray
+        The class of every column, and of every row times 4, so that the class
+        of a cell is the sum of the two.
+    """
+
+    def __init__(self, topology: "Square", width: int, height: int):
+        self.width = width
+        self.height = height
+        self.deltas = numpy.zeros((16, 8), dtype=numpy.int64)
+        self.valid = numpy.zeros((16, 8), dtype=numpy.bool_)
+
+        # la cellule représentative de chaque classe : au bord, ou à
+        # l'intérieur quand il y en a un
+        columns = {1: 0, 2: width - 1, 3: 0}
+        rows = {1: 0, 2: height - 1, 3: 0}
+        if width >= 3:
+            columns[0] = 1
+
+        if height >= 3:
+            rows[0] = 1
+
+        representatives = [(column_class + 4 * row_class, rows[row_class] * width + columns[column_class])
+                           for column_class in columns for row_class in rows
+                           if self.edge_class(columns[column_class], width) == column_class
+                           and self.edge_class(rows[row_class], height) == row_class]
+        candidates = topology.candidates_of(numpy.array([index for _, index in representatives]), width, height)
+
+        for (cell_class, index), neighbours in zip(representatives, candidates):
+            self.valid[cell_class] = neighbours >= 0
+            self.deltas[cell_class] = numpy.where(neighbours >= 0, neighbours - index, 0)
+
+        self.counts = self.valid.sum(axis=1)
+        self.class_deltas = [self.deltas[cell_class][self.valid[cell_class]] for cell_class in range(16)]
+
+        # la classe de chaque colonne et de chaque ligne, lue plutôt que
+        # recalculée
+        self.column_classes = self.edge_class(numpy.arange(width), width).astype(numpy.intp)
+        self.row_classes = 4 * self.edge_class(numpy.arange(height), height).astype(numpy.intp)
+        self.column_list = self.column_classes.tolist()
+        self.row_list = self.row_classes.tolist()
+
+    @staticmethod
+    def edge_class(position, length: int):
+        """
+        Returns the class of a column (or a row) given its position: 1 for the
+        first one, 2 for the last one, 3 for both, 0 inside.
+        """
+        return (position == 0) + 2 * (position == length - 1)
+
+    def classes(self, indices: numpy.ndarray) -> numpy.ndarray:
+        """
+        Returns the class of every given cell.
+        """
+        rows, columns = numpy.divmod(indices, self.width)
+
+        return self.column_classes[columns] + self.row_classes[rows]
+
+    def around(self, index: int) -> numpy.ndarray:
+        """
+        Returns the neighbours of the given cell.
+        """
+        row, column = divmod(int(index), self.width)
+
+        return index + self.class_deltas[self.column_list[column] + self.row_list[row]]
+
+    def degrees(self, indices: numpy.ndarray) -> numpy.ndarray:
+        """
+        Returns the number of neighbours of every given cell.
+        """
+        return self.counts[self.classes(numpy.asarray(indices, dtype=numpy.int64))]
+
+    def gather(self, indices: numpy.ndarray) -> numpy.ndarray:
+        """
+        Returns the neighbours of every given cell, one cell after the other
+        (a cell surrounding several of them appears several times).
+        """
+        indices = numpy.asarray(indices, dtype=numpy.int64)
+        classes = self.classes(indices)
+
+        return (indices[:, None] + self.deltas[classes])[self.valid[classes]]
+
+    def around_all(self, indices: numpy.ndarray) -> numpy.ndarray:
+        """
+        Returns the sorted flat indices of every cell surrounding at least one of
+        the given cells.
+        """
+        return numpy.unique(self.gather(indices))
+
+
+class Topology(ABC):
+    """
+    The shape of a board: which cells surround which.
+
+    A new board shape only has to give the neighbours of every cell in
+    neighbour_candidates; the game logic works on the resulting NeighbourTable.
+    The square boards override table() to compute the neighbours instead.
+    """
+
+    @abstractmethod
+    def neighbour_candidates(self, width: int, height: int) -> numpy.ndarray:
+        """
+        Returns a (width * height, k) array giving the flat indices of up to k
+        neighbours for every cell, -1 standing for no neighbour.
+        """
+
+    def distinct(self, width: int, height: int) -> bool:
+        """
+        Returns whether the neighbour candidates of a cell are distinct from
+        each other and from the cell itself.
+        """
+        # par défaut, la taille du plateau n'y change rien
+        del width, height
+
+        return True
+
+    def table(self, width: int, height: int) -> NeighbourTable:
+        """
+        Returns the neighbour table of a board of the given size. Tables are
+        shared between boards of the same size, from one round to the next.
+        """
+        return neighbour_table(self, width, height)
+
+    def count_around(self, mask: numpy.ndarray, width: int, height: int) -> numpy.ndarray:
+        """
+        Returns, for every cell, the number of its neighbours set in the given
+        flat boolean mask.
+        """
+        table = self.table(width, height)
+        counts = numpy.bincount(table.gather(numpy.flatnonzero(mask)),
+                                minlength=width * height)
+
+        return counts.astype(numpy.int8)
+
+
+class Square(Topology):
+    """
+    The classic board: eight neighbours, fewer on the edges.
+    """
+
+    wrap = False
+
+    def neighbour_candidates(self, width, height):
+        return self.candidates_of(numpy.arange(width * height, dtype=numpy.int64), width, height)
+
+    def candidates_of(self, indices: numpy.ndarray, width: int, height: int) -> numpy.ndarray:
+        """
+        Returns the neighbour candidates of the given cells only, as
+        neighbour_candidates does for all of them.
+        """
+        ys, xs = numpy.divmod(indices, width)
+        candidates = []
+
+        for delta_row in [-1, 0, 1]:
+            for delta_column in [-1, 0, 1]:
+                if (delta_row, delta_column) != (0, 0):
+                    rows, columns = ys + delta_row, xs + delta_column
+
+                    if self.wrap:
+                        candidates.append(rows % height * width + columns % width)
+
+                    else:
+                        inside = (rows >= 0) & (rows < height) & (columns >= 0) & (columns < width)
+                        candidates.append(numpy.where(inside, rows * width + columns, -1))
+
+        return numpy.stack(candidates, axis=1)
+
+    def table(self, width, height):
+        # les voisins d'un plateau carré se calculent : seuls les petits
+        # plateaux toriques, où ils se répètent, gardent une table
+        if not self.distinct(width, height):
+            return super().table(width, height)
+
+        return grid_table(self, width, height)
+
+    def count_around(self, mask, width, height):
+        # une somme de tableaux décalés (une convolution 3x3) est bien plus
+        # rapide que de passer par la table
+        if self.wrap and (width < 3 or height < 3):
+            return super().count_around(mask, width, height)
+
+        mask = mask.reshape(height, width).astype(numpy.int8)
+        padded = numpy.pad(mask, 1, mode="wrap" if self.wrap else "constant")
+        counts = numpy.zeros((height, width), dtype=numpy.int8)
+
+        for delta_row in [-1, 0, 1]:
+            for delta_column in [-1, 0, 1]:
+                if (delta_row, delta_column) != (0, 0):
+                    counts += padded[1 + delta_row:1 + delta_row + height,
+                                     1 + delta_column:1 + delta_column + width]
+
+        return counts.ravel()
+
+
+class Toroidal(Square):
+    """
+    A board whose edges wrap around: the left column touches the right one,
+    and the top row touches the bottom one.
+    """
+
+    wrap = True
+
+    def distinct(self, width, height):
+        return width >= 3 and height >= 3
+
+
+class Hexagonal(Topology):
+    """
+    A board of hexagons with six neighbours, stored in offset coordinates: odd
+    rows are shifted by half a cell to the right.
+    """
+
+    EVEN_ROW_DELTAS = [(-1, 0), (1, 0), (-1, -1), (0, -1), (-1, 1), (0, 1)]
+    ODD_ROW_DELTAS = [(-1, 0), (1, 0), (0, -1), (1, -1), (0, 1), (1, 1)]
+
+    def neighbour_candidates(self, width, height):
+        ys, xs = numpy.divmod(numpy.arange(width * height, dtype=numpy.int32), width)
+        odd = ys % 2 == 1
+        candidates = []
+
+        for even_delta, odd_delta in zip(self.EVEN_ROW_DELTAS, self.ODD_ROW_DELTAS):
+            columns = xs + numpy.where(odd, odd_delta[0], even_delta[0])
+            rows = ys + numpy.where(odd, odd_delta[1], even_delta[1])
+            inside = (rows >= 0) & (rows < height) & (columns >= 0) & (columns < width)
+            candidates.append(numpy.where(inside, rows * width + columns, -1))
+
+        return numpy.stack(candidates, axis=1)
+
+
+@functools.lru_cache(maxsize=4)
+def neighbour_table(topology: Topology, width: int, height: int) -> NeighbourTable:
+    """
+    Builds the neighbour table of a board, cached by (topology, width, height).
+    """
+    return NeighbourTable(width, height, topology.neighbour_candidates(width, height),
+                          topology.distinct(width, height))
+
+
+@functools.lru_cache(maxsize=4)
+def grid_table(topology: Square, width: int, height: int) -> GridTable:
+    """
+    Builds the neighbour table of a square board, cached by (topology, width,
+    height).
+    """
+    return GridTable(topology, width, height)
+
+
+SQUARE = Square()
+TOROIDAL = Toroidal()
+HEXAGONAL = Hexagonal()
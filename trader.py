@@ -10,12 +10,17 @@ Auteurs :   Mathis Bulka
 
 import pygame
 
+from assets import FLIP_X
+from engine import PRICES
+
 COIN =      -2
 MAGNIFIER = -3
 SHIELD =    -5
 UPGRADER =  -6
 RIFLE =     -10
 
+BOARD_SCENE, TRADER_SCENE, DEATH_SCENE = list(range(3))
+
 TALK_START = ["Ah tiens quelqu'un, tu es bien vivant dis moi ?", 
     "Je vois tu viens donc de sortir d’un des tunnels les plus profonds de la ville-mine d’à côté après avoir entendu qu’elle allait être désaffectée.", 
     "Désolé, mais cela va bientôt faire trois mois que le processus est terminé, il semblerait qu’on ne t’ai pas prévenu.", 
@@ -83,12 +88,10 @@ class Trader:
     """
     def __init__(self, game):
         self.game = game
-        self.trader_image = pygame.image.load(f"sprites/trader.png").convert_alpha()
-        self.trader_image = pygame.transform.scale(self.trader_image, (self.game.screen_width - self.game.gui_width, self.game.screen_height))
+        self.trader_image = self.game.assets.image("sprites/trader.png", (self.game.screen_width - self.game.gui_width, self.game.screen_height))
 
-        self.sign_hovered_image = pygame.image.load(f"sprites/sign_hovered.png").convert_alpha()
-        self.sign_hovered_image = pygame.transform.scale(self.sign_hovered_image, (self.trader_image.get_width() * 22/100,
-                                                                                   self.trader_image.get_height() * 20/100))
+        self.sign_hovered_image = self.game.assets.image("sprites/sign_hovered.png", (self.trader_image.get_width() * 22/100,
+                                                                                      self.trader_image.get_height() * 20/100))
 
         self.sign_rect = self.sign_hovered_image.get_rect()
         self.sign_rect.x = self.game.screen_width - self.game.gui_width - self.trader_image.get_width() * 26.5/100
@@ -99,21 +102,17 @@ class Trader:
         size = self.game.screen_width * 7.5 / 100
         y = self.game.screen_height / 2 + self.game.screen_height * 13 / 100
 
-        self.magnifier_image = self.game.items[MAGNIFIER].image.copy()
-        self.magnifier_image = pygame.transform.scale(self.magnifier_image, (size, size))
+        self.magnifier_image = self.game.assets.image("sprites/magnifier.png", (size, size))
         self.magnifier_rect = self.magnifier_image.get_rect()
         self.magnifier_rect.x = ((self.game.screen_width - self.game.gui_width)/2 - self.game.screen_width * (1 + 14) / 100) - (self.magnifier_image.get_width() / 2)
         self.magnifier_rect.y = y
 
-        self.shield_image = self.game.items[SHIELD].image.copy()
-        self.shield_image = pygame.transform.scale(self.shield_image, (size, size))
+        self.shield_image = self.game.assets.image("sprites/shield.png", (size, size))
         self.shield_rect = self.shield_image.get_rect()
         self.shield_rect.x = ((self.game.screen_width - self.game.gui_width)/2 - self.game.screen_width * 2.6 / 100) - (self.shield_image.get_width() / 2)
         self.shield_rect.y = y
 
-        self.upgrader_image = self.game.items[UPGRADER].image.copy()
-        self.upgrader_image = pygame.transform.scale(self.upgrader_image, (size, size))
-        self.upgrader_image = pygame.transform.flip(self.upgrader_image, True, False)
+        self.upgrader_image = self.game.assets.image("sprites/upgrader.png", (size, size), FLIP_X)
         self.upgrader_rect = self.upgrader_image.get_rect()
         self.upgrader_rect.x = ((self.game.screen_width - self.game.gui_width)/2 - self.game.screen_width * (4 - 14) / 100) - (self.upgrader_image.get_width() / 2)
         self.upgrader_rect.y = y
@@ -138,28 +137,27 @@ class Trader:
 
         return False
 
-    def handling_events(self):
+    def clicked(self, event: pygame.event.Event):
         """
-        Handles events related to the trader and his items.
+        Handles a click on the trader, his sign or his items, at event.pos.
         """
-        if self.sign_hovered():
-            self.game.is_trading = False
-            self.game.run()
+        if self.sign_rect.collidepoint(event.pos):
+            self.game.switch(BOARD_SCENE)
 
-        elif self.magnifier_rect.collidepoint(pygame.mouse.get_pos()):# and self.game.items[COIN].amount >= 0:
-            self.game.items[COIN].amount -= 10
+        elif self.magnifier_rect.collidepoint(event.pos):# and self.game.items[COIN].amount >= 0:
+            self.game.items[COIN].amount -= PRICES[MAGNIFIER]
             self.game.items[MAGNIFIER].picked()
             # self.game.item_collected.play()
 
-        elif self.shield_rect.collidepoint(pygame.mouse.get_pos()):# and self.game.items[COIN].amount >= 0:
-            self.game.items[COIN].amount -= 10
+        elif self.shield_rect.collidepoint(event.pos):# and self.game.items[COIN].amount >= 0:
+            self.game.items[COIN].amount -= PRICES[SHIELD]
             self.game.items[SHIELD].picked()
             # self.game.item_collected.play()
 
-        elif self.upgrader_rect.collidepoint(pygame.mouse.get_pos()):# and self.game.items[COIN].amount >= 0:
-            self.game.items[COIN].amount -= 10
+        elif self.upgrader_rect.collidepoint(event.pos):# and self.game.items[COIN].amount >= 0:
+            self.game.items[COIN].amount -= PRICES[UPGRADER]
             self.game.items[UPGRADER].picked()
             # self.game.item_collected.play()
 
-        elif self.trader_rect.collidepoint(pygame.mouse.get_pos()) and self.game.player.active_equipped == RIFLE:
-            self.game.is_trader_dead = True
\ No newline at end of file
+        elif self.trader_rect.collidepoint(event.pos) and self.game.player.active_equipped == RIFLE:
+            self.game.switch(DEATH_SCENE)
\ No newline at end of file
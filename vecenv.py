@@ -0,0 +1,449 @@
+"""
+Projet démineur
+Auteurs :   Mathis Bulka
+            Samuel Cornier
+            Léo Simon
+            Sacha Trouvé
+
+    Module vecenv: environnement vectorisé de plusieurs plateaux, pour
+    entraîner et évaluer des robots
+
+    python vecenv.py --boards 1024 --size 18 18 --steps 200
+"""
+
+import argparse
+import sys
+import time
+
+import numpy
+
+from engine import Inventory
+from loot import LOOT
+from topology import SQUARE, Topology
+
+BOMB = -1
+COIN = -2
+MAGNIFIER = -3
+METAL_SCRAP = -4
+SHIELD = -5
+UPGRADER = -6
+BIONIC_GLASSES = -7
+ARMOR = -8
+JAMMER = -9
+RIFLE = -10
+
+ITEMS = [COIN, MAGNIFIER, METAL_SCRAP, SHIELD, UPGRADER, BIONIC_GLASSES, ARMOR, JAMMER, RIFLE]
+
+FLAGGED, HIDDEN, NOT_HIDDEN = -1, 0, 1
+
+# les actions : creuser (ou ramasser, ou creuser autour d'un nombre, comme un
+# clic gauche), poser ou retirer un drapeau, creuser avec une loupe, poser un
+# brouilleur sur une case révélée
+REVEAL, FLAG, MAGNIFY, JAM = list(range(4))
+
+# ce que l'observation montre à la place des cases inconnues
+HIDDEN_CODE = -11
+FLAGGED_CODE = -12
+COLLECTED_CODE = -13
+
+CELL_REWARD = 0.01
+WIN_REWARD = 1.0
+LOSS_REWARD = -1.0
+INVALID_REWARD = -0.01
+
+
+class VectorEnv:
+    """
+    Many rounds played at once, one per board, with the rules of Engine: a
+    reset/step environment whose boards are the rows of stacked arrays, so
+    that a step of all of them is a few numpy operations whatever their
+    number.
+
+    Every cell array has one more column than the board, a cell that is never
+    hidden and never holds an object: the neighbours missing on the edges
+    point to it, so that the neighbours of every cell fit in one rectangular
+    array.
+
+    A board is played from its first click, at a random cell, made by the
+    reset. A step takes one action per board, as the action arrays: REVEAL is
+    a left click (it digs a hidden cell, picks a revealed item up, or digs
+    around a revealed cell), FLAG a right click, MAGNIFY a left click on a
+    hidden cell with a magnifier of the inventory equipped, and JAM a left
+    click on a revealed cell with a jammer equipped. An action that does
+    nothing is penalized. A board whose round is won or lost is reset at the
+    end of the step, so that its observation is the one of the next round.
+
+    Parameters
+    ----------
+    count : int
+        The number of boards.
+    width : int
+        The width of the boards.
+    height : int
+        The height of the boards.
+    round_number : int, optional
+        The round played on every board, which sets the bombs and the items.
+        The default is 1.
+    inventory : Inventory, optional
+        The items of the player at the start of every round: its amounts and
+        its passive item. The default is an empty inventory.
+    topology : Topology, optional
+        The shape of the boards. The default is SQUARE.
+    seed : int, optional
+        The seed of the boards. The default is None, for a random one.
+
+    Attributes
+    ----------
+    values : numpy.ndarray
+        The values of the cells of every board (count, size + 1), as in Board.
+    states : numpy.ndarray
+        The states of the cells of every board (count, size + 1).
+    collected : numpy.ndarray
+        Whether the item of each cell has been collected (count, size + 1).
+    neighbours : numpy.ndarray
+        The neighbours of every cell (size, k), size standing for none.
+    flag_to_place : numpy.ndarray
+        The number of flags left to place on every board.
+    not_hidden : numpy.ndarray
+        The number of revealed cells without a bomb of every board.
+    safe_cells : numpy.ndarray
+        The number of cells without a bomb of every board.
+    amounts : numpy.ndarray
+        The amount of every item of ITEMS for every board.
+    health : numpy.ndarray
+        The health points of the passive item of every board, 0 for none.
+    lost : numpy.ndarray
+        Whether a bomb exploded with no protection on every board.
+    jammed_bombs : numpy.ndarray
+        The number of exploded bombs of every board that a jammer was placed
+        on, which are not safe cells.
+    """
+
+    def __init__(self, count: int, width: int, height: int, round_number: int = 1,
+                 inventory: Inventory = None, topology: Topology = SQUARE, seed: int = None):
+        self.count = count
+        self.width = width
+        self.height = height
+        self.size = width * height
+        self.round = round_number
+        self.inventory = Inventory() if inventory is None else inventory
+        self.topology = topology
+        self.rng = numpy.random.default_rng(seed)
+        self.boards = numpy.arange(count)
+
+        table = topology.table(width, height)
+        cells = numpy.arange(self.size)
+        degrees = table.degrees(cells)
+        starts = numpy.cumsum(degrees) - degrees
+        self.neighbours = numpy.full((self.size, int(degrees.max())), self.size, dtype=numpy.int64)
+        self.neighbours[numpy.repeat(cells, degrees),
+                        numpy.arange(int(degrees.sum())) - numpy.repeat(starts, degrees)] = table.gather(cells)
+
+        self.values = numpy.zeros((count, self.size + 1), dtype=numpy.int8)
+        self.states = numpy.full((count, self.size + 1), NOT_HIDDEN, dtype=numpy.int8)
+        self.collected = numpy.zeros((count, self.size + 1), dtype=numpy.bool_)
+        self.flag_to_place = numpy.zeros(count, dtype=numpy.int32)
+        self.not_hidden = numpy.zeros(count, dtype=numpy.int32)
+        self.safe_cells = numpy.zeros(count, dtype=numpy.int32)
+        self.amounts = numpy.zeros((count, len(ITEMS)), dtype=numpy.int32)
+        self.health = numpy.zeros(count, dtype=numpy.int32)
+        self.lost = numpy.zeros(count, dtype=numpy.bool_)
+        self.jammed_bombs = numpy.zeros(count, dtype=numpy.int32)
+        self.marks = numpy.zeros(count * (self.size + 1), dtype=numpy.int32)
+
+    def reset(self, boards: numpy.ndarray = None) -> dict[str, numpy.ndarray]:
+        """
+        Starts new rounds on the given boards: their bombs and items are drawn
+        and placed, the inventory is given back, and their first click is made.
+
+        Parameters
+        ----------
+        boards : numpy.ndarray, optional
+            The indices of the boards to reset. The default is None, for all of
+            them.
+
+        Returns
+        -------
+        observation : dict[str, numpy.ndarray]
+            The observation of every board, as returned by observe().
+        """
+        boards = self.boards if boards is None else numpy.asarray(boards)
+        if not len(boards):
+            return self.observe()
+
+        # le butin de tous les plateaux est tiré en une fois
+        loot = LOOT.round(self.round)
+        counts = loot.counts(self.size, self.rng, len(boards))
+        totals = counts.sum(axis=1)
+        number = int(totals.max())
+        if number > self.size - self.neighbours.shape[1] - 1:
+            raise ValueError("too many objects for the safe zone of the first click")
+
+        # une clé aléatoire par cellule, plus grande que toutes les autres dans
+        # la zone sûre du premier clic : les plus petites reçoivent les objets,
+        # dans l'ordre de la table
+        first = self.rng.integers(self.size, size=len(boards))
+        keys = self.rng.random((len(boards), self.size + 1))
+        keys[numpy.arange(len(boards))[:, None], numpy.column_stack([first, self.neighbours[first]])] = 2.0
+        picked = numpy.argpartition(keys[:, :self.size], number, axis=1)[:, :number]
+
+        kinds = (numpy.arange(number)[None, :, None] >= numpy.cumsum(counts, axis=1)[:, None, :]).sum(axis=2)
+        order = numpy.append(numpy.array(loot.order, dtype=numpy.int8), 0)
+
+        values = numpy.zeros((len(boards), self.size + 1), dtype=numpy.int8)
+        values[numpy.arange(len(boards))[:, None], picked] = order[kinds]
+        mask = values < 0
+        counts_around = mask[:, self.neighbours].sum(axis=2, dtype=numpy.int8)
+        values[:, :self.size] = numpy.where(mask[:, :self.size], values[:, :self.size], counts_around)
+
+        self.values[boards] = values
+        self.states[boards, :self.size] = HIDDEN
+        self.collected[boards] = False
+        self.flag_to_place[boards] = totals
+        self.safe_cells[boards] = self.size - (counts[:, loot.order.index(BOMB)] if BOMB in loot.order else 0)
+        self.amounts[boards] = [self.inventory.amounts[item] for item in ITEMS]
+        self.health[boards] = self.inventory.health[self.inventory.passive_equipped] \
+            if self.inventory.passive_equipped is not None else 0
+        self.lost[boards] = False
+        self.jammed_bombs[boards] = 0
+
+        self.dig(boards, first, numpy.zeros(len(boards), dtype=numpy.bool_))
+        self.not_hidden[boards] = self.count_revealed(boards)
+
+        return self.observe()
+
+    def step(self, actions: numpy.ndarray, cells: numpy.ndarray) -> tuple:
+        """
+        Plays one action on every board.
+
+        Parameters
+        ----------
+        actions : numpy.ndarray
+            The action of every board: REVEAL, FLAG, MAGNIFY or JAM.
+        cells : numpy.ndarray
+            The flat index of the cell of the action of every board.
+
+        Returns
+        -------
+        observation : dict[str, numpy.ndarray]
+            The observation of every board after the step, the finished rounds
+            being reset.
+        rewards : numpy.ndarray
+            The reward of every board: CELL_REWARD per cell revealed, WIN_REWARD
+            or LOSS_REWARD when the round ends, INVALID_REWARD for an action
+            that did nothing.
+        done : numpy.ndarray
+            Whether the round of every board ended with this step.
+        info : dict[str, numpy.ndarray]
+            Whether every round was won or lost.
+        """
+        actions = numpy.asarray(actions)
+        cells = numpy.asarray(cells, dtype=numpy.int64)
+        boards = self.boards
+        states = self.states[boards, cells]
+        values = self.values[boards, cells]
+        revealed = states == NOT_HIDDEN
+        hidden = states == HIDDEN
+        # un clic sur un objet révélé le ramasse, ou ne fait rien s'il l'est déjà
+        item = revealed & (values < BOMB) & (values != JAMMER)
+
+        flag = (actions == FLAG) & ~revealed
+        pick = (actions == REVEAL) & item & ~self.collected[boards, cells]
+        dig = (actions == REVEAL) & hidden
+        chord = (actions == REVEAL) & ~hidden & ~item
+        magnify = (actions == MAGNIFY) & hidden & (self.amounts[:, ITEMS.index(MAGNIFIER)] > 0)
+        jam = (actions == JAM) & revealed & ~item & (self.amounts[:, ITEMS.index(JAMMER)] > 0)
+
+        self.states[boards[flag], cells[flag]] = numpy.where(hidden[flag], FLAGGED, HIDDEN)
+        self.flag_to_place[flag] += numpy.where(hidden[flag], -1, 1)
+
+        self.collected[boards[pick], cells[pick]] = True
+        # les objets sont rangés dans ITEMS de COIN à RIFLE
+        numpy.add.at(self.amounts, (boards[pick], COIN - values[pick].astype(numpy.int64)), 1)
+
+        # un brouilleur posé sur une bombe qui a explosé ne la rend pas sûre
+        numpy.add.at(self.jammed_bombs, boards[jam & (values == BOMB)], 1)
+        self.values[boards[jam], cells[jam]] = JAMMER
+        self.amounts[jam, ITEMS.index(JAMMER)] -= 1
+
+        # la loupe est usée sur une bombe ou un nombre, pas sur un objet
+        self.amounts[magnify & (values >= BOMB), ITEMS.index(MAGNIFIER)] -= 1
+
+        # creuser autour d'une case révélée creuse ses voisines cachées
+        around = self.neighbours[cells[chord]]
+        around_hidden = self.states[boards[chord][:, None], around] == HIDDEN
+        dug_boards = numpy.concatenate([boards[dig | magnify], numpy.repeat(boards[chord], around_hidden.sum(axis=1))])
+        dug_cells = numpy.concatenate([cells[dig | magnify], around[around_hidden]])
+        magnified = numpy.concatenate([magnify[dig | magnify], numpy.zeros(int(around_hidden.sum()), dtype=numpy.bool_)])
+
+        self.dig(dug_boards, dug_cells, magnified)
+
+        valid = flag | pick | jam | dig | magnify
+        valid[chord] = around_hidden.any(axis=1)
+
+        before = self.not_hidden
+        self.not_hidden = self.count_revealed(boards)
+        won = (self.not_hidden == self.safe_cells) & ~self.lost
+        lost = self.lost.copy()
+        done = won | lost
+
+        rewards = CELL_REWARD * (self.not_hidden - before)
+        rewards += numpy.where(won, WIN_REWARD, 0.0) + numpy.where(lost, LOSS_REWARD, 0.0)
+        rewards += numpy.where(valid, 0.0, INVALID_REWARD)
+
+        return self.reset(boards[done]), rewards, done, {"won": won, "lost": lost}
+
+    def dig(self, boards: numpy.ndarray, cells: numpy.ndarray, magnified: numpy.ndarray):
+        """
+        Digs hidden cells, like Engine.dig, on several boards at once; a board
+        may dig several cells.
+
+        Parameters
+        ----------
+        boards : numpy.ndarray
+            The board of every cell dug.
+        cells : numpy.ndarray
+            The flat indices of the cells dug.
+        magnified : numpy.ndarray
+            Whether every cell is dug with a magnifier.
+
+        Returns
+        -------
+        None
+        """
+        values = self.values[boards, cells]
+        objects = values < 0
+        numpy.subtract.at(self.flag_to_place, boards[objects], 1)
+
+        # une bombe trouvée par la loupe est marquée d'un drapeau
+        found = (values == BOMB) & magnified
+        self.states[boards[found], cells[found]] = FLAGGED
+
+        exploded = (values == BOMB) & ~magnified
+        exploded_boards, exploded_cells = boards[exploded], cells[exploded]
+        jammed = (self.values[exploded_boards[:, None], self.neighbours[exploded_cells]] == JAMMER).any(axis=1)
+        exploded_boards = exploded_boards[~jammed]
+
+        # les bombes d'un plateau abîment son bouclier l'une après l'autre
+        order = numpy.argsort(exploded_boards, kind="stable")
+        exploded_boards = exploded_boards[order]
+        starts = numpy.searchsorted(exploded_boards, exploded_boards)
+        rank = numpy.arange(len(exploded_boards)) - starts
+        absorbed = rank < self.health[exploded_boards]
+        numpy.subtract.at(self.health, exploded_boards[absorbed], 1)
+        self.lost[exploded_boards[~absorbed]] = True
+
+        # un objet ou une bombe qui a explosé est révélé, comme un nombre creusé
+        # avec la loupe
+        shown = (objects & ~found) | (magnified & ~objects)
+        self.states[boards[shown], cells[shown]] = NOT_HIDDEN
+
+        plain = ~objects & ~magnified
+        self.states[boards[plain], cells[plain]] = NOT_HIDDEN
+        self.flood(boards[plain & (values == 0)], cells[plain & (values == 0)])
+
+    def flood(self, boards: numpy.ndarray, cells: numpy.ndarray):
+        """
+        Reveals the regions of empty cells around the given revealed ones, with
+        their border, like Board.reveal: one breadth-first level of every board
+        at a time.
+        """
+        width = self.size + 1
+        values = self.values.reshape(-1)
+        states = self.states.reshape(-1)
+        frontier = boards * width + cells
+
+        while len(frontier):
+            around = (frontier[:, None] // width * width + self.neighbours[frontier % width]).reshape(-1)
+            around = around[(states[around] == HIDDEN) & (values[around] >= 0)]
+
+            # les doublons sont retirés sans tri : chaque case garde la
+            # dernière position qui l'a marquée
+            positions = numpy.arange(len(around), dtype=numpy.int32)
+            self.marks[around] = positions
+            around = around[self.marks[around] == positions]
+            states[around] = NOT_HIDDEN
+
+            frontier = around[values[around] == 0]
+
+    def count_revealed(self, boards: numpy.ndarray) -> numpy.ndarray:
+        """
+        Returns the number of revealed cells without a bomb of the given boards,
+        the ones holding a jammer included.
+        """
+        revealed = numpy.count_nonzero((self.states[boards, :self.size] == NOT_HIDDEN)
+                                       & (self.values[boards, :self.size] != BOMB), axis=1)
+
+        return (revealed - self.jammed_bombs[boards]).astype(numpy.int32)
+
+    def observe(self) -> dict[str, numpy.ndarray]:
+        """
+        Returns what the player sees of every board.
+
+        Returns
+        -------
+        observation : dict[str, numpy.ndarray]
+            "board": the cells of every board (count, height, width), the value
+            of the revealed ones, HIDDEN_CODE, FLAGGED_CODE, or COLLECTED_CODE
+            for an item picked up; "flags": the flags left to place;
+            "amounts": the amount of every item of ITEMS; "health": the health
+            points of the passive item.
+        """
+        states = self.states[:, :self.size]
+        board = self.values[:, :self.size].copy()
+        board[states == HIDDEN] = HIDDEN_CODE
+        board[states == FLAGGED] = FLAGGED_CODE
+        board[self.collected[:, :self.size]] = COLLECTED_CODE
+
+        return {
+            "board": board.reshape(self.count, self.height, self.width),
+            "flags": self.flag_to_place.copy(),
+            "amounts": self.amounts.copy(),
+            "health": self.health.copy()
+        }
+
+
+def main(arguments: list[str] = None) -> int:
+    """
+    Steps boards with reveals of hidden cells and prints the time taken by a
+    step. The cells are random, or safe ones picked from the hidden values,
+    so that the rounds last and the time is the one of a step rather than of
+    the resets.
+    """
+    parser = argparse.ArgumentParser(description="Times the vectorized environment with random actions.")
+    parser.add_argument("--boards", type=int, default=1024)
+    parser.add_argument("--size", type=int, nargs=2, default=[18, 18], metavar=("WIDTH", "HEIGHT"))
+    parser.add_argument("--round", type=int, default=1)
+    parser.add_argument("--steps", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--policy", choices=["random", "safe"], default="safe")
+    arguments = parser.parse_args(arguments)
+
+    width, height = arguments.size
+    env = VectorEnv(arguments.boards, width, height, arguments.round, seed=arguments.seed)
+    rng = numpy.random.default_rng(arguments.seed)
+    observation = env.reset()
+    rounds = wins = 0
+
+    start = time.perf_counter()
+    for _ in range(arguments.steps):
+        # une case cachée au hasard sur chaque plateau
+        hidden = observation["board"].reshape(arguments.boards, -1) == HIDDEN_CODE
+        if arguments.policy == "safe":
+            hidden &= env.values[:, :env.size] >= 0
+
+        cells = numpy.argmax(numpy.where(hidden, rng.random(hidden.shape), -1.0), axis=1)
+        observation, rewards, done, info = env.step(numpy.full(arguments.boards, REVEAL), cells)
+        rounds += int(done.sum())
+        wins += int(info["won"].sum())
+
+    elapsed = time.perf_counter() - start
+
+    print(f"{arguments.boards} boards, {arguments.steps} steps: {elapsed / arguments.steps * 1000:.2f} ms per step, "
+          f"{arguments.boards * arguments.steps / elapsed:.0f} actions/s, {rounds} rounds, {wins} won")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
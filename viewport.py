@@ -0,0 +1,407 @@
+"""
+Projet démineur
+Auteurs :   Mathis Bulka
+            Samuel Cornier
+            Léo Simon
+            Sacha Trouvé
+
+    Module viewport: caméra sur les plateaux trop grands pour la fenêtre,
+    affichés par morceaux
+"""
+
+from collections import OrderedDict
+
+import numpy
+import pygame
+
+from atlas import HIDDEN_TILE, TileAtlas
+from render import BoardBackground
+
+LEFT_CLICK, MIDDLE_CLICK, RIGHT_CLICK, WHEELUP, WHEELDOWN = list(range(1, 6))
+
+# en dessous de cette taille de cellule, le plateau est vu à travers la caméra
+MIN_SQUARE_SIZE = 16
+DEFAULT_SQUARE_SIZE = 24
+ZOOM_LEVELS = [6, 8, 12, 16, 24, 32, 48]
+
+# un morceau fait environ CHUNK_PIXELS de côté, soit 64 cellules de 16 pixels
+CHUNK_PIXELS = 1024
+MAX_CACHED_PIXELS = 24_000_000
+
+# pixels parcourus par image avec les flèches, et avant qu'un clic ne devienne
+# un glisser
+PAN_SPEED = 16
+DRAG_THRESHOLD = 4
+
+MARGIN_COLOR = (152, 199, 64)
+
+
+class Viewport:
+    """
+    A camera over a board too large to fit in the window. It can be moved with
+    the arrow keys or by dragging the board with the left button, and zoomed in
+    and out with the mouse wheel.
+
+    The board is cut into square chunks of cells, each one rendered once in an
+    off-screen surface and kept until a cell inside it changes. A frame only
+    blits the few chunks under the camera, whatever the size of the board, and
+    only when the camera moved or a chunk changed.
+
+    On an endless board (game.endless), the camera is not kept on the board,
+    and the chunks have no limit.
+
+    The camera keeps game.square_size, game.x_offset and game.y_offset up to
+    date, x_offset and y_offset being the position on the screen of the cell
+    (0, 0), so that the cell under the mouse is found as before. It also stands
+    for game.background: restore() draws back a part of the play area from the
+    chunks.
+
+    Parameters:
+    game (Game): The game whose board is shown.
+    rect (Rect): The play area on the screen.
+    square_size (int): The size of a cell in pixels, one of ZOOM_LEVELS.
+
+    Attributes:
+    game (Game): The game whose board is shown.
+    rect (Rect): The play area on the screen.
+    square_size (int): The size of a cell in pixels.
+    chunk_size (int): The number of cells on each side of a chunk, even so that
+    every chunk starts on the same colour of the checkerboard.
+    camera (list): The position of the top-left corner of the play area on the
+    board, in pixels.
+    chunks (OrderedDict): The rendered chunks, keyed by (column, row) of chunk,
+    the least recently drawn first.
+    pixels (int): The number of pixels of the rendered chunks.
+    backgrounds (dict): The checkerboard of the hidden cells of a chunk, keyed
+    by its size in cells.
+    atlases (dict): The tile atlas of each zoom level used so far.
+    changed (bool): Whether the play area has to be drawn again.
+    pressed (tuple): Where the left button was pressed in the play area, or
+    None.
+    pressed_camera (tuple): The camera when the left button was pressed.
+    dragged (bool): Whether the mouse moved enough since then to drag the
+    board instead of clicking it.
+    """
+
+    def __init__(self, game, rect: pygame.Rect, square_size: int = DEFAULT_SQUARE_SIZE):
+        self.game = game
+        self.rect = pygame.Rect(rect)
+        self.square_size = square_size
+        self.chunk_size = max(2, CHUNK_PIXELS // square_size // 2 * 2)
+        self.camera = [0, 0]
+        self.chunks = OrderedDict()
+        self.pixels = 0
+        self.backgrounds = {}
+        self.atlases = {}
+        self.changed = True
+        self.pressed = None
+        self.pressed_camera = None
+        self.dragged = False
+        self.reset()
+
+    def reset(self):
+        """
+        Forgets the chunks of the previous round and centers the camera on the
+        board.
+        """
+        self.clear()
+
+        if self.game.endless:
+            # la cellule (0, 0) est au centre
+            self.camera = [-self.rect.width // 2, -self.rect.height // 2]
+
+        else:
+            self.camera = [(self.game.width * self.square_size - self.rect.width) // 2,
+                           (self.game.height * self.square_size - self.rect.height) // 2]
+
+        self.pressed = None
+        self.move()
+
+    def clear(self):
+        """
+        Forgets every rendered chunk.
+        """
+        self.chunks.clear()
+        self.pixels = 0
+        self.changed = True
+
+    def move(self):
+        """
+        Keeps the camera on the board, unless it is endless, and the offsets of
+        the game in line with it. A board smaller than the play area on one axis
+        is centered on it.
+        """
+        if not self.game.endless:
+            for axis, (cells, view) in enumerate([(self.game.width, self.rect.width),
+                                                  (self.game.height, self.rect.height)]):
+                extent = cells * self.square_size
+
+                if extent <= view:
+                    self.camera[axis] = (extent - view) // 2
+
+                else:
+                    self.camera[axis] = min(max(self.camera[axis], 0), extent - view)
+
+        self.game.square_size = self.square_size
+        self.game.x_offset = self.rect.x - self.camera[0]
+        self.game.y_offset = self.rect.y - self.camera[1]
+        self.changed = True
+
+    def pan(self, delta_x: int, delta_y: int):
+        """
+        Moves the camera by the given number of pixels.
+        """
+        self.camera[0] += delta_x
+        self.camera[1] += delta_y
+        self.move()
+
+    def zoom(self, step: int, anchor: tuple[int, int]):
+        """
+        Goes to the next (step = 1) or previous (step = -1) zoom level, keeping
+        the point of the board under anchor at the same place on the screen.
+
+        Parameters:
+        step (int): The number of zoom levels to go up.
+        anchor (tuple): The position of the mouse on the screen.
+        """
+        level = ZOOM_LEVELS.index(self.square_size) + step
+        if not 0 <= level < len(ZOOM_LEVELS):
+            return
+
+        square_size = ZOOM_LEVELS[level]
+        for axis in [0, 1]:
+            position = anchor[axis] - self.rect.topleft[axis]
+            self.camera[axis] = round((self.camera[axis] + position) * square_size / self.square_size) - position
+
+        self.square_size = square_size
+        self.chunk_size = max(2, CHUNK_PIXELS // square_size // 2 * 2)
+        self.backgrounds = {}
+        self.clear()
+
+        if square_size not in self.atlases:
+            self.atlases[square_size] = TileAtlas(self.game.assets, square_size)
+
+        self.game.atlas = self.atlases[square_size]
+        self.move()
+
+    def update(self, keys):
+        """
+        Moves the camera while the arrow keys are held down.
+
+        Parameters:
+        keys (ScancodeWrapper): The state of the keys, from
+        pygame.key.get_pressed().
+        """
+        delta_x = (keys[pygame.K_RIGHT] - keys[pygame.K_LEFT]) * PAN_SPEED
+        delta_y = (keys[pygame.K_DOWN] - keys[pygame.K_UP]) * PAN_SPEED
+
+        if delta_x or delta_y:
+            self.pan(delta_x, delta_y)
+
+    def filter(self, event: pygame.event.Event):
+        """
+        Handles the events moving the camera, and returns the event the board
+        has to handle, or None.
+
+        The wheel zooms. The left button only clicks the board when it is
+        released without the mouse having been dragged: the event returned is
+        then a MOUSEBUTTONDOWN where the button was pressed.
+
+        Parameters:
+        event (pygame.event.Event): The event to handle.
+
+        Returns:
+        pygame.event.Event: The event left to the board, or None.
+        """
+        if event.type == pygame.MOUSEBUTTONDOWN and event.button in [WHEELUP, WHEELDOWN]:
+            if self.rect.collidepoint(event.pos):
+                self.zoom(1 if event.button == WHEELUP else -1, event.pos)
+
+            return None
+
+        elif event.type == pygame.MOUSEBUTTONDOWN and event.button == LEFT_CLICK and self.rect.collidepoint(event.pos):
+            self.pressed = event.pos
+            self.pressed_camera = tuple(self.camera)
+            self.dragged = False
+            return None
+
+        elif event.type == pygame.MOUSEMOTION and self.pressed is not None:
+            delta_x = event.pos[0] - self.pressed[0]
+            delta_y = event.pos[1] - self.pressed[1]
+
+            if abs(delta_x) > DRAG_THRESHOLD or abs(delta_y) > DRAG_THRESHOLD:
+                self.dragged = True
+
+            if self.dragged:
+                self.camera = [self.pressed_camera[0] - delta_x, self.pressed_camera[1] - delta_y]
+                self.move()
+
+            return None
+
+        elif event.type == pygame.MOUSEBUTTONUP and event.button == LEFT_CLICK and self.pressed is not None:
+            pressed, self.pressed = self.pressed, None
+
+            if self.dragged:
+                return None
+
+            return pygame.event.Event(pygame.MOUSEBUTTONDOWN, button=LEFT_CLICK, pos=pressed)
+
+        return event
+
+    def invalidate(self, cell: tuple[int, int]):
+        """
+        Forgets the chunk holding the given cell, which is rendered again the
+        next time it is shown.
+        """
+        chunk = self.chunks.pop((cell[0] // self.chunk_size, cell[1] // self.chunk_size), None)
+
+        if chunk is not None:
+            self.pixels -= chunk.get_width() * chunk.get_height()
+            self.changed = True
+
+    def visible_cells(self) -> tuple[range, range]:
+        """
+        Returns the columns and the rows of the cells at least partly in the
+        play area.
+        """
+        columns = self.clip(self.camera[0] // self.square_size,
+                            (self.camera[0] + self.rect.width - 1) // self.square_size + 1, self.game.width)
+        rows = self.clip(self.camera[1] // self.square_size,
+                         (self.camera[1] + self.rect.height - 1) // self.square_size + 1, self.game.height)
+
+        return columns, rows
+
+    def clip(self, start: int, stop: int, limit: int) -> range:
+        """
+        Returns range(start, stop), kept between 0 and limit unless the board is
+        endless.
+        """
+        if self.game.endless:
+            return range(start, stop)
+
+        return range(max(0, start), min(limit, stop))
+
+    def visible_animations(self, animations: dict) -> list:
+        """
+        Returns the items of the given animations whose cell is in the play
+        area. The play area is looked up cell by cell when it holds fewer cells
+        than there are animations, so that a frame does not depend on the
+        number of flags of the board.
+        """
+        columns, rows = self.visible_cells()
+
+        if len(animations) <= len(columns) * len(rows):
+            return [(cell, animation) for cell, animation in animations.items()
+                    if cell[0] in columns and cell[1] in rows]
+
+        return [((column, row), animations[(column, row)]) for row in rows for column in columns
+                if (column, row) in animations]
+
+    def chunk_keys(self, rect: pygame.Rect) -> list[tuple[int, int]]:
+        """
+        Returns the keys of the chunks covering the given part of the screen.
+        """
+        span = self.chunk_size * self.square_size
+        left = rect.x - self.rect.x + self.camera[0]
+        top = rect.y - self.rect.y + self.camera[1]
+        columns = self.clip(left // span, (left + rect.width - 1) // span + 1,
+                            (self.game.width - 1) // self.chunk_size + 1)
+        rows = self.clip(top // span, (top + rect.height - 1) // span + 1,
+                         (self.game.height - 1) // self.chunk_size + 1)
+
+        return [(column, row) for row in rows for column in columns]
+
+    def chunk_rect(self, key: tuple[int, int], chunk: pygame.Surface) -> pygame.Rect:
+        """
+        Returns the part of the screen where the given chunk is drawn.
+        """
+        span = self.chunk_size * self.square_size
+
+        return chunk.get_rect(topleft=(self.rect.x + key[0] * span - self.camera[0],
+                                       self.rect.y + key[1] * span - self.camera[1]))
+
+    def chunk(self, key: tuple[int, int]) -> pygame.Surface:
+        """
+        Returns the surface of a chunk, rendered if it is not already. The least
+        recently drawn chunks are forgotten beyond MAX_CACHED_PIXELS.
+        """
+        chunk = self.chunks.get(key)
+
+        if chunk is not None:
+            self.chunks.move_to_end(key)
+            return chunk
+
+        chunk = self.render(key)
+        self.chunks[key] = chunk
+        self.pixels += chunk.get_width() * chunk.get_height()
+
+        while self.pixels > MAX_CACHED_PIXELS and len(self.chunks) > 1:
+            old_chunk = self.chunks.popitem(last=False)[1]
+            self.pixels -= old_chunk.get_width() * old_chunk.get_height()
+
+        return chunk
+
+    def render(self, key: tuple[int, int]) -> pygame.Surface:
+        """
+        Renders a chunk: the checkerboard of the hidden cells, then one blit
+        from the tile atlas of the game for every other cell, all at once.
+        """
+        x = key[0] * self.chunk_size
+        y = key[1] * self.chunk_size
+        width = height = self.chunk_size
+
+        if not self.game.endless:
+            width = min(width, self.game.width - x)
+            height = min(height, self.game.height - y)
+
+        if (width, height) not in self.backgrounds:
+            size = (width * self.square_size, height * self.square_size)
+            self.backgrounds[(width, height)] = BoardBackground(size, width, height, self.square_size, (0, 0)).surface
+
+        chunk = self.backgrounds[(width, height)].copy()
+        tiles = self.game.grid.tiles(x, y, width, height)
+        rows, columns = numpy.nonzero(tiles != HIDDEN_TILE)
+
+        # x + y est pair : la couleur d'une cellule ne dépend que de sa place
+        # dans le morceau
+        atlas = self.game.atlas
+        square_size = self.square_size
+        chunk.blits([(atlas.surface, (column * square_size, row * square_size), atlas.areas[(tile, (column + row) % 2)])
+                     for row, column, tile in zip(rows.tolist(), columns.tolist(), tiles[rows, columns].tolist())],
+                    doreturn=False)
+
+        return chunk
+
+    def draw(self, screen: pygame.Surface):
+        """
+        Draws the chunks under the camera on the play area, if it changed.
+        """
+        if not self.changed:
+            return
+
+        screen.set_clip(self.rect)
+        screen.fill(MARGIN_COLOR, self.rect)
+
+        for key in self.chunk_keys(self.rect):
+            chunk = self.chunk(key)
+            screen.blit(chunk, self.chunk_rect(key, chunk))
+
+        screen.set_clip(None)
+        self.game.dirty.add(self.rect)
+        self.changed = False
+
+    def restore(self, screen: pygame.Surface, rect):
+        """
+        Draws the board back on a part of the play area, from the chunks.
+
+        Parameters:
+        screen (pygame.Surface): The screen surface.
+        rect (Rect or tuple): The part of the screen to clear.
+        """
+        rect = pygame.Rect(rect).clip(self.rect)
+
+        for key in self.chunk_keys(rect):
+            chunk = self.chunk(key)
+            chunk_rect = self.chunk_rect(key, chunk)
+            area = rect.clip(chunk_rect)
+            screen.blit(chunk, area.topleft, area.move(-chunk_rect.x, -chunk_rect.y))